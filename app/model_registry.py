@@ -0,0 +1,232 @@
+# app/model_registry.py
+"""
+Hot-swappable registry for the TF-IDF + LogReg model served by the Classify tab.
+
+Versions are discovered under a model root laid out the way task.py uploads them:
+
+    gs://<bucket>/models/lr-tfidf/<YYYYmmdd-HHMMSS>/model.joblib.gz
+
+(a local directory with the same layout works too). The stamp is the version and
+sorts chronologically, so "newest" is simply the largest one.
+
+A background thread polls the root, downloads a new version in-process with the
+GCS client (into a temp file that is renamed into place, so a half-written bundle
+is never loaded), unpickles it, builds the fast featurizer and warms it with a few
+predictions. Only then is it swapped in with a single reference assignment:
+requests in flight keep the model object they already hold, new requests see the
+new one. The replaced model stays in memory as `previous` for instant rollback().
+
+A pinned bundle (LOGREG_BUNDLE_PATH, a file or gs:// URI) is served when no model
+root is configured or the root is still empty.
+
+shared_registry() is the one registry per process, configured from the LOGREG_*
+environment variables. The container entrypoint (warmup.py) builds it before
+Streamlit starts listening, and the Classify tab picks up the same, already warm,
+instance.
+"""
+import os
+import pathlib
+import threading
+import time
+
+import joblib
+
+import metrics
+from fast_tfidf import featurizer_for
+import model_bundle
+from model_bundle import cache_path, version_from_path
+
+WARMUP_TEXTS = [
+    "Great game, had a lot of fun with friends.",
+    "Crashes every five minutes, refunded.",
+]
+
+class LoadedModel:
+    """One loaded, warmed model version."""
+    __slots__ = ("version", "source", "featurizer", "clf", "loaded_at")
+
+    def __init__(self, version: str, source: str, featurizer, clf):
+        self.version, self.source = version, source
+        self.featurizer, self.clf = featurizer, clf
+        self.loaded_at = time.time()
+
+    def predict_proba(self, texts: list):
+        return self.clf.predict_proba(self.featurizer.transform(texts))[:, 1]
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "source": self.source, "loaded_at": self.loaded_at}
+
+# --- Discovery & download ---
+def _split_gs(uri: str):
+    bucket, _, blob = uri[len("gs://"):].partition("/")
+    return bucket, blob
+
+def list_versions(root: str) -> dict:
+    """{version: bundle URI} for every `<root>/<stamp>/model.joblib.gz`."""
+    if root.startswith("gs://"):
+        from google.cloud import storage
+        bucket, prefix = _split_gs(root.rstrip("/") + "/")
+        blobs = storage.Client().list_blobs(bucket, prefix=prefix)
+        uris = [f"gs://{bucket}/{b.name}" for b in blobs if b.name.endswith("/model.joblib.gz")]
+    else:
+        uris = [str(p) for p in pathlib.Path(root).glob("*/model.joblib.gz")]
+    return {version_from_path(u): u for u in uris}
+
+def fetch(bundle: str, cache_dir: str = None) -> str:
+    """Local path of `bundle`; gs:// URIs are downloaded once, in-process (model_bundle.fetch)."""
+    if not bundle.startswith("gs://") or cache_path(bundle, cache_dir).exists():
+        return model_bundle.fetch(bundle, cache_dir)
+    with metrics.span("model_download", model="logreg") as sp:
+        local = model_bundle.fetch(bundle, cache_dir)
+        sp.set(bytes=os.path.getsize(local), version=version_from_path(bundle))
+    return local
+
+def load(bundle: str, version: str = None) -> LoadedModel:
+    """Downloads, unpickles and warms `bundle`; raises if it cannot predict."""
+    version = version or version_from_path(bundle)
+    path = fetch(bundle)
+    with metrics.span("model_load", model="logreg", version=version):
+        vec, clf = joblib.load(path)
+        model = LoadedModel(version, bundle, featurizer_for(vec), clf)
+    with metrics.span("model_warm", model="logreg", version=version):
+        model.predict_proba(WARMUP_TEXTS)
+    return model
+
+# --- Registry ---
+class ModelRegistry:
+    def __init__(self, root: str = None, pinned: str = None, poll_seconds: float = 300):
+        self.root, self.pinned, self.poll_seconds = root, pinned, poll_seconds
+        self.current = None      # LoadedModel; read without locking
+        self.previous = None
+        self.last_check = None
+        self.last_error = None
+        self._skip = set()       # versions that failed to load or were rolled back from
+        self._lock = threading.Lock()           # guards current/previous
+        self._refresh_lock = threading.Lock()   # one download/load at a time
+        self._thread = None
+        self._stop = threading.Event()
+
+    def latest(self):
+        """(version, bundle) of the newest version under the root, or None."""
+        versions = {v: u for v, u in list_versions(self.root).items() if v not in self._skip}
+        if not versions:
+            return None
+        version = max(versions)
+        return version, versions[version]
+
+    def _swap(self, model: LoadedModel):
+        with self._lock:
+            self.previous, self.current = self.current, model
+        metrics.inc("model_swaps_total", model="logreg")
+        print(f"✅ LogReg model {model.version} is live"
+              + (f" (previous: {self.previous.version})" if self.previous else ""))
+
+    def refresh(self) -> bool:
+        """Loads and swaps in the newest version if it differs from the live one. True if swapped."""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        self.last_check = time.time()
+        try:
+            found = self.latest() if self.root else None
+        except Exception as e:
+            # an unreachable root must not stop the pinned bundle from being served
+            self.last_error = f"listing {self.root}: {type(e).__name__}: {e}"
+            print(f"ERROR: could not list LogReg models - {self.last_error}")
+            found = None
+        if found is None:
+            if self.current is None and self.pinned:
+                self._swap(load(self.pinned))
+                return True
+            return False
+        version, bundle = found
+        if self.current is not None and self.current.version == version:
+            return False
+        try:
+            model = load(bundle, version)
+        except Exception as e:
+            self._skip.add(version)
+            self.last_error = f"{version}: {type(e).__name__}: {e}"
+            metrics.inc("model_load_failures_total", model="logreg")
+            print(f"ERROR: could not load LogReg model {version} - {type(e).__name__}: {e}")
+            if self.current is None and self.pinned:
+                self._swap(load(self.pinned))
+                return True
+            return False
+        self._swap(model)
+        return True
+
+    def get(self) -> LoadedModel:
+        """The live model, loading one synchronously if nothing has been loaded yet."""
+        model = self.current
+        if model is None:
+            self.refresh()
+            model = self.current
+            if model is None:
+                raise RuntimeError(f"No LogReg model found (root={self.root!r}, pinned={self.pinned!r})")
+        return model
+
+    def rollback(self) -> bool:
+        """Swaps the previous version back in (and keeps the replaced one as `previous`)."""
+        with self._lock:
+            if self.previous is None:
+                return False
+            self.current, self.previous = self.previous, self.current
+            # don't let the poller immediately re-promote the version we rolled back from
+            self._skip.add(self.previous.version)
+        metrics.inc("model_rollbacks_total", model="logreg")
+        print(f"↩️ Rolled back LogReg model to {self.current.version}")
+        return True
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"ERROR: model registry poll failed - {self.last_error}")
+
+    def start(self):
+        """Starts the background poller (no-op without a model root or when polling is disabled)."""
+        if self.root and self.poll_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            "current": self.current.to_dict() if self.current else None,
+            "previous": self.previous.to_dict() if self.previous else None,
+            "root": self.root,
+            "pinned": self.pinned,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+        }
+
+# --- Process-wide registry ---
+# versions uploaded by task.py (gs://<bucket>/models/lr-tfidf/<stamp>/model.joblib.gz); unset = serve PINNED_BUNDLE only
+MODEL_ROOT    = os.getenv("LOGREG_MODEL_ROOT")
+PINNED_BUNDLE = os.getenv("LOGREG_BUNDLE_PATH", "models/best_tfidf_lr_negRecall_20250630-050145.joblib.gz")
+MODEL_POLL    = float(os.getenv("LOGREG_MODEL_POLL_SECONDS", "300"))
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_registry() -> ModelRegistry:
+    """The process-wide registry: built on first call with its first model loaded and warmed, poller running."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            registry = ModelRegistry(root=MODEL_ROOT, pinned=PINNED_BUNDLE, poll_seconds=MODEL_POLL)
+            registry.get()
+            _shared = registry.start()
+    return _shared
+
+def live_version():
+    """Version the process-wide registry is serving, or None before it has loaded one (never loads)."""
+    registry = _shared
+    return registry.current.version if registry is not None and registry.current is not None else None
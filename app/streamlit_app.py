@@ -1,44 +1,121 @@
 import os
-import joblib
 import streamlit as st
-from google.cloud import aiplatform, bigquery
-import subprocess, pathlib, tempfile
-import pandas as pd
+import pathlib, sys
+import datetime as dt
+from typing import TYPE_CHECKING
+
+# the LR featurizer lives with the trainer, the metrics registry with the ingestion
+# service and the drift statistics with the batch scorer; the Dockerfile copies
+# them next to this file
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "lr_tfidf_trainer"))
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "ingestion_service"))
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "batch_scorer"))
+import metrics
+
+# Heavy dependencies are imported where they are used, so a session only pays for its
+# mode: Classify never loads pandas/BigQuery, the Dashboard never joblib/scikit-learn,
+# and aiplatform only loads once DistilBERT is actually called. In the container,
+# warmup.py has already imported the Classify stack and loaded the model.
+if TYPE_CHECKING:
+    import pandas as pd
+    from google.cloud import bigquery, bigquery_storage
+    from model_registry import ModelRegistry
 
 # ── CONFIG ────────────────────────────────────────────────────────────────────
 PROJECT   = os.getenv("PROJECT_ID",           "sentiment-analysis-steam")
 REGION    = os.getenv("REGION",               "us-central1")
 EP_BERT   = os.getenv("ENDPOINT_ID_DISTILBERT")
-BUNDLE    = os.getenv("LOGREG_BUNDLE_PATH",   "models/best_tfidf_lr_negRecall_20250630-050145.joblib.gz")
-BQ_TABLE  = "sentiment-analysis-steam.steam_reviews.top10-owned-steamcommunity"
+# the LogReg model (LOGREG_BUNDLE_PATH, LOGREG_MODEL_ROOT, LOGREG_MODEL_POLL_SECONDS)
+# is configured in model_registry.py, shared with the container warmup
+# dbt `dashboard_reviews`: partitioned by review_date, clustered by game_name
+BQ_TABLE  = os.getenv("DASHBOARD_TABLE",      "sentiment-analysis-steam.steam_reviews.dashboard_reviews")
+# per-game, per-day score histograms appended by batch_scorer/score.py
+DRIFT_TABLE = os.getenv("DRIFT_TABLE",        "sentiment-analysis-steam.steam_reviews.review_drift")
+DRILLDOWN_MAX_ROWS = int(os.getenv("DASHBOARD_DRILLDOWN_MAX_ROWS", "50000"))
+QUERY_TTL   = int(os.getenv("DASHBOARD_QUERY_TTL",   "3600"))  # seconds a query result may be reused
+VERSION_TTL = int(os.getenv("DASHBOARD_VERSION_TTL", "60"))    # how often to re-check the table for new loads
 
 # ── DistilBERT inference ─────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def bert_endpoint():
+    from google.cloud import aiplatform
+    aiplatform.init(project=PROJECT, location=REGION)
+    return aiplatform.Endpoint(EP_BERT)
+
 def bert_predict(text: str):
     if not EP_BERT:
         return {"error": "ENDPOINT_ID_DISTILBERT not set"}
-    aiplatform.init(project=PROJECT, location=REGION)
-    endpoint = aiplatform.Endpoint(EP_BERT)
-    return endpoint.predict(instances=[{"text": text}]).predictions[0]
+    with metrics.span("prediction", model="distilbert"):
+        return bert_endpoint().predict(instances=[{"text": text}]).predictions[0]
+
+# ── LogReg inference (hot-swappable) ─────────────────────────────────────────
+# one registry per process; its poller prefetches, warms and swaps in new versions.
+# Already loaded when the container started through warmup.py.
+@st.cache_resource(show_spinner="Loading LogReg model…")
+def model_registry() -> "ModelRegistry":
+    from model_registry import shared_registry
+    return shared_registry()
 
-# ── LogReg inference (cached) ────────────────────────────────────────────────
-_logreg = None
 def logreg_predict(text: str):
-    global _logreg
-    if _logreg is None:
-        # download from GCS if needed
-        path = pathlib.Path(tempfile.gettempdir()) / pathlib.Path(BUNDLE).name
-        if str(BUNDLE).startswith("gs://") and not path.exists():
-            subprocess.check_call(["gsutil", "cp", BUNDLE, str(path)])
-        vec, clf = joblib.load(path if path.exists() else BUNDLE)
-        _logreg = (vec, clf)
-    vec, clf = _logreg
-    prob = clf.predict_proba(vec.transform([text]))[0][1]
-    return {"label": "POSITIVE" if prob >= 0.5 else "NEGATIVE", "score": prob}
-
-# ── BigQuery helper ───────────────────────────────────────────────────────────
-def run_bigquery(query: str) -> pd.DataFrame:
-    client = bigquery.Client(project=PROJECT)
-    return client.query(query).to_dataframe()
+    model = model_registry().get()
+    with metrics.span("prediction", model="logreg", version=model.version):
+        prob = model.predict_proba([text])[0]
+    return {"label": "POSITIVE" if prob >= 0.5 else "NEGATIVE", "score": prob, "version": model.version}
+
+# ── BigQuery helpers (cached) ────────────────────────────────────────────────
+# Streamlit re-runs this script on every widget interaction, so the client is
+# shared per process and query results are memoised on (SQL, params, table
+# version). The version is the table's last-modified time: once an ingestion
+# load lands the key changes and the next rerun goes back to the warehouse.
+@st.cache_resource
+def bq_client() -> "bigquery.Client":
+    from google.cloud import bigquery
+    return bigquery.Client(project=PROJECT)
+
+# results are downloaded over the Storage Read API (Arrow) instead of REST pages
+@st.cache_resource
+def bqstorage_client() -> "bigquery_storage.BigQueryReadClient":
+    from google.cloud import bigquery_storage
+    return bigquery_storage.BigQueryReadClient()
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def table_version(table: str) -> str:
+    return bq_client().get_table(table).modified.isoformat()
+
+def _job_config(params: tuple) -> "bigquery.QueryJobConfig":
+    from google.cloud import bigquery
+    return bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ArrayQueryParameter(name, typ, list(val)) if isinstance(val, (list, tuple))
+        else bigquery.ScalarQueryParameter(name, typ, val)
+        for name, typ, val in params
+    ])
+
+@st.cache_data(ttl=QUERY_TTL, show_spinner="Querying BigQuery…")
+def _cached_query(query: str, params: tuple, version: str) -> "pd.DataFrame":
+    # only runs on a cache miss; hit rate = 1 - misses / lookups
+    metrics.inc("dashboard_query_cache_misses_total")
+    with metrics.span("bq_query") as sp:
+        job = bq_client().query(query, job_config=_job_config(params))
+        arrow = job.result().to_arrow(bqstorage_client=bqstorage_client())
+        sp.set(rows=arrow.num_rows, bytes_processed=job.total_bytes_processed)
+    return arrow.to_pandas()
+
+def run_bigquery(query: str, params: tuple = (), table: str = BQ_TABLE) -> "pd.DataFrame":
+    """
+    Run `query` with `params` given as (name, type, value) triples, served from cache
+    when possible; `table` is the table whose modification invalidates the result.
+    """
+    metrics.inc("dashboard_query_cache_lookups_total")
+    return _cached_query(query, tuple(params), table_version(table))
+
+def stream_bigquery(query: str, params: tuple = ()):
+    """Yield DataFrame chunks of `query` as the Storage Read API delivers them (not cached)."""
+    rows = bq_client().query(query, job_config=_job_config(params)).result()
+    yield from rows.to_dataframe_iterable(bqstorage_client=bqstorage_client())
+
+def invalidate_bigquery_cache():
+    table_version.clear()
+    _cached_query.clear()
 
 # ── UI ─────────────────────────────────────────────────────────────────────────
 st.set_page_config(page_title="Steam Sentiment", layout="wide")
@@ -46,6 +123,15 @@ mode = st.sidebar.radio("Choose mode", ["Classify", "Dashboard"])
 
 if mode == "Classify":
     st.header("🎮 Classify a Steam Review")
+    registry = model_registry()
+    st.sidebar.caption(f"LogReg model: `{registry.get().version}`")
+    if registry.root and st.sidebar.button("Check for new model"):
+        with st.spinner("Loading newest model…"):
+            registry.refresh()
+    if registry.previous and st.sidebar.button(f"Roll back to {registry.previous.version}"):
+        registry.rollback()
+    if registry.last_error:
+        st.sidebar.warning(registry.last_error)
     txt = st.text_area("Paste your review here:", height=150)
     if st.button("Run"):
         col1, col2 = st.columns(2)
@@ -62,7 +148,12 @@ if mode == "Classify":
             st.write(f"**{out['label']}** ({out['score']:.1%})")
 
 else:
+    import pandas as pd
+    from drift_monitor import BINS, calibration, summarize
+
     st.header("📊 Sentiment Dashboard")
+    if st.sidebar.button("Refresh data"):
+        invalidate_bigquery_cache()
     # pull distinct games
     df_games = run_bigquery(f"""
       SELECT DISTINCT game_name
@@ -73,17 +164,16 @@ else:
     selected = st.multiselect("Pick games:", choices, default=choices[:3])
 
     if selected:
-        # build safe IN list
-        safe = ",".join("'" + g.replace("'", "''") + "'" for g in selected)
+        # sorted so the same selection in any order hits the same cache entry
         df = run_bigquery(f"""
           SELECT
             game_name,
             COUNTIF(voted_up)   AS positives,
             COUNT(*) - COUNTIF(voted_up) AS negatives
           FROM `{BQ_TABLE}`
-          WHERE game_name IN ({safe})
+          WHERE game_name IN UNNEST(@games)
           GROUP BY game_name
-        """)
+        """, params=(("games", "STRING", tuple(sorted(selected))),))
         df["total"] = df["positives"] + df["negatives"]
         df["pct_pos"] = (df["positives"]/df["total"]*100).round(1)
         df["pct_neg"] = (df["negatives"]/df["total"]*100).round(1)
@@ -91,6 +181,71 @@ else:
         st.dataframe(df[["game_name","pct_pos","pct_neg"]])
         st.bar_chart(df.set_index("game_name")[["pct_pos","pct_neg"]])
 
+        with st.expander("Drill down into reviews"):
+            game  = st.selectbox("Game:", selected)
+            since = st.date_input("Reviews since:", dt.date.today() - dt.timedelta(days=30))
+            if st.button("Load reviews"):
+                table = None
+                chunks = stream_bigquery(f"""
+                  SELECT recommendationid, review_date, voted_up, review
+                  FROM `{BQ_TABLE}`
+                  WHERE game_name = @game AND review_date >= @since
+                  ORDER BY review_date DESC
+                  LIMIT @max_rows
+                """, params=(("game", "STRING", game),
+                             ("since", "DATE", since),
+                             ("max_rows", "INT64", DRILLDOWN_MAX_ROWS)))
+                # render the first chunk straight away, append the rest as they arrive
+                for chunk in chunks:
+                    if table is None:
+                        table = st.dataframe(chunk)
+                    else:
+                        table.add_rows(chunk)
+                if table is None:
+                    st.info(f"No reviews for {game} since {since}.")
+
+        with st.expander("Model quality & drift"):
+            # scores vs voted_up, from the histograms each batch-scoring run appends
+            versions = run_bigquery(f"""
+              SELECT DISTINCT model_version FROM `{DRIFT_TABLE}` ORDER BY model_version DESC
+            """, table=DRIFT_TABLE)["model_version"].tolist()
+            if not versions:
+                st.info("No scored reviews yet — run batch_scorer/score.py.")
+            else:
+                # prediction/drift rows and the registry share one version format (model_bundle.py)
+                from model_registry import live_version
+                live = live_version()
+                version = st.selectbox("Model version:", versions,
+                                       index=versions.index(live) if live in versions else 0,
+                                       format_func=lambda v: f"{v} (live)" if v == live else v)
+                drift_since = st.date_input("Drift since:", dt.date.today() - dt.timedelta(days=90))
+                hist = run_bigquery(f"""
+                  SELECT game_name, review_date, bin,
+                         SUM(positives) AS positives, SUM(negatives) AS negatives, SUM(score_sum) AS score_sum
+                  FROM `{DRIFT_TABLE}`
+                  WHERE model_version = @version AND game_name IN UNNEST(@games) AND review_date >= @since
+                  GROUP BY game_name, review_date, bin
+                """, params=(("version", "STRING", version),
+                             ("games", "STRING", tuple(sorted(selected))),
+                             ("since", "DATE", drift_since)), table=DRIFT_TABLE)
+                if hist.empty:
+                    st.info(f"No scored reviews for these games since {drift_since}.")
+                else:
+                    per_game = summarize(hist, ["game_name"])
+                    st.dataframe(per_game[["game_name", "reviews", "auc", "accuracy", "neg_recall",
+                                           "ece", "pos_rate", "mean_score"]].round(3))
+                    daily = summarize(hist, ["review_date"]).set_index("review_date")
+                    st.caption("Daily quality (AUC is approximate, from 0.01-wide score bins)")
+                    st.line_chart(daily[["auc", "accuracy", "neg_recall"]])
+                    st.caption("Label vs score drift: share voted up and mean predicted score")
+                    st.line_chart(daily[["pos_rate", "mean_score"]])
+                    totals = hist.groupby("bin")[["positives", "negatives", "score_sum"]].sum() \
+                                 .reindex(range(BINS), fill_value=0)
+                    curve = calibration(totals["positives"], totals["negatives"], totals["score_sum"])
+                    st.caption("Calibration: observed share voted up per predicted-score bin")
+                    st.line_chart(pd.DataFrame({"predicted": curve["mean_score"], "observed": curve["observed"]},
+                                               index=curve["bin_start"]))
+
     else:
         st.info("Select at least one game above.")
 #
\ No newline at end of file
@@ -0,0 +1,92 @@
+# app/tests/conftest.py
+"""
+Shared fixtures for the app tests. The app's modules are flat files that find their
+siblings through sys.path (as in the Docker image), and the LogReg model defaults
+to the checked-in bundle.
+"""
+import datetime as dt
+import os
+import pathlib
+import sys
+
+import pyarrow as pa
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+APP = ROOT / "app" / "streamlit_app.py"
+BUNDLE = ROOT / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz"
+
+for d in ("app", "lr_tfidf_trainer", "ingestion_service", "batch_scorer"):
+    sys.path.insert(0, str(ROOT / d))
+os.environ.setdefault("METRICS_LOG_SPANS", "0")
+os.environ.setdefault("LOGREG_BUNDLE_PATH", str(BUNDLE))
+
+class FakeBigQuery:
+    """
+    Stands in for bigquery.Client / BigQueryReadClient: answers the dashboard's queries
+    from small in-memory tables and records every query with its parameters.
+    """
+
+    def __init__(self, games: dict):
+        self.games = games                  # game_name -> (positives, negatives)
+        self.queries = []                   # (sql, {name: (type, value)}, bqstorage_client)
+        self.modified = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+
+    # bigquery.Client(project=...)
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def get_table(self, table):
+        return type("Table", (), {"modified": self.modified})()
+
+    def query(self, sql, job_config=None):
+        params = {}
+        for p in (job_config.query_parameters if job_config else []):
+            value = p.values if hasattr(p, "values") else p.value
+            params[p.name] = (getattr(p, "array_type", None) or p.type_, value)
+        return _FakeJob(self, sql, params)
+
+    def answer(self, sql: str, params: dict) -> pa.Table:
+        if "SELECT DISTINCT game_name" in sql:
+            return pa.table({"game_name": sorted(self.games)})
+        if "COUNTIF(voted_up)" in sql:
+            picked = [g for g in params["games"][1] if g in self.games]
+            return pa.table({"game_name": picked,
+                             "positives": [self.games[g][0] for g in picked],
+                             "negatives": [self.games[g][1] for g in picked]})
+        if "SELECT DISTINCT model_version" in sql:
+            return pa.table({"model_version": pa.array([], pa.string())})
+        raise AssertionError(f"unexpected query: {sql}")
+
+class _FakeJob:
+    total_bytes_processed = 0
+
+    def __init__(self, fake, sql, params):
+        self.fake, self.sql, self.params = fake, sql, params
+
+    def result(self):
+        return self
+
+    def to_arrow(self, bqstorage_client=None):
+        self.fake.queries.append((self.sql, self.params, bqstorage_client))
+        return self.fake.answer(self.sql, self.params)
+
+@pytest.fixture
+def fake_bq(monkeypatch):
+    """Patches the BigQuery clients the dashboard creates and clears Streamlit's caches."""
+    import streamlit as st
+    from google.cloud import bigquery, bigquery_storage
+    fake = FakeBigQuery({"Apex Legends": (70, 30), "Dota 2": (40, 60), "Tom Clancy's Rainbow Six Siege": (5, 5)})
+    monkeypatch.setattr(bigquery, "Client", fake)
+    monkeypatch.setattr(bigquery_storage, "BigQueryReadClient", lambda *a, **k: "read-client")
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield fake
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+@pytest.fixture
+def app_test():
+    """The real streamlit_app.py under Streamlit's test runner."""
+    from streamlit.testing.v1 import AppTest
+    return lambda: AppTest.from_file(str(APP), default_timeout=120)
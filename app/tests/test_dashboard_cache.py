@@ -0,0 +1,50 @@
+# app/tests/test_dashboard_cache.py
+"""Dashboard reruns are served from Streamlit's caches instead of going back to BigQuery."""
+import pytest
+
+pytest.importorskip("streamlit")
+
+def dashboard(app_test):
+    at = app_test().run()
+    at.sidebar.radio[0].set_value("Dashboard").run()
+    assert not at.exception, at.exception
+    return at
+
+def test_reruns_and_new_sessions_hit_the_query_cache(fake_bq, app_test):
+    at = dashboard(app_test)
+    queries = len(fake_bq.queries)
+    assert queries == 3          # games, per-game counts, drift model versions
+
+    at.run()                     # any widget interaction reruns the whole script
+    dashboard(app_test)          # a second browser session in the same process
+    assert len(fake_bq.queries) == queries
+
+def test_refresh_button_invalidates_the_cache(fake_bq, app_test):
+    at = dashboard(app_test)
+    queries = len(fake_bq.queries)
+    next(b for b in at.sidebar.button if b.label == "Refresh data").click().run()
+    assert len(fake_bq.queries) == 2 * queries
+
+def test_new_table_version_invalidates_the_cache(fake_bq, app_test):
+    import streamlit as st
+    dashboard(app_test)
+    queries = len(fake_bq.queries)
+    # a load lands: the table's modification time changes once the version TTL expires
+    fake_bq.modified = fake_bq.modified.replace(year=2026)
+    st.cache_data.clear()
+    dashboard(app_test)
+    assert len(fake_bq.queries) == 2 * queries
+
+def test_classify_reuses_the_loaded_model(app_test, monkeypatch):
+    import model_registry
+    model_registry.shared_registry()
+    loads = []
+    monkeypatch.setattr(model_registry, "load", lambda *a, **k: loads.append(a))
+
+    for _ in range(2):
+        at = app_test().run()
+        at.text_area[0].input("Great game, had a lot of fun with friends.")
+        next(b for b in at.button if b.label == "Run").click().run()
+        assert not at.exception, at.exception
+        assert any(m.value.startswith("**POSITIVE**") for m in at.markdown)
+    assert loads == []
@@ -0,0 +1,41 @@
+# app/tests/test_dashboard_queries.py
+"""Dashboard queries are parameterized and read over the Storage Read API."""
+import pytest
+
+pytest.importorskip("streamlit")
+
+GAMES = ["Apex Legends", "Dota 2", "Tom Clancy's Rainbow Six Siege"]
+
+def dashboard(app_test):
+    at = app_test().run()
+    at.sidebar.radio[0].set_value("Dashboard").run()
+    assert not at.exception, at.exception
+    return at
+
+def per_game_queries(fake_bq):
+    return [(sql, params) for sql, params, _ in fake_bq.queries if "COUNTIF(voted_up)" in sql]
+
+def test_selected_games_are_a_query_parameter(fake_bq, app_test):
+    dashboard(app_test)
+    (sql, params), = per_game_queries(fake_bq)
+    assert "UNNEST(@games)" in sql
+    # user-visible values never reach the SQL text (the apostrophe would break it)
+    assert not any(g in sql for g in GAMES)
+    assert params["games"] == ("STRING", GAMES)
+
+def test_results_reach_the_page(fake_bq, app_test):
+    at = dashboard(app_test)
+    df = at.dataframe[0].value.set_index("game_name")
+    assert df.loc["Apex Legends", "pct_pos"] == 70.0
+    assert df.loc["Dota 2", "pct_neg"] == 60.0
+    assert df.loc["Tom Clancy's Rainbow Six Siege", "pct_pos"] == 50.0
+
+def test_selection_order_shares_one_cache_entry(fake_bq, app_test):
+    at = dashboard(app_test)
+    at.multiselect[0].set_value(["Dota 2", "Apex Legends"]).run()
+    at.multiselect[0].set_value(["Apex Legends", "Dota 2"]).run()
+    assert [p["games"][1] for _, p in per_game_queries(fake_bq)] == [GAMES, ["Apex Legends", "Dota 2"]]
+
+def test_results_are_read_with_the_storage_read_client(fake_bq, app_test):
+    dashboard(app_test)
+    assert {client for _, _, client in fake_bq.queries} == {"read-client"}
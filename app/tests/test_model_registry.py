@@ -0,0 +1,81 @@
+# app/tests/test_model_registry.py
+"""The registry swaps in newer versions, skips broken ones and rolls back without reloading."""
+import pathlib
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+BUNDLE = pathlib.Path(__file__).resolve().parents[2] / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz"
+
+class ModelRoot:
+    """A local model root laid out like gs://<bucket>/models/lr-tfidf/."""
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def publish(self, stamp: str, broken: bool = False):
+        bundle = pathlib.Path(self.path) / stamp / "model.joblib.gz"
+        bundle.parent.mkdir()
+        if broken:
+            bundle.write_bytes(b"not a joblib bundle")
+        else:
+            bundle.symlink_to(BUNDLE)
+
+@pytest.fixture
+def root(tmp_path):
+    return ModelRoot(tmp_path)
+
+def test_newest_version_is_swapped_in(root):
+    root.publish("20250701-000000")
+    registry = ModelRegistry(root=root.path, poll_seconds=0)
+    first = registry.get()
+    assert first.version == "20250701-000000"
+    assert not registry.refresh()
+
+    root.publish("20250801-000000")
+    assert registry.refresh()
+    assert registry.current.version == "20250801-000000"
+    assert registry.previous is first
+    # a request still holding the old model can keep using it
+    assert first.predict_proba(["great game"]).shape == (1,)
+
+def test_broken_version_is_skipped(root):
+    root.publish("20250701-000000")
+    registry = ModelRegistry(root=root.path, poll_seconds=0)
+    registry.get()
+    root.publish("20250801-000000", broken=True)
+    assert not registry.refresh()
+    assert registry.current.version == "20250701-000000"
+    assert registry.last_error.startswith("20250801-000000")
+    assert registry.latest()[0] == "20250701-000000"
+
+def test_rollback_is_not_undone_by_the_poller(root):
+    root.publish("20250701-000000")
+    registry = ModelRegistry(root=root.path, poll_seconds=0)
+    assert not registry.rollback()
+    registry.get()
+    root.publish("20250801-000000")
+    registry.refresh()
+
+    assert registry.rollback()
+    assert registry.current.version == "20250701-000000"
+    assert registry.previous.version == "20250801-000000"
+    assert not registry.refresh()
+    assert registry.current.version == "20250701-000000"
+
+def test_pinned_bundle_is_served_without_versions(root, monkeypatch):
+    registry = ModelRegistry(root=root.path, pinned=str(BUNDLE), poll_seconds=0)
+    assert registry.get().version == "best_tfidf_lr_negRecall_20250630-050145"
+
+    def unreachable(root):
+        raise PermissionError("403 storage.objects.list")
+    monkeypatch.setattr(model_registry, "list_versions", unreachable)
+    registry = ModelRegistry(root="gs://bucket/models/lr-tfidf", pinned=str(BUNDLE), poll_seconds=0)
+    assert registry.get().version == "best_tfidf_lr_negRecall_20250630-050145"
+    assert "PermissionError" in registry.last_error
+
+def test_no_model_at_all_is_an_error(root):
+    with pytest.raises(RuntimeError, match="No LogReg model"):
+        ModelRegistry(root=root.path, poll_seconds=0).get()
@@ -0,0 +1,52 @@
+# app/tests/test_warmup.py
+"""Container warm-up: the model the Classify tab uses is loaded and exercised before the server starts."""
+import pathlib
+import sys
+
+import pytest
+
+import model_registry
+import warmup
+
+BUNDLE = pathlib.Path(__file__).resolve().parents[2] / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz"
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    """No process-wide registry yet; the pinned checked-in bundle, no poller."""
+    monkeypatch.setattr(model_registry, "_shared", None)
+    monkeypatch.setattr(model_registry, "MODEL_ROOT", None)
+    monkeypatch.setattr(model_registry, "PINNED_BUNDLE", str(BUNDLE))
+    monkeypatch.setattr(model_registry, "MODEL_POLL", 0)
+    yield
+    if model_registry._shared is not None:
+        model_registry._shared.stop()
+
+def test_warm_loads_the_shared_registry(fresh_registry):
+    assert model_registry.live_version() is None
+    timings = warmup.warm()
+    assert set(timings) == {"imports", "model", "first_prediction", "total"}
+    assert all(v >= 0 for v in timings.values())
+    assert timings["total"] >= timings["model"] + timings["first_prediction"]
+    assert model_registry.live_version() == "best_tfidf_lr_negRecall_20250630-050145"
+
+def test_shared_registry_is_built_once(fresh_registry):
+    first = model_registry.shared_registry()
+    assert model_registry.shared_registry() is first
+    assert first._thread is None  # no model root: nothing to poll
+    # the Classify tab sees the model warm() already loaded
+    assert first.get() is first.current
+
+def test_preload_skips_bert_without_an_endpoint(monkeypatch, capsys):
+    monkeypatch.delenv("ENDPOINT_ID_DISTILBERT", raising=False)
+    imported = []
+    monkeypatch.setattr(warmup, "import_mode", lambda mode: imported.append(mode) or 0.0)
+    warmup.preload(["dashboard", "bert"])
+    assert imported == ["dashboard"]
+    assert "Preloaded dashboard" in capsys.readouterr().out
+
+def test_preload_failures_do_not_stop_the_other_modes(monkeypatch, capsys):
+    monkeypatch.setenv("ENDPOINT_ID_DISTILBERT", "123")
+    monkeypatch.setitem(sys.modules, "google.cloud.aiplatform", None)  # import fails
+    warmup.preload(["bert", "dashboard"])
+    out = capsys.readouterr().out
+    assert "Could not preload bert imports" in out and "Preloaded dashboard" in out
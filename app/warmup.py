@@ -0,0 +1,101 @@
+# app/warmup.py
+"""
+Container entrypoint: warms the process up, then hands it over to Streamlit.
+
+Streamlit only executes streamlit_app.py once a browser session connects. Before
+this entrypoint, the first visitor after a Cloud Run scale-from-zero paid for
+importing scikit-learn, unpickling the LR bundle and a cold first prediction. This
+script runs in the same process as the server, before it binds its port:
+
+  1. imports the Classify stack and loads the model with
+     model_registry.shared_registry() (download, unpickle, featurizer, warm-up
+     predictions), the same registry instance the Classify tab uses
+  2. times one prediction on that model
+  3. imports the other modes' dependencies on a background thread (APP_PRELOAD,
+     default "dashboard,bert"; bert only when ENDPOINT_ID_DISTILBERT is set)
+  4. runs `streamlit run streamlit_app.py <args>` in this process
+
+The server starts listening only after step 2, so a 200 from /_stcore/health means
+the model is warm. Cloud Run's default TCP startup probe waits for the same bind.
+
+    python warmup.py --server.address 0.0.0.0 --server.port 8080
+    python warmup.py --no-serve      # warm up, print the timings and exit
+"""
+import time
+
+T0 = time.perf_counter()
+
+import importlib
+import os
+import pathlib
+import sys
+import threading
+
+HERE = pathlib.Path(__file__).resolve().parent
+APP = HERE / "streamlit_app.py"
+# same layout as streamlit_app.py: next to it in the image, sibling directories in the repo
+sys.path.append(str(HERE.parent / "lr_tfidf_trainer"))
+sys.path.append(str(HERE.parent / "ingestion_service"))
+sys.path.append(str(HERE.parent / "batch_scorer"))
+
+# imports of each mode, as streamlit_app.py does them lazily (streamlit itself comes with the server)
+MODE_IMPORTS = {
+    "classify":  ["metrics", "model_registry"],
+    "dashboard": ["pandas", "google.cloud.bigquery", "google.cloud.bigquery_storage", "drift_monitor"],
+    "bert":      ["google.cloud.aiplatform"],
+}
+PRELOAD = [m.strip() for m in os.getenv("APP_PRELOAD", "dashboard,bert").split(",") if m.strip()]
+
+def import_mode(mode: str) -> float:
+    t = time.perf_counter()
+    for name in MODE_IMPORTS[mode]:
+        importlib.import_module(name)
+    return time.perf_counter() - t
+
+def preload(modes: list):
+    """Imports the other modes' dependencies; runs on a daemon thread while Streamlit starts."""
+    for mode in modes:
+        if mode == "bert" and not os.getenv("ENDPOINT_ID_DISTILBERT"):
+            continue
+        try:
+            print(f"📥 Preloaded {mode} imports in {import_mode(mode):.2f}s")
+        except Exception as e:
+            print(f"⚠️ Could not preload {mode} imports - {type(e).__name__}: {e}")
+
+def warm() -> dict:
+    """Loads and exercises the Classify path; returns the stage timings in seconds."""
+    timings = {"imports": import_mode("classify")}
+    import metrics
+    from model_registry import shared_registry
+
+    t = time.perf_counter()
+    model = shared_registry().get()
+    timings["model"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    model.predict_proba(["Fun with friends, but the servers keep dropping."])
+    timings["first_prediction"] = time.perf_counter() - t
+    timings["total"] = time.perf_counter() - T0
+
+    metrics.event("startup_warm", version=model.version, **{k: round(v, 4) for k, v in timings.items()})
+    print(f"🔥 Warm in {timings['total']:.2f}s - imports {timings['imports']:.2f}s, model {model.version} "
+          f"{timings['model']:.2f}s, first prediction {timings['first_prediction'] * 1e3:.1f} ms")
+    return timings
+
+def main():
+    args = sys.argv[1:]
+    serve = "--no-serve" not in args
+    args = [a for a in args if a != "--no-serve"]
+    warm()
+    modes = [m for m in PRELOAD if m in MODE_IMPORTS and m != "classify"]
+    if not serve:
+        preload(modes)
+        return
+    threading.Thread(target=preload, args=(modes,), name="preload", daemon=True).start()
+
+    from streamlit.web import cli as stcli
+    sys.argv = ["streamlit", "run", str(APP), *args]
+    sys.exit(stcli.main())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# batch_scorer/drift_monitor.py
+"""
+Incremental model-quality statistics for scored reviews.
+
+Every review that score.py scores also carries its `voted_up` label, so each scoring
+run can update quality statistics without re-evaluating anything already scored.
+The statistic is a fixed-bin score histogram split by label: per
+(model_version, app_id, game_name, review_date) and score bin (BINS equal-width bins
+over [0, 1]) it keeps
+
+    positives   reviews with voted_up = true whose score fell in the bin
+    negatives   reviews with voted_up = false
+    score_sum   sum of their scores
+
+Histograms are additive, so a run only appends the rows for the reviews it scored
+(O(new rows)), and any rollup (a game over all days, all games on one day) is a SUM
+over those rows. From the merged histograms `hist_metrics` derives
+
+  * confusion counts at the 0.5 threshold (a bin edge, so they are exact)
+  * approximate ROC AUC (Mann-Whitney over bins; ties within a bin count half)
+  * calibration: mean score vs observed positive rate per bin, and the expected
+    calibration error (ECE)
+
+The rows land in the `review_drift` table next to the predictions, and the
+Streamlit dashboard charts them with `summarize`.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+BINS = 100                  # bin width 0.01; the 0.5 threshold is the edge of bin BINS // 2
+THRESHOLD_BIN = BINS // 2
+KEY_COLUMNS = ["model_version", "app_id", "game_name", "review_date"]
+
+DRIFT_SCHEMA = pa.schema([
+    ("model_version", pa.string()),
+    ("app_id",        pa.int64()),
+    ("game_name",     pa.string()),
+    ("review_date",   pa.date32()),
+    ("bin",           pa.int64()),
+    ("positives",     pa.int64()),
+    ("negatives",     pa.int64()),
+    ("score_sum",     pa.float64()),
+])
+
+def score_bins(scores) -> np.ndarray:
+    return np.clip((np.asarray(scores, dtype=np.float64) * BINS).astype(np.int64), 0, BINS - 1)
+
+def merge(tables: list) -> pa.Table:
+    """Sums histogram rows with the same key and bin (also compacts an existing table)."""
+    tables = [t for t in tables if t.num_rows]
+    if not tables:
+        return DRIFT_SCHEMA.empty_table()
+    merged = pa.concat_tables(tables).group_by(KEY_COLUMNS + ["bin"]).aggregate(
+        [("positives", "sum"), ("negatives", "sum"), ("score_sum", "sum")])
+    merged = merged.rename_columns([c[:-len("_sum")] if c.endswith("_sum") else c for c in merged.column_names])
+    return merged.select(DRIFT_SCHEMA.names).cast(DRIFT_SCHEMA)
+
+def drift_rows(model_version: str, scores, meta: pa.Table) -> pa.Table:
+    """
+    Histogram rows for one batch of scored reviews. `meta` holds voted_up, app_id,
+    game_name and review_date aligned with `scores`; rows without a label are skipped.
+    """
+    labelled = pc.is_valid(meta.column("voted_up"))
+    meta = meta.filter(labelled)
+    scores = np.asarray(scores, dtype=np.float64)[labelled.to_numpy(zero_copy_only=False)]
+    pos = pc.cast(meta.column("voted_up"), pa.int64())
+    table = pa.table({
+        "model_version": pa.array([model_version] * meta.num_rows, pa.string()),
+        "app_id":        pc.cast(meta.column("app_id"), pa.int64()),
+        "game_name":     pc.cast(meta.column("game_name"), pa.string()),
+        "review_date":   pc.cast(meta.column("review_date"), pa.date32()),
+        "bin":           score_bins(scores),
+        "positives":     pos,
+        "negatives":     pc.subtract(1, pos),
+        "score_sum":     scores,
+    })
+    return merge([table])
+
+def hist_metrics(pos: np.ndarray, neg: np.ndarray, score_sum: np.ndarray) -> dict:
+    """Quality metrics from (groups, BINS) histograms; every value is an array with one entry per group."""
+    pos, neg, score_sum = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (pos, neg, score_sum))
+    P, N = pos.sum(axis=1), neg.sum(axis=1)
+    n = P + N
+    tp, fn = pos[:, THRESHOLD_BIN:].sum(axis=1), pos[:, :THRESHOLD_BIN].sum(axis=1)
+    fp, tn = neg[:, THRESHOLD_BIN:].sum(axis=1), neg[:, :THRESHOLD_BIN].sum(axis=1)
+    # positives scored strictly above each bin
+    pos_above = np.cumsum(pos[:, ::-1], axis=1)[:, ::-1] - pos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc = (neg * (pos_above + 0.5 * pos)).sum(axis=1) / (P * N)
+        return {
+            "reviews": n, "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+            "accuracy": (tp + tn) / n,
+            "neg_recall": tn / (tn + fp),
+            "pos_rate": P / n,
+            "mean_score": score_sum.sum(axis=1) / n,
+            "auc": np.where(P * N > 0, auc, np.nan),
+            "ece": np.abs(score_sum - pos).sum(axis=1) / n,
+        }
+
+def calibration(pos, neg, score_sum, bins: int = 10) -> dict:
+    """Reliability curve on `bins` coarser bins: mean predicted score vs observed positive rate."""
+    fold = lambda a: np.asarray(a, dtype=np.float64).reshape(bins, BINS // bins).sum(axis=1)
+    pos, n, s = fold(pos), fold(pos) + fold(neg), fold(score_sum)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {"bin_start": np.arange(bins) / bins, "reviews": n, "mean_score": s / n, "observed": pos / n}
+
+def dense(rows, by: list) -> tuple:
+    """
+    Pivots histogram rows (a pandas DataFrame with `by`, bin, positives, negatives,
+    score_sum) to (keys DataFrame, pos, neg, score_sum) with one (BINS,) row per group.
+    """
+    grouped = rows.groupby(list(by) + ["bin"], as_index=False)[["positives", "negatives", "score_sum"]].sum()
+    # ngroup(sort=False) numbers groups in order of first appearance, as drop_duplicates keeps them
+    index = grouped.groupby(list(by), sort=False).ngroup().to_numpy()
+    keys = grouped[list(by)].drop_duplicates().reset_index(drop=True)
+    bins = grouped["bin"].to_numpy(dtype=np.int64)
+    out = []
+    for col in ("positives", "negatives", "score_sum"):
+        hist = np.zeros((len(keys), BINS))
+        np.add.at(hist, (index, bins), grouped[col].to_numpy(dtype=np.float64))
+        out.append(hist)
+    return (keys, *out)
+
+def summarize(rows, by: list):
+    """One row of metrics per `by` group (pandas in, pandas out)."""
+    keys, pos, neg, score_sum = dense(rows, by)
+    for name, values in hist_metrics(pos, neg, score_sum).items():
+        keys[name] = values
+    return keys.sort_values(list(by)).reset_index(drop=True)
+
+class DriftMonitor:
+    """Accumulates histogram rows between writes, and run-level histograms for the whole run."""
+
+    def __init__(self, model_version: str):
+        self.model_version = model_version
+        self._parts = []
+        self._run = np.zeros((3, BINS))   # positives, negatives, score_sum over all games and days
+
+    def update(self, scores, meta: pa.Table):
+        rows = drift_rows(self.model_version, scores, meta)
+        self._parts.append(rows)
+        bins = rows.column("bin").to_numpy()
+        for i, col in enumerate(("positives", "negatives", "score_sum")):
+            self._run[i] += np.bincount(bins, weights=rows.column(col).to_numpy(), minlength=BINS)
+
+    def take(self) -> pa.Table:
+        """Merged rows since the last take(); this is what gets appended to the drift table."""
+        merged, self._parts = merge(self._parts), []
+        return merged
+
+    def overall(self) -> dict:
+        """Run-level metrics (all games and days together)."""
+        return {k: float(v[0]) for k, v in hist_metrics(*self._run).items()}
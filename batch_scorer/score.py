@@ -0,0 +1,360 @@
+# batch_scorer/score.py
+"""
+Bulk offline scoring of ingested reviews with the TF-IDF + LogReg bundle.
+
+Reads review text in Arrow chunks from the warehouse (BigQuery, or a local
+DuckDB file as a stand-in), scores the chunks across a process pool and
+bulk-loads (recommendationid, model_version, score, label) rows into the
+predictions table. Only rows without a prediction for the current model
+version are read, so re-running after an ingestion only scores the delta.
+
+The same run compares the new scores with the reviews' `voted_up` labels and
+appends per-game, per-day score histograms to the drift table (drift_monitor.py),
+so model quality is tracked incrementally rather than by re-evaluating everything.
+
+With --clusters (the clusters/ output of lr_tfidf_trainer/dedup.py), only one review
+per near-duplicate cluster is featurized and scored in a run; the other members of
+the cluster get its score.
+
+Example (local stand-in seeded from the sample JSONL):
+    python score.py --source duckdb --duckdb-path reviews.duckdb \
+        --load-jsonl "../reviews_data/*/*.jsonl" \
+        --bundle ../models/best_tfidf_lr_negRecall_20250630-050145.joblib.gz
+"""
+import argparse
+import io
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# the LR featurizer and bundle naming live with the trainer; the Dockerfile copies them next to this file
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "lr_tfidf_trainer"))
+from fast_tfidf import featurizer_for
+from model_bundle import cache_path, fetch, version_from_path
+
+from drift_monitor import DRIFT_SCHEMA, DriftMonitor
+
+PREDICTIONS_SCHEMA = pa.schema([
+    ("recommendationid", pa.string()),
+    ("model_version",    pa.string()),
+    ("score",            pa.float64()),
+    ("label",            pa.string()),
+])
+
+# --- Model bundle helpers ---
+def fetch_bundle(bundle: str) -> str:
+    """Returns a local path for `bundle`; gs:// URIs are downloaded once into the temp dir, atomically."""
+    if bundle.startswith("gs://") and not cache_path(bundle).exists():
+        print(f"Downloading {bundle} → {cache_path(bundle)}")
+    return fetch(bundle)
+
+# --- Worker side: each process unpickles the bundle once ---
+_model = None
+
+def _init_worker(bundle_path: str):
+    global _model
+    vec, clf = joblib.load(bundle_path)
+    _model = (featurizer_for(vec), clf)
+
+def score_chunk(ids: list, texts: list):
+    if not texts:
+        return ids, np.empty(0)
+    vec, clf = _model
+    # copy-pasta / templated reviews: featurize and score each distinct text once
+    distinct = {}
+    index = [distinct.setdefault(t, len(distinct)) for t in texts]
+    probs = clf.predict_proba(vec.transform(list(distinct)))[:, 1]
+    return ids, probs[index]
+
+# --- Near-duplicate clusters (dedup.py) ---
+def load_clusters(uri: str) -> dict:
+    """{recommendationid: representative_id} for reviews that are not their cluster's representative."""
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+    filesystem, path = fs.FileSystem.from_uri(uri if "://" in uri else os.path.abspath(uri))
+    table = ds.dataset(path, filesystem=filesystem, format="parquet").to_table(
+        columns=["recommendationid", "representative_id"])
+    return {i: r for i, r in zip(table.column(0).to_pylist(), table.column(1).to_pylist()) if i != r}
+
+class ClusterFanout:
+    """
+    Scores the first review of each near-duplicate cluster seen in a run and copies its
+    score to the cluster's other members. Reviews outside any cluster are scored as usual.
+    """
+
+    def __init__(self, clusters: dict):
+        self.clusters = clusters
+        self.representatives = set(clusters.values())
+        self.claimed, self.scores = set(), {}
+        self.reviews = self.scored = 0
+
+    def _key(self, rid):
+        return self.clusters.get(rid) or (rid if rid in self.representatives else None)
+
+    def select(self, ids: list, texts: list) -> tuple:
+        """(cluster keys, ids to score, their texts) for a chunk; each cluster is claimed once."""
+        keys, picked = [self._key(i) for i in ids], []
+        for pos, key in enumerate(keys):
+            if key is None or key not in self.claimed:
+                picked.append(pos)
+                if key is not None:
+                    self.claimed.add(key)
+        self.reviews += len(ids)
+        self.scored += len(picked)
+        return keys, [ids[p] for p in picked], [texts[p] for p in picked]
+
+    def fan_out(self, ids: list, keys: list, scored_ids: list, probs) -> np.ndarray:
+        """Scores for every review of the chunk. Chunks must be resolved in submission order."""
+        own = dict(zip(scored_ids, probs))
+        for rid, prob in own.items():
+            key = self._key(rid)
+            if key is not None:
+                self.scores[key] = prob
+        return np.array([own[i] if i in own else self.scores[k] for i, k in zip(ids, keys)], dtype=np.float64)
+
+# --- Warehouse backends ---
+class BigQueryBackend:
+    def __init__(self, project_id: str, source_table: str, predictions_table: str, drift_table: str = None):
+        from google.cloud import bigquery, bigquery_storage
+        self.bigquery = bigquery
+        self.client = bigquery.Client(project=project_id)
+        self.bqstorage = bigquery_storage.BigQueryReadClient()
+        self.source_table = source_table
+        self.predictions_table = predictions_table
+        self.drift_table = drift_table
+
+    def ensure_predictions_table(self):
+        schema = [
+            self.bigquery.SchemaField("recommendationid", "STRING"),
+            self.bigquery.SchemaField("model_version", "STRING"),
+            self.bigquery.SchemaField("score", "FLOAT64"),
+            self.bigquery.SchemaField("label", "STRING"),
+        ]
+        table = self.bigquery.Table(self.predictions_table, schema=schema)
+        table.clustering_fields = ["model_version"]
+        self.client.create_table(table, exists_ok=True)
+
+    def ensure_drift_table(self):
+        types = {pa.string(): "STRING", pa.int64(): "INT64", pa.float64(): "FLOAT64", pa.date32(): "DATE"}
+        schema = [self.bigquery.SchemaField(f.name, types[f.type]) for f in DRIFT_SCHEMA]
+        table = self.bigquery.Table(self.drift_table, schema=schema)
+        table.time_partitioning = self.bigquery.TimePartitioning(field="review_date")
+        table.clustering_fields = ["model_version", "game_name"]
+        self.client.create_table(table, exists_ok=True)
+
+    def unscored_batches(self, model_version: str):
+        query = f"""
+          SELECT r.recommendationid, ANY_VALUE(r.review) AS review,
+                 ANY_VALUE(r.voted_up) AS voted_up, ANY_VALUE(r.app_id) AS app_id,
+                 ANY_VALUE(r.game_name) AS game_name,
+                 DATE(TIMESTAMP_SECONDS(ANY_VALUE(r.timestamp_created))) AS review_date
+          FROM `{self.source_table}` r
+          LEFT JOIN `{self.predictions_table}` p
+            ON p.recommendationid = r.recommendationid AND p.model_version = @model_version
+          WHERE p.recommendationid IS NULL AND r.review IS NOT NULL
+          GROUP BY r.recommendationid
+        """
+        job_config = self.bigquery.QueryJobConfig(query_parameters=[
+            self.bigquery.ScalarQueryParameter("model_version", "STRING", model_version),
+        ])
+        rows = self.client.query(query, job_config=job_config).result()
+        yield from rows.to_arrow_iterable(bqstorage_client=self.bqstorage)
+
+    def write(self, table: pa.Table, destination: str = None):
+        buf = io.BytesIO()
+        pq.write_table(table, buf)
+        buf.seek(0)
+        job_config = self.bigquery.LoadJobConfig(
+            source_format=self.bigquery.SourceFormat.PARQUET,
+            write_disposition=self.bigquery.WriteDisposition.WRITE_APPEND,
+        )
+        load_job = self.client.load_table_from_file(buf, destination or self.predictions_table, job_config=job_config)
+        load_job.result()
+        return load_job.output_rows
+
+class DuckDBBackend:
+    def __init__(self, path: str, source_table: str, predictions_table: str, drift_table: str = None):
+        import duckdb
+        self.con = duckdb.connect(path)
+        self.source_table = source_table
+        self.predictions_table = predictions_table
+        self.drift_table = drift_table
+
+    def load_jsonl(self, pattern: str):
+        print(f"Seeding {self.source_table} from {pattern}...")
+        self.con.execute(f"""
+          CREATE TABLE IF NOT EXISTS {self.source_table} AS
+          SELECT CAST(recommendationid AS VARCHAR) AS recommendationid, review,
+                 voted_up, app_id, game_name, timestamp_created
+          FROM read_json_auto(?, format='newline_delimited')
+        """, [pattern])
+
+    def ensure_predictions_table(self):
+        self.con.execute(f"""
+          CREATE TABLE IF NOT EXISTS {self.predictions_table} (
+            recommendationid VARCHAR, model_version VARCHAR, score DOUBLE, label VARCHAR
+          )
+        """)
+
+    def ensure_drift_table(self):
+        self.con.execute(f"""
+          CREATE TABLE IF NOT EXISTS {self.drift_table} (
+            model_version VARCHAR, app_id BIGINT, game_name VARCHAR, review_date DATE,
+            bin BIGINT, positives BIGINT, negatives BIGINT, score_sum DOUBLE
+          )
+        """)
+
+    def unscored_batches(self, model_version: str, batch_size: int = 10_000):
+        reader = self.con.execute(f"""
+          SELECT r.recommendationid, ANY_VALUE(r.review) AS review,
+                 ANY_VALUE(r.voted_up) AS voted_up, ANY_VALUE(r.app_id) AS app_id,
+                 ANY_VALUE(r.game_name) AS game_name,
+                 CAST(to_timestamp(ANY_VALUE(r.timestamp_created)) AS DATE) AS review_date
+          FROM {self.source_table} r
+          LEFT JOIN {self.predictions_table} p
+            ON p.recommendationid = r.recommendationid AND p.model_version = ?
+          WHERE p.recommendationid IS NULL AND r.review IS NOT NULL
+          GROUP BY r.recommendationid
+        """, [model_version]).to_arrow_reader(batch_size)
+        yield from reader
+
+    def write(self, table: pa.Table, destination: str = None):
+        self.con.register("predictions_batch", table)
+        self.con.execute(f"INSERT INTO {destination or self.predictions_table} SELECT * FROM predictions_batch")
+        self.con.unregister("predictions_batch")
+        return table.num_rows
+
+# --- Driver ---
+META_COLUMNS = ["voted_up", "app_id", "game_name", "review_date"]
+
+def rechunk(batches, chunk_size: int):
+    """
+    Re-slices a stream of Arrow record batches into (ids, texts, meta) of `chunk_size` rows;
+    meta is an Arrow table of the label columns the drift monitor needs.
+    """
+    ids, texts, metas = [], [], []
+    for batch in batches:
+        ids.extend(batch.column("recommendationid").to_pylist())
+        texts.extend(batch.column("review").to_pylist())
+        metas.append(pa.Table.from_batches([batch]).select(META_COLUMNS))
+        while len(ids) >= chunk_size:
+            meta = pa.concat_tables(metas)
+            yield ids[:chunk_size], texts[:chunk_size], meta.slice(0, chunk_size)
+            ids, texts, metas = ids[chunk_size:], texts[chunk_size:], [meta.slice(chunk_size)]
+    if ids:
+        yield ids, texts, pa.concat_tables(metas)
+
+def score_unscored(backend, bundle: str, model_version: str, chunk_size: int = 5_000,
+                   workers: int = None, flush_rows: int = 200_000, clusters: dict = None) -> int:
+    """
+    Scores every review lacking a `model_version` prediction; returns the number of rows
+    written. With `clusters` (load_clusters), near-duplicates share one score.
+    """
+    backend.ensure_predictions_table()
+    monitor = None
+    if backend.drift_table:
+        backend.ensure_drift_table()
+        monitor = DriftMonitor(model_version)
+    bundle_path = fetch_bundle(bundle)
+    workers = workers or os.cpu_count()
+    print(f"Scoring unscored reviews with {model_version} on {workers} workers...")
+
+    fanout = ClusterFanout(clusters) if clusters else None
+
+    def resolve(future, ids, keys, meta):
+        scored_ids, probs = future.result()
+        return ids, (probs if fanout is None else fanout.fan_out(ids, keys, scored_ids, probs)), meta
+
+    started = time.perf_counter()
+    written, pending = 0, []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bundle_path,)) as pool:
+        chunks = rechunk(backend.unscored_batches(model_version), chunk_size)
+        # keep at most 2×workers chunks in flight so memory stays bounded; they resolve in order
+        in_flight = []
+        for ids, texts, meta in chunks:
+            keys, score_ids, score_texts = fanout.select(ids, texts) if fanout else (None, ids, texts)
+            in_flight.append((pool.submit(score_chunk, score_ids, score_texts), ids, keys, meta))
+            if len(in_flight) >= 2 * workers:
+                pending.append(resolve(*in_flight.pop(0)))
+            if sum(len(p[0]) for p in pending) >= flush_rows:
+                written += _flush(backend, pending, model_version, monitor)
+                pending = []
+        pending.extend(resolve(*f) for f in in_flight)
+    if pending:
+        written += _flush(backend, pending, model_version, monitor)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {written:,} reviews in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} reviews/s)")
+    if fanout is not None and fanout.reviews:
+        print(f"🧬 Near-duplicates: featurized {fanout.scored:,} of {fanout.reviews:,} reviews "
+              f"({1 - fanout.scored / fanout.reviews:.1%} fewer)")
+    if monitor is not None and written:
+        m = monitor.overall()
+        print(f"📈 This run vs voted_up: AUC≈{m['auc']:.3f}, accuracy {m['accuracy']:.3f}, "
+              f"negative recall {m['neg_recall']:.3f}, ECE {m['ece']:.3f} ({m['reviews']:,.0f} labelled)")
+    return written
+
+def _flush(backend, results: list, model_version: str, monitor: DriftMonitor = None) -> int:
+    ids = [i for chunk_ids, _, _ in results for i in chunk_ids]
+    scores = pa.concat_arrays([pa.array(probs, pa.float64()) for _, probs, _ in results])
+    labels = pa.array(["POSITIVE" if s >= 0.5 else "NEGATIVE" for s in scores.to_pylist()])
+    table = pa.Table.from_arrays(
+        [pa.array(ids, pa.string()), pa.array([model_version] * len(ids), pa.string()), scores, labels],
+        schema=PREDICTIONS_SCHEMA,
+    )
+    if monitor is not None:
+        # drift rows go first: the next run skips reviews that have predictions, so histogram
+        # rows missing after a failed write would be lost for good, whereas a batch counted
+        # twice (its predictions write failed and it is scored again) can be rebuilt from the
+        # predictions table
+        for _, probs, meta in results:
+            monitor.update(probs, meta)
+        drift = monitor.take()
+        backend.write(drift, destination=backend.drift_table)
+        print(f"→ appended {drift.num_rows:,} drift histogram rows")
+    rows = backend.write(table)
+    print(f"→ wrote {rows:,} predictions")
+    return rows
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--bundle", required=True, help="Local path or gs:// URI of the (vec, clf) joblib bundle")
+    p.add_argument("--model-version", help="Defaults to the bundle's version, as the app's model registry names it")
+    p.add_argument("--source", choices=["bigquery", "duckdb"], default="bigquery")
+    p.add_argument("--project-id", default=os.environ.get("BQ_PROJECT_ID", "sentiment-analysis-steam"))
+    p.add_argument("--source-table", help="Defaults to <project>.steam_reviews.raw_reviews (BigQuery) or raw_reviews (DuckDB)")
+    p.add_argument("--predictions-table", help="Defaults to <project>.steam_reviews.review_predictions (BigQuery) or review_predictions (DuckDB)")
+    p.add_argument("--drift-table", help="Defaults to <project>.steam_reviews.review_drift (BigQuery) or review_drift (DuckDB)")
+    p.add_argument("--no-drift", action="store_true", help="Skip the drift histograms")
+    p.add_argument("--duckdb-path", default="reviews.duckdb")
+    p.add_argument("--load-jsonl", help="DuckDB only: glob of review JSONL files to seed the source table from")
+    p.add_argument("--clusters", help="dedup.py clusters/ output: score one review per near-duplicate cluster")
+    p.add_argument("--chunk-size", type=int, default=5_000)
+    p.add_argument("--workers", type=int, default=None)
+    args = p.parse_args()
+
+    if args.source == "bigquery":
+        dataset = f"{args.project_id}.steam_reviews"
+        backend = BigQueryBackend(
+            args.project_id,
+            args.source_table or f"{dataset}.raw_reviews",
+            args.predictions_table or f"{dataset}.review_predictions",
+            None if args.no_drift else args.drift_table or f"{dataset}.review_drift",
+        )
+    else:
+        backend = DuckDBBackend(args.duckdb_path, args.source_table or "raw_reviews",
+                                args.predictions_table or "review_predictions",
+                                None if args.no_drift else args.drift_table or "review_drift")
+        if args.load_jsonl:
+            backend.load_jsonl(args.load_jsonl)
+
+    score_unscored(backend, args.bundle, args.model_version or version_from_path(args.bundle),
+                   chunk_size=args.chunk_size, workers=args.workers,
+                   clusters=load_clusters(args.clusters) if args.clusters else None)
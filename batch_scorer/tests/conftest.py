@@ -0,0 +1,22 @@
+# batch_scorer/tests/conftest.py
+# score.py and drift_monitor.py are flat scripts that find the trainer's modules through sys.path
+import glob
+import pathlib
+import sys
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "batch_scorer"))
+sys.path.insert(0, str(ROOT / "lr_tfidf_trainer"))
+
+@pytest.fixture
+def sample_jsonl(tmp_path):
+    """The first 60 sample reviews as a JSONL file; returns a function writing more (skip, count)."""
+    lines = open(sorted(glob.glob(str(ROOT / "reviews_data" / "*" / "*.jsonl")))[0], encoding="utf-8").readlines()
+
+    def write(start: int = 0, count: int = 60, name: str = "reviews.jsonl") -> str:
+        path = tmp_path / name
+        path.write_text("".join(lines[start:start + count]), encoding="utf-8")
+        return str(path)
+    return write
@@ -0,0 +1,114 @@
+# batch_scorer/tests/test_drift_monitor.py
+"""Drift histograms are additive, and the metrics derived from them match scikit-learn's."""
+import datetime as dt
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from sklearn.metrics import confusion_matrix, roc_auc_score
+
+import drift_monitor
+import score
+from drift_monitor import BINS, DriftMonitor, drift_rows, hist_metrics, merge, score_bins, summarize
+from model_bundle import version_from_path
+
+BUNDLE = str(pathlib.Path(__file__).resolve().parents[2] / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz")
+GAMES = {570: "Dota 2", 730: "Counter-Strike 2"}
+
+def batch(n: int, seed: int):
+    """(scores, meta) of `n` scored reviews with labels that roughly follow the scores."""
+    rng = np.random.default_rng(seed)
+    scores = rng.beta(2, 2, n)
+    app_ids = rng.choice(list(GAMES), n)
+    meta = pa.table({
+        "voted_up": pa.array(rng.random(n) < scores),
+        "app_id": app_ids,
+        "game_name": [GAMES[a] for a in app_ids],
+        "review_date": [dt.date(2025, 7, 1) + dt.timedelta(days=int(d)) for d in rng.integers(0, 3, n)],
+    })
+    return scores, meta
+
+def sorted_rows(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas().sort_values(drift_monitor.KEY_COLUMNS + ["bin"], ignore_index=True)
+
+def test_histograms_are_additive():
+    scores, meta = batch(3000, 0)
+    whole = drift_rows("v1", scores, meta)
+    parts = [drift_rows("v1", scores[i:i + 700], meta.slice(i, 700)) for i in range(0, 3000, 700)]
+    merged = merge(parts)
+    assert merged.schema == drift_monitor.DRIFT_SCHEMA
+    pd.testing.assert_frame_equal(sorted_rows(merged), sorted_rows(whole), check_exact=False, rtol=1e-12)
+    # merging an already merged table with new rows compacts it again
+    assert merge([merged, whole]).num_rows == whole.num_rows
+    assert sum(merge([merged, whole]).column("positives").to_pylist()) == 2 * sum(whole.column("positives").to_pylist())
+
+def test_unlabelled_reviews_are_skipped():
+    scores, meta = batch(10, 1)
+    meta = meta.set_column(0, "voted_up", pa.array([None] * 4 + meta.column("voted_up").to_pylist()[4:]))
+    rows = drift_rows("v1", scores, meta)
+    assert sum(rows.column("positives").to_pylist()) + sum(rows.column("negatives").to_pylist()) == 6
+
+def test_metrics_match_sklearn():
+    scores, meta = batch(5000, 2)
+    y = meta.column("voted_up").to_numpy(zero_copy_only=False).astype(int)
+    monitor = DriftMonitor("v1")
+    for i in range(0, 5000, 1000):
+        monitor.update(scores[i:i + 1000], meta.slice(i, 1000))
+    got = monitor.overall()
+
+    tn, fp, fn, tp = confusion_matrix(y, scores >= 0.5).ravel()
+    assert (got["tp"], got["fp"], got["tn"], got["fn"]) == (tp, fp, tn, fn)
+    assert got["neg_recall"] == pytest.approx(tn / (tn + fp))
+    # exact on the binned scores, close on the raw ones
+    assert got["auc"] == pytest.approx(roc_auc_score(y, score_bins(scores)), abs=1e-12)
+    assert got["auc"] == pytest.approx(roc_auc_score(y, scores), abs=5e-3)
+
+    bins = score_bins(scores)
+    ece = sum(abs(scores[bins == b].sum() - y[bins == b].sum()) for b in range(BINS)) / len(y)
+    assert got["ece"] == pytest.approx(ece)
+    assert got["mean_score"] == pytest.approx(scores.mean())
+
+def test_summarize_per_game_matches_each_game_alone():
+    scores, meta = batch(4000, 3)
+    rows = drift_rows("v1", scores, meta).to_pandas()
+    per_game = summarize(rows, ["game_name"])
+    assert per_game["game_name"].tolist() == sorted(GAMES.values())
+    assert per_game["reviews"].sum() == 4000
+    for _, row in per_game.iterrows():
+        mask = meta.column("game_name").to_numpy(zero_copy_only=False) == row["game_name"]
+        y = meta.column("voted_up").to_numpy(zero_copy_only=False)[mask]
+        assert row["auc"] == pytest.approx(roc_auc_score(y, score_bins(scores[mask])))
+    assert np.isnan(hist_metrics(np.ones(BINS), np.zeros(BINS), np.full(BINS, 0.5))["auc"][0])
+
+def test_scorer_drift_rows_use_the_registry_version_name(sample_jsonl):
+    pytest.importorskip("duckdb")
+    backend = score.DuckDBBackend(":memory:", "raw_reviews", "review_predictions", "review_drift")
+    backend.load_jsonl(sample_jsonl(0, 60))
+    uri = "gs://bucket/models/lr-tfidf/20250701-000000/model.joblib.gz"
+    assert version_from_path(uri) == "20250701-000000"
+    version = version_from_path(BUNDLE)
+    score.score_unscored(backend, BUNDLE, version, chunk_size=32, workers=1)
+    drift = backend.con.execute("SELECT model_version, SUM(positives + negatives) FROM review_drift GROUP BY 1").fetchall()
+    assert drift == [("best_tfidf_lr_negRecall_20250630-050145", 60)]
+
+class FailingPredictions(score.DuckDBBackend):
+    """The first predictions write dies (e.g. the job is preempted after the drift rows)."""
+    failed = False
+
+    def write(self, table, destination=None):
+        if destination is None and not self.failed:
+            self.failed = True
+            raise RuntimeError("load job failed")
+        return super().write(table, destination)
+
+def test_drift_rows_are_not_lost_when_the_predictions_write_fails(sample_jsonl):
+    pytest.importorskip("duckdb")
+    backend = FailingPredictions(":memory:", "raw_reviews", "review_predictions", "review_drift")
+    backend.load_jsonl(sample_jsonl(0, 60))
+    with pytest.raises(RuntimeError):
+        score.score_unscored(backend, BUNDLE, "v1", chunk_size=32, workers=1)
+    assert score.score_unscored(backend, BUNDLE, "v1", chunk_size=32, workers=1) == 60
+    reviews = backend.con.execute("SELECT SUM(positives + negatives) FROM review_drift").fetchone()[0]
+    assert reviews == 120    # every review is in the histograms; the failed batch twice, never zero times
@@ -0,0 +1,130 @@
+# batch_scorer/tests/test_score.py
+"""Batch scoring writes one prediction per review and model version, and only for the delta."""
+import json
+import pathlib
+
+import joblib
+import numpy as np
+import pytest
+
+import model_bundle
+import score
+
+BUNDLE = str(pathlib.Path(__file__).resolve().parents[2] / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz")
+
+@pytest.fixture
+def backend():
+    pytest.importorskip("duckdb")
+    return score.DuckDBBackend(":memory:", "raw_reviews", "review_predictions")
+
+def run(backend, version="v1"):
+    return score.score_unscored(backend, BUNDLE, version, chunk_size=16, workers=1)
+
+def test_scores_every_review_once_then_only_the_delta(backend, sample_jsonl):
+    backend.load_jsonl(sample_jsonl(0, 40))
+    assert run(backend) == 40
+    assert run(backend) == 0
+
+    backend.con.execute("INSERT INTO raw_reviews SELECT CAST(recommendationid AS VARCHAR), review, voted_up, app_id, "
+                        "game_name, timestamp_created FROM read_json_auto(?, format='newline_delimited')",
+                        [sample_jsonl(40, 10, "delta.jsonl")])
+    assert run(backend) == 10
+    # a new model version scores everything again, under its own name
+    assert run(backend, "v2") == 50
+    counts = dict(backend.con.execute(
+        "SELECT model_version, COUNT(DISTINCT recommendationid) FROM review_predictions GROUP BY 1").fetchall())
+    assert counts == {"v1": 50, "v2": 50}
+
+def test_scores_match_the_bundle(backend, sample_jsonl):
+    path = sample_jsonl(0, 30)
+    backend.load_jsonl(path)
+    run(backend)
+    got = dict(backend.con.execute("SELECT recommendationid, score FROM review_predictions").fetchall())
+    reviews = {r["recommendationid"]: r["review"] for r in map(json.loads, open(path, encoding="utf-8"))}
+    vec, clf = joblib.load(BUNDLE)
+    ids = sorted(reviews)
+    expected = clf.predict_proba(vec.transform([reviews[i] for i in ids]))[:, 1]
+    np.testing.assert_allclose([got[i] for i in ids], expected, rtol=0, atol=1e-12)
+    labels = dict(backend.con.execute("SELECT recommendationid, label FROM review_predictions").fetchall())
+    assert all(labels[i] == ("POSITIVE" if got[i] >= 0.5 else "NEGATIVE") for i in ids)
+
+def test_duplicate_texts_are_scored_once_per_chunk():
+    score._init_worker(BUNDLE)
+    ids, probs = score.score_chunk(["a", "b", "c"], ["great game", "awful", "great game"])
+    assert ids == ["a", "b", "c"]
+    assert probs[0] == probs[2] and probs[0] != probs[1]
+
+class _Storage:
+    """google.cloud.storage stand-in whose downloads can be made to fail halfway."""
+
+    def __init__(self, fail: bool):
+        self.fail, self.downloads = fail, 0
+
+    def Client(self):
+        return self
+
+    def bucket(self, name):
+        return self
+
+    def blob(self, name):
+        return self
+
+    def download_to_filename(self, filename):
+        self.downloads += 1
+        with open(filename, "wb") as f:
+            f.write(b"truncated")
+            if self.fail:
+                raise ConnectionError("connection reset")
+            f.write(open(BUNDLE, "rb").read())
+
+def test_interrupted_download_leaves_no_bundle_behind(monkeypatch, tmp_path):
+    from google.cloud import storage
+    uri = "gs://bucket/models/lr-tfidf/20250701-000000/model.joblib.gz"
+    monkeypatch.setattr(model_bundle.tempfile, "gettempdir", lambda: str(tmp_path))
+
+    broken = _Storage(fail=True)
+    monkeypatch.setattr(storage, "Client", broken.Client)
+    with pytest.raises(ConnectionError):
+        score.fetch_bundle(uri)
+    local = model_bundle.cache_path(uri)
+    assert not local.exists() and list(local.parent.iterdir()) == []
+
+    ok = _Storage(fail=False)
+    monkeypatch.setattr(storage, "Client", ok.Client)
+    assert score.fetch_bundle(uri) == str(local)
+    assert score.fetch_bundle(uri) == str(local)
+    assert ok.downloads == 1
+
+def test_near_duplicate_clusters_share_one_score(backend, sample_jsonl, tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    path = sample_jsonl(0, 40)
+    backend.load_jsonl(path)
+    ids = [str(json.loads(line)["recommendationid"]) for line in open(path, encoding="utf-8")]
+    # dedup.py's clusters/ output: members 1-9 and 20-29 collapse onto 0 and 20 (different texts)
+    (tmp_path / "clusters").mkdir()
+    pq.write_table(pa.table({"recommendationid": ids,
+                             "representative_id": [ids[0] if i < 10 else ids[20] if 20 <= i < 30 else rid
+                                                   for i, rid in enumerate(ids)]}),
+                   tmp_path / "clusters" / "part-0.parquet")
+    clusters = score.load_clusters(str(tmp_path / "clusters"))
+    assert len(clusters) == 18
+    assert score.score_unscored(backend, BUNDLE, "v1", chunk_size=8, workers=1, clusters=clusters) == 40
+    got = dict(backend.con.execute("SELECT recommendationid, score FROM review_predictions").fetchall())
+    assert len({got[i] for i in ids[:10]}) == 1 and len({got[i] for i in ids[20:30]}) == 1
+    # reviews outside a cluster keep their own score
+    vec, clf = joblib.load(BUNDLE)
+    reviews = {str(r["recommendationid"]): r["review"] for r in map(json.loads, open(path, encoding="utf-8"))}
+    own = ids[10:20] + ids[30:]
+    np.testing.assert_allclose([got[i] for i in own], clf.predict_proba(vec.transform([reviews[i] for i in own]))[:, 1],
+                               rtol=0, atol=1e-12)
+
+def test_fanout_claims_each_cluster_once_across_chunks():
+    fanout = score.ClusterFanout({"b": "a", "c": "a"})
+    keys, ids, _ = fanout.select(["b", "x"], ["B", "X"])
+    assert ids == ["b", "x"]                    # b stands in for its cluster
+    probs = fanout.fan_out(["b", "x"], keys, ids, [0.25, 0.5])
+    keys, ids, _ = fanout.select(["a", "c", "y"], ["A", "C", "Y"])
+    assert ids == ["y"]
+    assert fanout.fan_out(["a", "c", "y"], keys, ids, [0.75]).tolist() == [0.25, 0.25, 0.75]
+    assert probs.tolist() == [0.25, 0.5] and (fanout.scored, fanout.reviews) == (3, 5)
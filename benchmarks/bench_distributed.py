@@ -0,0 +1,91 @@
+# benchmarks/bench_distributed.py
+"""
+Single-node vs distributed (local multi-process cluster) TF-IDF + LR training.
+
+Trains the production configuration (task.TFIDF_PARAMS / LOGREG_PARAMS) on the sample
+reviews, scaled up synthetically, once with the single-node path (ShardedTfidf +
+sklearn LogisticRegression) and once per worker count with distributed_lr. Fails
+(exit code 1) unless every distributed model has the same vocabulary and predicts
+the same labels as the single-node model, with probabilities within --atol.
+
+    python benchmarks/bench_distributed.py --reviews 100000 --workers 1,2,4,8
+    python benchmarks/bench_distributed.py --json
+"""
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "lr_tfidf_trainer"))
+sys.path.append(str(ROOT / "ingestion_service"))
+from distributed_lr import train_distributed
+from parallel_tfidf import ShardedTfidf
+from task import LOGREG_PARAMS, TFIDF_PARAMS
+
+from bench_tokenizer import DEFAULT_DATA
+from run_benchmarks import load_sample, scale_up
+
+def single_node(texts: list, labels: np.ndarray, workers: int):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    featurizer = ShardedTfidf(TfidfVectorizer(**TFIDF_PARAMS), workers=workers)
+    X = featurizer.fit_transform(texts)
+    return featurizer.vectorizer_, LogisticRegression(**LOGREG_PARAMS).fit(X, labels)
+
+def run(n_reviews: int, workers: list, atol: float, data: str = DEFAULT_DATA) -> dict:
+    sample = scale_up(load_sample(data), n_reviews)
+    texts = [r["review"] or "" for r in sample]
+    labels = np.asarray([int(r["voted_up"]) for r in sample])
+
+    start = time.perf_counter()
+    ref_vec, ref_clf = single_node(texts, labels, max(workers))
+    results = {"reviews": len(texts), "single_node": {"seconds": round(time.perf_counter() - start, 3),
+                                                      "workers": max(workers)}, "distributed": []}
+    X_ref = ref_vec.transform(texts)
+    ref_proba = ref_clf.predict_proba(X_ref)[:, 1]
+
+    for n in workers:
+        start = time.perf_counter()
+        vec, clf, info = train_distributed(texts, labels, TFIDF_PARAMS, LOGREG_PARAMS, workers=n, verbose=False)
+        secs = time.perf_counter() - start
+        if vec.vocabulary_ != ref_vec.vocabulary_:
+            raise AssertionError(f"{n} workers: vocabulary differs from the single-node vectorizer")
+        proba = clf.predict_proba(X_ref)[:, 1]
+        max_diff = float(np.abs(proba - ref_proba).max())
+        agree = float(((proba >= 0.5) == (ref_proba >= 0.5)).mean())
+        if agree < 1.0 or max_diff > atol:
+            raise AssertionError(f"{n} workers: predictions differ (label agreement {agree:.4%}, max |Δp| {max_diff:g})")
+        results["distributed"].append({
+            "workers": n, "seconds": round(secs, 3),
+            **{k: round(v, 3) for k, v in info.items() if k.endswith("_s")},
+            "n_iter": info["n_iter"], "allreduce_calls": info["allreduce_calls"], "max_abs_proba_diff": max_diff,
+        })
+    return results
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--reviews", type=int, default=20_000)
+    p.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to run")
+    p.add_argument("--atol", type=float, default=1e-4, help="Allowed |Δ probability| vs single-node")
+    p.add_argument("--data", default=DEFAULT_DATA, help="Glob of review JSONL files")
+    p.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = p.parse_args()
+
+    try:
+        res = run(args.reviews, [int(w) for w in args.workers.split(",")], args.atol, args.data)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(res, indent=2))
+        sys.exit(0)
+    base = res["single_node"]["seconds"]
+    print(f"✅ Parity OK ({res['reviews']:,} reviews); single-node {base:.2f}s on {res['single_node']['workers']} workers")
+    for r in res["distributed"]:
+        print(f"  {r['workers']:>2} workers {r['seconds']:8.2f}s ({base / r['seconds']:.2f}x)  "
+              f"tfidf {r['tfidf_fit_s']:.2f}s  featurize {r['featurize_s']:.2f}s  optimize {r['optimize_s']:.2f}s  "
+              f"{r['n_iter']} iters  max|Δp| {r['max_abs_proba_diff']:.1e}")
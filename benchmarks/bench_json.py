@@ -0,0 +1,130 @@
+# benchmarks/bench_json.py
+"""
+Parity check + microbenchmark: review_codec (orjson) vs the standard-library JSON path.
+
+Compares, on Steam-shaped pages built from the sample reviews:
+  decode    resp.json()-style json.loads(bytes.decode())  vs  review_codec.decode_page(bytes)
+  validate  ReviewValidator over the decoded reviews (raw_reviews_schema)
+  encode    "\\n".join(json.dumps(r, ensure_ascii=False)).encode()  vs  review_codec.encode_jsonl
+
+Fails (exit code 1) unless both paths decode to the same records and the fast NDJSON
+decodes back to exactly what the standard-library NDJSON does.
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --reviews 200000 --json
+"""
+import argparse
+import itertools
+import json
+import pathlib
+import statistics
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "ingestion_service"))
+import review_codec
+from review_codec import ReviewValidator, decode_page, encode_jsonl
+
+from bench_tokenizer import DEFAULT_DATA
+from run_benchmarks import PER_PAGE, load_sample
+
+class _Field:
+    """Duck-typed bigquery.SchemaField, so the benchmark doesn't need the BigQuery client."""
+    def __init__(self, name, field_type, fields=()):
+        self.name, self.field_type, self.mode, self.fields = name, field_type, "NULLABLE", fields
+
+# mirror of ingestion_app.raw_reviews_schema
+RAW_SCHEMA = [
+    _Field("recommendationid", "STRING"),
+    _Field("author", "RECORD", [_Field(n, "STRING" if n == "steamid" else "INT64") for n in (
+        "steamid", "num_games_owned", "num_reviews", "playtime_forever",
+        "playtime_last_two_weeks", "playtime_at_review", "last_played")]),
+    _Field("language", "STRING"), _Field("review", "STRING"),
+    _Field("timestamp_created", "INT64"), _Field("timestamp_updated", "INT64"),
+    _Field("voted_up", "BOOL"), _Field("votes_up", "INT64"), _Field("votes_funny", "INT64"),
+    _Field("weighted_vote_score", "FLOAT"), _Field("comment_count", "INT64"),
+    _Field("steam_purchase", "BOOL"), _Field("received_for_free", "BOOL"),
+    _Field("written_during_early_access", "BOOL"), _Field("steam_deck_review", "BOOL"),
+    _Field("app_id", "INT64"), _Field("game_name", "STRING"),
+]
+
+def make_pages(sample: list, n_reviews: int) -> list:
+    """Steam appreviews response bodies (bytes) holding `n_reviews` reviews in total."""
+    reviews = list(itertools.islice(itertools.cycle(sample), n_reviews))
+    return [json.dumps({"success": 1, "reviews": reviews[i:i + PER_PAGE], "cursor": "AoJ4"}).encode()
+            for i in range(0, len(reviews), PER_PAGE)]
+
+def stdlib_decode(pages: list) -> list:
+    return [r for p in pages for r in json.loads(p.decode("utf-8"))["reviews"]]
+
+def fast_decode(pages: list) -> list:
+    return [r for p in pages for r in decode_page(p)["reviews"]]
+
+def stdlib_encode(reviews: list) -> bytes:
+    return "\n".join([json.dumps(r, ensure_ascii=False) for r in reviews]).encode("utf-8")
+
+def check_parity(pages: list):
+    expected, got = stdlib_decode(pages), fast_decode(pages)
+    if expected != got:
+        raise AssertionError("review_codec decoded pages differently from json.loads")
+    old, new = stdlib_encode(expected), encode_jsonl(got)
+    if [json.loads(l) for l in old.splitlines()] != [json.loads(l) for l in new.splitlines()]:
+        raise AssertionError("review_codec NDJSON does not round-trip to the same records")
+    return len(old), len(new)
+
+def best_of(fn, arg, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+def run(n_reviews: int, repeat: int, data: str = DEFAULT_DATA) -> dict:
+    pages = make_pages(load_sample(data), n_reviews)
+    old_bytes, new_bytes = check_parity(pages)
+    reviews = fast_decode(pages)
+    validator = ReviewValidator(RAW_SCHEMA)
+    _, rejected = validator.validate(reviews)   # first pass coerces in place
+
+    out = {"backend": review_codec.BACKEND, "reviews": n_reviews, "rejected": len(rejected),
+           "ndjson_mb": {"stdlib": round(old_bytes / 2**20, 2), "fast": round(new_bytes / 2**20, 2)}}
+    for stage, std_fn, fast_fn, arg in [
+        ("decode", stdlib_decode, fast_decode, pages),
+        ("encode", stdlib_encode, encode_jsonl, reviews),
+    ]:
+        std, fast = best_of(std_fn, arg, repeat), best_of(fast_fn, arg, repeat)
+        out[stage] = {"stdlib_reviews_per_sec": round(n_reviews / std), "fast_reviews_per_sec": round(n_reviews / fast),
+                      "speedup": round(std / fast, 2)}
+    secs = best_of(validator.validate, reviews, repeat)
+    out["validate"] = {"reviews_per_sec": round(n_reviews / secs)}
+    out["end_to_end"] = {
+        "stdlib_reviews_per_sec": round(n_reviews / (best_of(stdlib_decode, pages, repeat) + best_of(stdlib_encode, reviews, repeat))),
+        "fast_reviews_per_sec": round(n_reviews / (best_of(fast_decode, pages, repeat) + secs + best_of(encode_jsonl, reviews, repeat))),
+    }
+    return out
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--reviews", type=int, default=100_000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--data", default=DEFAULT_DATA, help="Glob of review JSONL files")
+    p.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = p.parse_args()
+
+    try:
+        res = run(args.reviews, args.repeat, args.data)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(res, indent=2))
+        sys.exit(0)
+    print(f"✅ Parity OK ({res['reviews']:,} reviews, backend={res['backend']}, rejected={res['rejected']})")
+    for stage in ("decode", "encode"):
+        r = res[stage]
+        print(f"  {stage:<8} stdlib {r['stdlib_reviews_per_sec']:>10,}/s   fast {r['fast_reviews_per_sec']:>10,}/s   ({r['speedup']}x)")
+    print(f"  validate                      {res['validate']['reviews_per_sec']:>10,}/s")
+    e2e = res["end_to_end"]
+    print(f"  decode+encode: stdlib {e2e['stdlib_reviews_per_sec']:,}/s → fast (incl. validation) {e2e['fast_reviews_per_sec']:,}/s")
@@ -0,0 +1,231 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark for the Streamlit app: how long until a fresh process (or the
+Dockerfile image) is useful.
+
+Every measurement runs in a new interpreter, so nothing is warm except the OS page
+cache. Stages:
+
+  imports  import time of each mode's dependencies: "eager" is the old top-level
+           import block of streamlit_app.py, "classify" and "dashboard" are what
+           each mode loads now (modules that are not installed are listed as missing)
+  warm     app/warmup.py --no-serve: Classify imports, model load + warm-up, first
+           prediction, and wall time from process start
+  app      the real script under streamlit.testing.AppTest, "cold" (first visitor
+           pays for everything) and "warm" (after warmup.warm(), as in the
+           container): first render and first "Run" click
+  server   starts the container entrypoint and polls /_stcore/health until it
+           returns 200. warmup.py binds the port only once the model is warm, so
+           this is the time until the service is useful. Use --image for the
+           built Docker image, or --command for any other start command
+           (e.g. a plain `streamlit run` for comparison)
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --stages imports,warm,app --repeat 5 --json
+    python benchmarks/bench_startup.py --stages server --image gcr.io/$PROJECT_ID/steam-sentiment-ui
+    python benchmarks/bench_startup.py --stages server \
+        --command "streamlit run app/streamlit_app.py --server.port {port} --server.headless true"
+"""
+import argparse
+import json
+import os
+import pathlib
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "app"))
+from warmup import MODE_IMPORTS
+
+STAGES = ("imports", "warm", "app", "server")
+IMPORT_SETS = {
+    # streamlit_app.py's top-level imports before they were deferred per mode
+    "eager":     ["streamlit", "google.cloud.aiplatform", "google.cloud.bigquery", "google.cloud.bigquery_storage",
+                  "pandas", "metrics", "drift_monitor", "model_registry"],
+    "classify":  ["streamlit"] + MODE_IMPORTS["classify"],
+    "dashboard": ["streamlit", "metrics"] + MODE_IMPORTS["dashboard"],
+}
+PATHS = [str(ROOT / d) for d in ("app", "lr_tfidf_trainer", "ingestion_service", "batch_scorer")]
+REVIEW = "Fun with friends, but the servers keep dropping."
+
+# each snippet runs in a fresh interpreter and prints one "BENCH {json}" line
+IMPORTS_SNIPPET = """
+import json, sys, time
+out = {}
+for name in sys.argv[1:]:
+    t = time.perf_counter()
+    try:
+        __import__(name)
+        out[name] = time.perf_counter() - t
+    except ImportError:
+        out[name] = None
+print("BENCH " + json.dumps(out))
+"""
+
+APP_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+out = {}
+if sys.argv[1] == "warm":
+    import warmup
+    out["warmup"] = warmup.warm()["total"]
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file("app/streamlit_app.py", default_timeout=300).run()
+out["first_render"] = time.perf_counter() - t
+at.text_area[0].input(sys.argv[2])
+t = time.perf_counter()
+next(b for b in at.button if b.label == "Run").click().run()
+out["first_click"] = time.perf_counter() - t
+out["ready"] = time.perf_counter() - t0
+out["errors"] = [e.value for e in at.exception]
+print("BENCH " + json.dumps(out))
+"""
+
+def _env(**extra) -> dict:
+    return dict(os.environ, METRICS_LOG_SPANS="0", PYTHONPATH=os.pathsep.join(PATHS), **extra)
+
+def run_python(args: list, **env) -> tuple:
+    """(parsed BENCH line or startup_warm event, wall seconds) of one fresh interpreter."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, *args], cwd=ROOT, env=_env(**env), capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"{' '.join(args[:2])} failed:\n{proc.stderr[-2000:]}")
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):]), wall
+        if line.startswith('{"event": "startup_warm"'):
+            return json.loads(line), wall
+    raise RuntimeError(f"no result line in output:\n{proc.stdout[-2000:]}")
+
+def _median(runs: list, key: str) -> float:
+    return statistics.median(r[key] for r in runs)
+
+# --- Stages ---
+def bench_imports(repeat: int) -> dict:
+    res = {}
+    for mode, modules in IMPORT_SETS.items():
+        runs = []
+        for _ in range(repeat):
+            out, wall = run_python(["-c", IMPORTS_SNIPPET, *modules])
+            runs.append({"seconds": sum(v for v in out.values() if v is not None), "wall_seconds": wall,
+                         "missing": [m for m, v in out.items() if v is None]})
+        res[mode] = {"seconds": _median(runs, "seconds"), "wall_seconds": _median(runs, "wall_seconds"),
+                     "missing": runs[0]["missing"]}
+        missing = f"  (not installed: {', '.join(res[mode]['missing'])})" if res[mode]["missing"] else ""
+        print(f"📥 imports {mode:<10} {res[mode]['seconds']:6.2f}s imports, "
+              f"{res[mode]['wall_seconds']:6.2f}s with interpreter start{missing}")
+    return res
+
+def bench_warm(repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        event, wall = run_python([str(ROOT / "app" / "warmup.py"), "--no-serve"], APP_PRELOAD="")
+        runs.append({k: event[k] for k in ("imports", "model", "first_prediction", "total")} | {"wall_seconds": wall})
+    res = {k: _median(runs, k) for k in runs[0]}
+    print(f"🔥 warm      imports {res['imports']:.2f}s + model {res['model']:.2f}s + first prediction "
+          f"{res['first_prediction'] * 1e3:.1f} ms = {res['total']:.2f}s ({res['wall_seconds']:.2f}s wall)")
+    return res
+
+def bench_app(repeat: int) -> dict:
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        print("⚠️ app stage skipped: streamlit (with streamlit.testing) is not installed")
+        return {"skipped": "streamlit not installed"}
+    res = {}
+    for mode in ("cold", "warm"):
+        runs = [run_python(["-c", APP_SNIPPET, mode, REVIEW])[0] for _ in range(repeat)]
+        errors = sorted({e for r in runs for e in r["errors"]})
+        res[mode] = {k: _median(runs, k) for k in runs[0] if k != "errors"} | {"errors": errors}
+        warm = f"warmup {res[mode]['warmup']:.2f}s, " if "warmup" in res[mode] else ""
+        print(f"🖥️ app {mode:<5}  {warm}first render {res[mode]['first_render']:.2f}s, "
+              f"first Run click {res[mode]['first_click']:.2f}s, useful after {res[mode]['ready']:.2f}s")
+        for e in errors:
+            print(f"   ❌ {e}")
+    return res
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def server_command(args, port: int) -> list:
+    if args.image:
+        env = [x for e in args.env for x in ("-e", e)]
+        return ["docker", "run", "--rm", "-p", f"{port}:8080", *env, args.image]
+    if args.command:
+        return shlex.split(args.command.format(port=port))
+    return [sys.executable, str(ROOT / "app" / "warmup.py"), "--server.port", str(port),
+            "--server.headless", "true", "--server.fileWatcherType", "none"]
+
+def time_to_healthy(cmd: list, port: int, timeout: float) -> float:
+    """Seconds from launching `cmd` until GET /_stcore/health answers 200."""
+    url = f"http://127.0.0.1:{port}/_stcore/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{cmd[0]} exited with code {proc.returncode} before becoming healthy")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError(f"{url} not healthy after {timeout:g}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def bench_server(args) -> dict:
+    runs = []
+    for _ in range(args.repeat):
+        port = args.port or _free_port()
+        runs.append(time_to_healthy(server_command(args, port), port, args.timeout))
+    target = args.image or args.command or "app/warmup.py"
+    res = {"target": target, "seconds": statistics.median(runs), "runs": runs}
+    print(f"🚀 server    /_stcore/health 200 after {res['seconds']:.2f}s - {target}")
+    return res
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--stages", default="imports,warm,app", help=f"Comma-separated subset of {','.join(STAGES)}")
+    p.add_argument("--repeat", type=int, default=3, help="Fresh processes per measurement (median reported)")
+    p.add_argument("--image", help="server stage: Docker image to `docker run` (the Dockerfile build)")
+    p.add_argument("--env", action="append", default=[], help="server stage: KEY=VALUE passed to the image")
+    p.add_argument("--command", help="server stage: start command instead of app/warmup.py; {port} is substituted")
+    p.add_argument("--port", type=int, help="server stage: port to use (default: a free one)")
+    p.add_argument("--timeout", type=float, default=300, help="server stage: seconds to wait for health")
+    p.add_argument("--json", action="store_true", help="Print results as JSON")
+    p.add_argument("--out", help="Also write the JSON results here")
+    args = p.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        p.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    res = {}
+    for stage in stages:
+        if stage == "server":
+            res[stage] = bench_server(args)
+        else:
+            res[stage] = {"imports": bench_imports, "warm": bench_warm, "app": bench_app}[stage](args.repeat)
+    if args.out:
+        pathlib.Path(args.out).write_text(json.dumps(res, indent=2))
+    if args.json:
+        print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_tokenizer.py
+"""
+Parity check + microbenchmark: FastTfidf vs TfidfVectorizer.transform on the LR bundle.
+
+Fails (exit code 1) unless FastTfidf yields exactly the same feature indices as the
+bundle's vectorizer and values within 1e-12, then reports per-review latency for the
+single-review path used by the Streamlit app and for batched scoring.
+
+    python benchmarks/bench_tokenizer.py
+    python benchmarks/bench_tokenizer.py --json
+"""
+import argparse
+import glob
+import json
+import pathlib
+import statistics
+import sys
+import time
+
+import joblib
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "lr_tfidf_trainer"))
+from fast_tfidf import FastTfidf
+
+DEFAULT_BUNDLE = str(ROOT / "models" / "best_tfidf_lr_negRecall_20250630-050145.joblib.gz")
+DEFAULT_DATA = str(ROOT / "reviews_data" / "*" / "*.jsonl")
+
+def load_reviews(pattern: str) -> list:
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            texts.extend(json.loads(line).get("review") or "" for line in f if line.strip())
+    return texts
+
+def check_parity(vec, fast, texts: list, atol: float = 1e-12):
+    expected, got = vec.transform(texts), fast.transform(texts)
+    expected.sort_indices()
+    got.sort_indices()
+    if not ((expected.indptr == got.indptr).all() and (expected.indices == got.indices).all()):
+        raise AssertionError("FastTfidf produced different feature indices than the bundle vectorizer")
+    max_diff = float(abs(expected.data - got.data).max()) if expected.nnz else 0.0
+    if max_diff > atol:
+        raise AssertionError(f"FastTfidf values differ by up to {max_diff:g}")
+    return max_diff
+
+def per_review_us(transform, texts: list, repeat: int) -> float:
+    """Median over `repeat` runs of the mean single-review transform latency, in µs."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for t in texts:
+            transform([t])
+        runs.append((time.perf_counter() - start) / len(texts) * 1e6)
+    return statistics.median(runs)
+
+def batch_us(transform, texts: list, repeat: int) -> float:
+    """Median over `repeat` runs of one batched transform, per review, in µs."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transform(texts)
+        runs.append((time.perf_counter() - start) / len(texts) * 1e6)
+    return statistics.median(runs)
+
+def run(bundle: str = DEFAULT_BUNDLE, data: str = DEFAULT_DATA, repeat: int = 5) -> dict:
+    vec, _ = joblib.load(bundle)
+    texts = load_reviews(data)
+    start = time.perf_counter()
+    fast = FastTfidf(vec)
+    build_ms = (time.perf_counter() - start) * 1e3
+    max_diff = check_parity(vec, fast, texts)
+    return {
+        "reviews": len(texts),
+        "parity_max_abs_diff": max_diff,
+        "fast_build_ms": round(build_ms, 2),
+        "sklearn_single_us": round(per_review_us(vec.transform, texts, repeat), 2),
+        "fast_single_us": round(per_review_us(fast.transform, texts, repeat), 2),
+        "sklearn_batch_us": round(batch_us(vec.transform, texts, repeat), 2),
+        "fast_batch_us": round(batch_us(fast.transform, texts, repeat), 2),
+    }
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    p.add_argument("--data", default=DEFAULT_DATA, help="Glob of review JSONL files")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = p.parse_args()
+
+    try:
+        res = run(args.bundle, args.data, args.repeat)
+    except AssertionError as e:
+        print(f"❌ Parity check failed: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(res))
+    else:
+        print(f"✅ Parity OK on {res['reviews']:,} reviews (max |Δ| = {res['parity_max_abs_diff']:g})")
+        print(f"FastTfidf build:        {res['fast_build_ms']:.1f} ms")
+        print(f"single review  sklearn: {res['sklearn_single_us']:8.1f} µs   fast: {res['fast_single_us']:8.1f} µs"
+              f"   ({res['sklearn_single_us'] / res['fast_single_us']:.1f}x)")
+        print(f"batched / rev  sklearn: {res['sklearn_batch_us']:8.1f} µs   fast: {res['fast_batch_us']:8.1f} µs"
+              f"   ({res['sklearn_batch_us'] / res['fast_batch_us']:.1f}x)")
@@ -0,0 +1,320 @@
+# benchmarks/load_test.py
+"""
+Open-loop load generator for the Classify path and the inference endpoints.
+
+Requests carry review texts drawn at random from `reviews_data/`, so request sizes
+follow the real review-length distribution. Arrivals are open-loop: a Poisson
+process at each offered rate fires requests on schedule whether or not earlier
+ones have returned, and latency is measured from the *scheduled* send time, so
+queueing in a saturated service shows up in the percentiles (no coordinated
+omission). Each rate runs for --duration seconds, and the ramp stops after the
+first saturated stage.
+
+A stage is saturated when achieved throughput falls below 90% of the sent rate,
+more than 1% of requests fail or time out, or p99 exceeds --slo-ms. The highest
+unsaturated rate is the sustainable rate of one replica; with --target-rps the
+script prints how many replicas that peak needs at --max-utilization.
+
+Targets:
+  logreg        in-process LogReg prediction exactly as the Streamlit Classify tab
+                runs it (ModelRegistry + FastTfidf), on threads like Streamlit sessions
+  vertex-local  a local stand-in for the DistilBERT Vertex endpoint (started as a
+                subprocess, see serve-vertex)
+  classify      both, sequentially, like one click on "Run"
+  http          any HTTP inference service: POST --body to --url with "{text}"
+                replaced by the review text
+
+    python benchmarks/load_test.py logreg --rates 25,50,100,200,400
+    python benchmarks/load_test.py vertex-local --rates 5,10,20,40 --target-rps 30
+    python benchmarks/load_test.py http --url http://localhost:8080/predict \
+        --body '{"instances": [{"text": "{text}"}]}' --rates 10,20,40 --json
+    python benchmarks/load_test.py serve-vertex --port 8085 --slots 4
+
+The Vertex stand-in speaks the REST predict protocol ({"instances": [...]} in,
+{"predictions": [{"label", "score"}]} out). It scores with the LR bundle and holds
+one of --slots workers (4 = the vCPUs of an n1-standard-4) for a simulated DistilBERT
+service time of --base-ms + --ms-per-token per token (capped at 512 tokens). The
+defaults are rough CPU figures; calibrate them against a few requests to the real
+endpoint before using the numbers for sizing.
+"""
+import argparse
+import http.server
+import json
+import math
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "app"))
+sys.path.append(str(ROOT / "lr_tfidf_trainer"))
+sys.path.append(str(ROOT / "ingestion_service"))
+
+from bench_tokenizer import DEFAULT_BUNDLE, DEFAULT_DATA, load_reviews
+
+VERTEX_PATH = "/v1/projects/local/locations/local/endpoints/local:predict"
+SATURATED_THROUGHPUT = 0.9   # achieved / sent
+SATURATED_ERRORS = 0.01
+
+# --- Targets: each returns send(text), which raises on failure ---
+def logreg_target(bundle: str):
+    from model_registry import ModelRegistry
+    model = ModelRegistry(pinned=bundle).get()
+    def send(text: str):
+        model.predict_proba([text])[0]
+    return send
+
+def http_target(url: str, body: str, max_in_flight: int, timeout: float):
+    import requests
+    template = json.loads(body)
+    local = threading.local()
+
+    def fill(node, text):
+        if isinstance(node, dict):
+            return {k: fill(v, text) for k, v in node.items()}
+        if isinstance(node, list):
+            return [fill(v, text) for v in node]
+        return text if node == "{text}" else node
+
+    def send(text: str):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+            session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max_in_flight))
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max_in_flight))
+        resp = session.post(url, json=fill(template, text), timeout=timeout)
+        resp.raise_for_status()
+    return send
+
+def vertex_body() -> str:
+    return json.dumps({"instances": [{"text": "{text}"}]})
+
+def classify_target(bundle: str, vertex_url: str, max_in_flight: int, timeout: float):
+    bert = http_target(vertex_url, vertex_body(), max_in_flight, timeout)
+    logreg = logreg_target(bundle)
+    def send(text: str):
+        bert(text)
+        logreg(text)
+    return send
+
+# --- Local Vertex endpoint stand-in ---
+class _VertexStandIn(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real endpoint
+    model = None
+    slots: threading.Semaphore = None
+    base_ms = ms_per_token = 0.0
+
+    def do_POST(self):
+        if not self.path.endswith(":predict"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        texts = [inst.get("text", "") for inst in body.get("instances", [])]
+        tokens = sum(min(512, int(len(t.split()) * 1.3) + 2) for t in texts)
+        service = (self.base_ms * len(texts) + self.ms_per_token * tokens) / 1e3
+        with self.slots:
+            start = time.perf_counter()
+            probs = self.model.predict_proba(texts) if texts else []
+            time.sleep(max(0.0, service - (time.perf_counter() - start)))
+        preds = [{"label": "POSITIVE" if p >= 0.5 else "NEGATIVE", "score": float(p)} for p in probs]
+        out = json.dumps({"predictions": preds, "deployedModelId": "local"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+def serve_vertex(port: int, bundle: str, slots: int, base_ms: float, ms_per_token: float):
+    from model_registry import ModelRegistry
+    _VertexStandIn.model = ModelRegistry(pinned=bundle).get()
+    _VertexStandIn.slots = threading.Semaphore(slots)
+    _VertexStandIn.base_ms, _VertexStandIn.ms_per_token = base_ms, ms_per_token
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _VertexStandIn)
+    server.daemon_threads = True
+    print(f"✅ Vertex stand-in on http://127.0.0.1:{port}{VERTEX_PATH} "
+          f"({slots} slots, {base_ms}ms + {ms_per_token}ms/token)", flush=True)
+    server.serve_forever()
+
+def start_vertex_standin(args) -> tuple:
+    """Runs serve-vertex in a subprocess so it does not share the generator's GIL."""
+    cmd = [sys.executable, __file__, "serve-vertex", "--port", str(args.vertex_port), "--bundle", args.bundle,
+           "--slots", str(args.slots), "--base-ms", str(args.base_ms), "--ms-per-token", str(args.ms_per_token)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:   # model-load logs first, then the ready line
+        if "Vertex stand-in on" in line:
+            break
+    else:
+        proc.wait()
+        raise RuntimeError(f"Vertex stand-in exited with code {proc.returncode} before serving")
+    print(line.rstrip())
+    # keep draining so the child never blocks on a full pipe
+    threading.Thread(target=lambda: [None for _ in proc.stdout], daemon=True).start()
+    return proc, f"http://127.0.0.1:{args.vertex_port}{VERTEX_PATH}"
+
+# --- Open-loop generator ---
+def run_stage(send, texts: list, rate: float, duration: float, pool: ThreadPoolExecutor,
+              rng: np.random.Generator, timeout: float) -> dict:
+    """Fires a Poisson stream at `rate` req/s for `duration` s; latency counts from the scheduled time."""
+    gaps = rng.exponential(1.0 / rate, size=int(rate * duration * 1.5) + 10)
+    offsets = np.cumsum(gaps)
+    offsets = offsets[offsets < duration]
+    picks = rng.integers(0, len(texts), size=len(offsets))
+
+    def fire(scheduled: float, text: str):
+        try:
+            send(text)
+            ok = True
+        except Exception:
+            ok = False
+        return scheduled, time.perf_counter(), ok
+
+    start = time.perf_counter() + 0.05
+    futures, lag = [], 0.0
+    for offset, i in zip(offsets, picks):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            lag = max(lag, -delay)
+        futures.append(pool.submit(fire, start + offset, texts[i]))
+    done, not_done = wait(futures, timeout=max(0.0, start + duration + timeout - time.perf_counter()))
+    for f in not_done:
+        f.cancel()
+
+    lat, ok_in_window, errors = [], 0, 0
+    for f in done:
+        scheduled, finished, ok = f.result()
+        if not ok:
+            errors += 1
+            continue
+        lat.append(finished - scheduled)
+        ok_in_window += finished <= start + duration
+    sent = len(futures)
+    lat_ms = np.asarray(lat) * 1e3
+    pct = (lambda q: round(float(np.percentile(lat_ms, q)), 2)) if len(lat_ms) else (lambda q: None)
+    return {
+        "offered_rps": rate, "sent": sent, "sent_rps": round(sent / duration, 2), "ok": len(lat), "errors": errors, "timeouts": len(not_done),
+        "throughput_rps": round(ok_in_window / duration, 2),
+        "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99),
+        "max_ms": round(float(lat_ms.max()), 2) if len(lat_ms) else None,
+        "generator_lag_ms": round(lag * 1e3, 2),
+    }
+
+def is_saturated(stage: dict, slo_ms: float) -> bool:
+    failed = (stage["errors"] + stage["timeouts"]) / max(stage["sent"], 1)
+    # against what was actually sent: a Poisson stage offers rate ± sqrt(rate * duration) requests
+    return (stage["throughput_rps"] < SATURATED_THROUGHPUT * stage["sent_rps"]
+            or failed > SATURATED_ERRORS
+            or stage["p99_ms"] is None
+            or (slo_ms is not None and stage["p99_ms"] > slo_ms))
+
+def run(send, texts: list, rates: list, duration: float, slo_ms: float, max_in_flight: int, timeout: float,
+        seed: int = 0, warmup: int = 20) -> dict:
+    rng = np.random.default_rng(seed)
+    for i in rng.integers(0, len(texts), size=warmup):
+        send(texts[i])
+    lengths = np.asarray([len(t) for t in texts])
+    results = {"texts": len(texts), "chars_p50": int(np.percentile(lengths, 50)),
+               "chars_p99": int(np.percentile(lengths, 99)), "duration_s": duration, "slo_ms": slo_ms,
+               "stages": [], "sustainable_rps": 0.0}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for rate in rates:
+            stage = run_stage(send, texts, rate, duration, pool, rng, timeout)
+            stage["saturated"] = is_saturated(stage, slo_ms)
+            results["stages"].append(stage)
+            mark = "🔥" if stage["saturated"] else "✅"
+            print(f"{mark} {rate:>8.1f} req/s offered → {stage['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {stage['p50_ms']} ms  p90 {stage['p90_ms']} ms  p99 {stage['p99_ms']} ms  "
+                  f"errors {stage['errors']}  timeouts {stage['timeouts']}", flush=True)
+            if stage["saturated"]:
+                results["saturation_rps"] = rate
+                break
+            results["sustainable_rps"] = rate
+    return results
+
+def replicas_needed(sustainable_rps: float, target_rps: float, max_utilization: float) -> int:
+    if sustainable_rps <= 0:
+        return None
+    return max(1, math.ceil(target_rps / (sustainable_rps * max_utilization)))
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    common.add_argument("--data", default=DEFAULT_DATA, help="Glob of review JSONL files to draw texts from")
+    common.add_argument("--rates", default="5,10,20,40,80", help="Comma-separated offered rates (req/s), ascending")
+    common.add_argument("--duration", type=float, default=20, help="Seconds per rate")
+    common.add_argument("--slo-ms", type=float, default=None, help="p99 latency above this counts as saturated")
+    common.add_argument("--timeout", type=float, default=10, help="Per-request timeout in seconds")
+    common.add_argument("--max-in-flight", type=int, default=256, help="Generator threads (concurrent requests)")
+    common.add_argument("--target-rps", type=float, help="Peak rate to size replicas for")
+    common.add_argument("--max-utilization", type=float, default=0.7, help="Share of the sustainable rate to plan for")
+    common.add_argument("--json", action="store_true", help="Print results as JSON")
+    common.add_argument("--out", help="Also write the JSON results here")
+    standin = argparse.ArgumentParser(add_help=False)
+    standin.add_argument("--slots", type=int, default=4, help="Requests served concurrently (vCPUs)")
+    standin.add_argument("--base-ms", type=float, default=10.0, help="Simulated per-request overhead")
+    standin.add_argument("--ms-per-token", type=float, default=0.3, help="Simulated per-token cost")
+
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = p.add_subparsers(dest="target", required=True)
+    sub.add_parser("logreg", parents=[common])
+    for name in ("vertex-local", "classify"):
+        sp = sub.add_parser(name, parents=[common, standin])
+        sp.add_argument("--vertex-port", type=int, default=8085)
+    sp = sub.add_parser("http", parents=[common])
+    sp.add_argument("--url", required=True)
+    sp.add_argument("--body", default=vertex_body(), help='JSON body; the string "{text}" is replaced by the review')
+    sp = sub.add_parser("serve-vertex", parents=[standin])
+    sp.add_argument("--port", type=int, default=8085)
+    sp.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    args = p.parse_args()
+
+    if args.target == "serve-vertex":
+        serve_vertex(args.port, args.bundle, args.slots, args.base_ms, args.ms_per_token)
+        sys.exit(0)
+
+    texts = [t for t in load_reviews(args.data) if t]
+    proc = None
+    try:
+        if args.target == "logreg":
+            send = logreg_target(args.bundle)
+        elif args.target == "http":
+            send = http_target(args.url, args.body, args.max_in_flight, args.timeout)
+        else:
+            proc, vertex_url = start_vertex_standin(args)
+            send = (http_target(vertex_url, vertex_body(), args.max_in_flight, args.timeout)
+                    if args.target == "vertex-local"
+                    else classify_target(args.bundle, vertex_url, args.max_in_flight, args.timeout))
+        print(f"📈 {args.target}: {len(texts):,} review texts, {args.duration:g}s per rate")
+        res = run(send, texts, [float(r) for r in args.rates.split(",")], args.duration, args.slo_ms,
+                  args.max_in_flight, args.timeout)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    res["target"] = args.target
+    if args.target_rps:
+        res["target_rps"] = args.target_rps
+        res["replicas"] = replicas_needed(res["sustainable_rps"], args.target_rps, args.max_utilization)
+    if args.out:
+        pathlib.Path(args.out).write_text(json.dumps(res, indent=2))
+    if args.json:
+        print(json.dumps(res, indent=2))
+        sys.exit(0)
+    if "saturation_rps" not in res:
+        print(f"⚠️  Not saturated up to {res['sustainable_rps']:g} req/s; add higher --rates to find the limit")
+    else:
+        print(f"Sustainable: {res['sustainable_rps']:g} req/s per replica (saturated at {res['saturation_rps']:g} req/s)")
+    if args.target_rps:
+        if res["replicas"] is None:
+            print("❌ Saturated at the lowest rate; no replica estimate")
+        else:
+            print(f"→ {res['replicas']} replica(s) for {args.target_rps:g} req/s at ≤{args.max_utilization:.0%} utilization")
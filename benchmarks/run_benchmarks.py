@@ -0,0 +1,264 @@
+# benchmarks/run_benchmarks.py
+"""
+End-to-end, offline performance benchmarks for the sentiment pipeline.
+
+Every stage runs against the checked-in sample data (`reviews_data/`) and LR bundle
+(`models/*.joblib.gz`), optionally scaled up synthetically by cycling the sample:
+
+  ingest     fetch_raw_recent_reviews against a local server replaying Steam pages
+  serialize  reviews_to_jsonl (the GCS landing-zone payload)
+  load       joblib.load of the LR bundle
+  featurize  TfidfVectorizer.transform and FastTfidf.transform, batched
+  score      predict_proba on the featurized batch
+  predict    single-review predictions through the app's ModelRegistry, as the Classify
+             tab's logreg_predict makes them
+  train      ShardedTfidf fit + LogisticRegression fit with the production params
+  aggregate  dashboard positives/negatives per game
+
+Results are written as JSON. With --baseline, every `seconds` metric is compared to
+the stored run and the script exits 1 if any stage is slower than the tolerance.
+
+    python benchmarks/run_benchmarks.py --scales sample,100k --out bench.json
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import datetime as dt
+import http.server
+import itertools
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "app"))
+sys.path.append(str(ROOT / "lr_tfidf_trainer"))
+sys.path.append(str(ROOT / "ingestion_service"))
+from fast_tfidf import FastTfidf
+from parallel_tfidf import ShardedTfidf
+from review_codec import read_jsonl
+import steam_fetcher
+
+from bench_tokenizer import DEFAULT_BUNDLE, DEFAULT_DATA
+
+SCALES = {"sample": None, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+PER_PAGE = 100
+
+def load_sample(pattern: str = DEFAULT_DATA) -> list:
+    import glob
+    rows = []
+    for path in sorted(glob.glob(pattern)):
+        rows.extend(read_jsonl(path))
+    return rows
+
+def scale_up(sample: list, n: int) -> list:
+    """`n` review records cycling the sample (shared dicts: only the list grows)."""
+    return sample if n is None else list(itertools.islice(itertools.cycle(sample), n))
+
+# --- Local Steam replay ---
+class _SteamReplay(http.server.BaseHTTPRequestHandler):
+    pages: list = []     # pre-encoded JSON bodies, cycled
+    total_pages: int = 0
+    last_page: bytes = b""   # the final, possibly partial page, so exactly n_reviews are served
+
+    def do_GET(self):
+        qs = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        cursor = qs.get("cursor", ["*"])[0]
+        page = 0 if cursor == "*" else int(cursor)   # "*" is Steam's first-page cursor
+        body = self.last_page if page == self.total_pages - 1 else self.pages[page % len(self.pages)]
+        nxt = str(page + 1) if page + 1 < self.total_pages else ""
+        body = body[:-1] + f', "cursor": "{nxt}"}}'.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@contextlib.contextmanager
+def steam_replay_server(sample: list, n_reviews: int):
+    n_distinct = -(-len(sample) // PER_PAGE)
+    cycled = list(itertools.islice(itertools.cycle(sample), n_distinct * PER_PAGE))
+    pages = [json.dumps({"success": 1, "reviews": cycled[i:i + PER_PAGE]}).encode()
+             for i in range(0, len(cycled), PER_PAGE)]
+    total_pages = -(-n_reviews // PER_PAGE)
+    start = (total_pages - 1) % n_distinct * PER_PAGE
+    last = cycled[start:start + n_reviews - (total_pages - 1) * PER_PAGE]
+    handler = type("Replay", (_SteamReplay,), {"pages": pages, "total_pages": total_pages,
+                                                "last_page": json.dumps({"success": 1, "reviews": last}).encode()})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+
+# --- Timing helpers ---
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+def record(results: list, scale: str, stage: str, seconds: float, items: int = None, **extra):
+    row = {"scale": scale, "stage": stage, "seconds": round(seconds, 6)}
+    if items:
+        row["items"] = items
+        row["items_per_sec"] = round(items / max(seconds, 1e-9), 1)
+    row.update(extra)
+    results.append(row)
+    rate = f"  ({row['items_per_sec']:,.0f}/s)" if items else ""
+    print(f"  {stage:<18} {seconds:10.3f}s{rate}")
+
+# --- Stages ---
+def bench_ingest(results, scale, sample, n):
+    with steam_replay_server(sample, n) as url, open(os.devnull, "w") as devnull:
+        steam_fetcher.STEAM_REVIEWS_URL = url
+        with contextlib.redirect_stdout(devnull):
+            reviews, secs = timed(steam_fetcher.fetch_raw_recent_reviews, 1172470, "Apex Legends",
+                                  per_page=PER_PAGE, max_pages=-(-n // PER_PAGE), pause=0)
+    record(results, scale, "ingest", secs, len(reviews), held_mb=round(reviews.nbytes / 2**20, 2))
+
+def bench_serialize(results, scale, reviews):
+    payload, secs = timed(steam_fetcher.reviews_to_jsonl, reviews)
+    record(results, scale, "serialize", secs, len(reviews), mb=round(len(payload) / 2**20, 2))
+
+def bench_featurize_score(results, scale, vec, clf, texts):
+    _, secs = timed(vec.transform, texts)
+    record(results, scale, "featurize_sklearn", secs, len(texts))
+    fast = FastTfidf(vec)
+    X, secs = timed(fast.transform, texts)
+    record(results, scale, "featurize_fast", secs, len(texts))
+    _, secs = timed(clf.predict_proba, X)
+    record(results, scale, "score", secs, len(texts))
+
+def bench_train(results, scale, texts, labels, workers):
+    from task import TFIDF_PARAMS, LOGREG_PARAMS
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    featurizer = ShardedTfidf(TfidfVectorizer(**TFIDF_PARAMS), workers=workers)
+    X, secs = timed(featurizer.fit_transform, texts)
+    record(results, scale, "train_tfidf", secs, len(texts), workers=featurizer.workers)
+    _, secs = timed(LogisticRegression(**LOGREG_PARAMS).fit, X, labels)
+    record(results, scale, "train_logreg", secs, len(texts))
+
+def bench_aggregate(results, scale, reviews):
+    df = pd.DataFrame({"game_name": [r["game_name"] for r in reviews],
+                       "voted_up": np.fromiter((r["voted_up"] for r in reviews), dtype=bool, count=len(reviews))})
+    def aggregate():
+        agg = df.groupby("game_name")["voted_up"].agg(positives="sum", total="size")
+        agg["pct_pos"] = (agg["positives"] / agg["total"] * 100).round(1)
+        return agg
+    _, secs = timed(aggregate)
+    record(results, scale, "aggregate", secs, len(reviews))
+
+def bench_model(results, bundle, texts, n_predict: int = 1000):
+    (vec, clf), secs = timed(joblib.load, bundle)
+    record(results, "model", "load", secs, mb=round(os.path.getsize(bundle) / 2**20, 2))
+    from model_registry import ModelRegistry
+    registry = ModelRegistry(pinned=bundle)
+    registry.get()
+    lat = []
+    for t in itertools.islice(itertools.cycle(texts), n_predict):
+        start = time.perf_counter()
+        registry.get().predict_proba([t])[0]
+        lat.append(time.perf_counter() - start)
+    q = statistics.quantiles(lat, n=100)
+    record(results, "model", "predict", sum(lat), n_predict,
+           p50_ms=round(q[49] * 1e3, 3), p95_ms=round(q[94] * 1e3, 3), p99_ms=round(q[98] * 1e3, 3))
+    return vec, clf
+
+def run(scales: list, bundle: str, data: str, stages: set, workers: int = None) -> dict:
+    sample = load_sample(data)
+    results = []
+    print(f"Loaded {len(sample):,} sample reviews from {data}")
+    print("[model]")
+    vec, clf = bench_model(results, bundle, [r["review"] for r in sample])
+    for scale in scales:
+        n = SCALES[scale]
+        reviews = scale_up(sample, n)
+        texts = [r["review"] or "" for r in reviews]
+        print(f"[{scale}] {len(reviews):,} reviews")
+        if "ingest" in stages:
+            bench_ingest(results, scale, sample, len(reviews))
+        if "serialize" in stages:
+            bench_serialize(results, scale, reviews)
+        if "featurize" in stages:
+            bench_featurize_score(results, scale, vec, clf, texts)
+        if "train" in stages:
+            bench_train(results, scale, texts, np.array([int(r["voted_up"]) for r in reviews]), workers)
+        if "aggregate" in stages:
+            bench_aggregate(results, scale, reviews)
+    return {"meta": run_meta(), "results": results}
+
+def run_meta() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "timestamp": dt.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """(scale, stage, baseline_s, current_s, ratio) for every stage slower than baseline × (1 + tolerance)."""
+    base = {(r["scale"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["scale"], r["stage"]))
+        if old and r["seconds"] > old * (1 + tolerance):
+            regressions.append((r["scale"], r["stage"], old, r["seconds"], r["seconds"] / old))
+    return regressions
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--scales", default="sample,100k", help=f"Comma-separated subset of {','.join(SCALES)}")
+    p.add_argument("--stages", default="ingest,serialize,featurize,train,aggregate")
+    p.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    p.add_argument("--data", default=DEFAULT_DATA, help="Glob of review JSONL files")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes for train_tfidf")
+    p.add_argument("--out", help="Write results JSON here")
+    p.add_argument("--save-baseline", help="Write results JSON here as the new baseline")
+    p.add_argument("--baseline", help="Compare against this results JSON")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = p.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = set(scales) - set(SCALES)
+    if unknown:
+        p.error(f"unknown scales: {', '.join(sorted(unknown))}")
+
+    res = run(scales, args.bundle, args.data, set(args.stages.split(",")), args.workers)
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(res, f, indent=2)
+        print(f"✅ Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(res, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for scale, stage, old, new, ratio in regressions:
+                print(f"  {scale}/{stage}: {old:.3f}s → {new:.3f}s ({ratio:.2f}x)")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} vs {args.baseline}")
@@ -0,0 +1,7 @@
+# benchmarks/tests/conftest.py
+# the benchmark scripts import each other and the components' flat modules through sys.path
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
@@ -0,0 +1,84 @@
+# benchmarks/tests/test_load_test.py
+"""The open-loop generator measures from the scheduled send time and finds the saturation point."""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import requests
+
+import load_test
+from load_test import http_target, is_saturated, replicas_needed, run, run_stage, vertex_body
+
+TEXTS = ["great game", "servers are down again and again", "refunded"]
+
+def serial_service(ms: float):
+    """send() of a service that handles one request at a time, taking `ms` each."""
+    lock = threading.Lock()
+    def send(text):
+        with lock:
+            time.sleep(ms / 1e3)
+    return send
+
+def test_replicas_needed():
+    assert replicas_needed(100, 250, 0.7) == 4
+    assert replicas_needed(100, 10, 0.7) == 1
+    assert replicas_needed(0, 10, 0.7) is None
+
+@pytest.mark.parametrize("change, saturated", [
+    ({}, False),
+    ({"throughput_rps": 8.9}, True),
+    ({"errors": 2}, True),
+    ({"timeouts": 2}, True),
+    ({"p99_ms": None}, True),
+    ({"p99_ms": 250.0}, True),
+])
+def test_is_saturated(change, saturated):
+    stage = {"sent": 100, "sent_rps": 10.0, "throughput_rps": 9.5, "errors": 1, "timeouts": 0, "p99_ms": 80.0}
+    assert is_saturated({**stage, **change}, slo_ms=200) is saturated
+
+def test_stage_below_capacity_sees_the_service_time():
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        stage = run_stage(serial_service(2), TEXTS, rate=40, duration=1.0, pool=pool,
+                          rng=np.random.default_rng(0), timeout=5)
+    assert 20 <= stage["sent"] <= 60 and stage["errors"] == stage["timeouts"] == 0
+    assert stage["p50_ms"] >= 2
+    assert not is_saturated(stage, slo_ms=None)
+
+def test_ramp_stops_at_the_first_saturated_rate(capsys):
+    # capacity is 1 / 20 ms = 50 req/s: queueing latency explodes well above it
+    res = run(serial_service(20), TEXTS, rates=[10, 400, 800], duration=1.0, slo_ms=500,
+              max_in_flight=64, timeout=5, warmup=2)
+    assert [s["offered_rps"] for s in res["stages"]] == [10, 400]
+    assert res["sustainable_rps"] == 10 and res["saturation_rps"] == 400
+    assert res["stages"][1]["p99_ms"] > res["stages"][0]["p99_ms"]
+
+def test_failures_count_as_errors():
+    def send(text):
+        raise ConnectionError("refused")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        stage = run_stage(send, TEXTS, rate=50, duration=0.3, pool=pool, rng=np.random.default_rng(1), timeout=1)
+    assert stage["errors"] == stage["sent"] > 0 and stage["ok"] == 0
+    assert is_saturated(stage, slo_ms=None)
+
+class _Model:
+    def predict_proba(self, texts):
+        return [0.9 if "great" in t else 0.1 for t in texts]
+
+def test_http_target_talks_to_the_vertex_stand_in():
+    handler = type("StandIn", (load_test._VertexStandIn,), {"model": _Model(), "slots": threading.Semaphore(2)})
+    server = load_test.http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}{load_test.VERTEX_PATH}"
+    try:
+        send = http_target(url, vertex_body(), max_in_flight=2, timeout=5)
+        send("great game")
+        body = json.loads(vertex_body().replace("{text}", "great game"))
+        preds = requests.post(url, json=body, timeout=5).json()["predictions"]
+        assert preds == [{"label": "POSITIVE", "score": 0.9}]
+        with pytest.raises(requests.HTTPError):
+            http_target(url.replace(":predict", ":explain"), vertex_body(), 2, 5)("x")
+    finally:
+        server.shutdown()
@@ -0,0 +1,39 @@
+# benchmarks/tests/test_run_benchmarks.py
+"""The end-to-end suite runs offline on the sample data and flags slow stages against a baseline."""
+import glob
+
+import pytest
+
+import run_benchmarks
+import steam_fetcher
+from bench_tokenizer import DEFAULT_BUNDLE, DEFAULT_DATA
+
+def results(*rows):
+    return {"meta": {}, "results": [{"scale": s, "stage": st, "seconds": sec} for s, st, sec in rows]}
+
+def test_compare_flags_only_stages_beyond_the_tolerance():
+    baseline = results(("sample", "ingest", 1.0), ("sample", "serialize", 2.0), ("model", "load", 0.5))
+    current = results(("sample", "ingest", 1.19), ("sample", "serialize", 2.5), ("model", "load", 0.1),
+                      ("100k", "ingest", 9.0))     # no baseline for this scale: not a regression
+    assert run_benchmarks.compare(current, baseline, 0.2) == [("sample", "serialize", 2.0, 2.5, 1.25)]
+    assert run_benchmarks.compare(current, baseline, 0.3) == []
+
+def test_scale_up_cycles_the_sample():
+    sample = [{"i": i} for i in range(3)]
+    assert run_benchmarks.scale_up(sample, None) is sample
+    assert [r["i"] for r in run_benchmarks.scale_up(sample, 7)] == [0, 1, 2, 0, 1, 2, 0]
+
+def test_run_replays_steam_pages_offline(monkeypatch, tmp_path):
+    # bench_ingest points the fetcher at the local replay server; restore it afterwards
+    monkeypatch.setattr(steam_fetcher, "STEAM_REVIEWS_URL", steam_fetcher.STEAM_REVIEWS_URL)
+    data = tmp_path / "sample.jsonl"
+    data.write_text("".join(open(sorted(glob.glob(DEFAULT_DATA))[0], encoding="utf-8").readlines()[:150]))
+
+    res = run_benchmarks.run(["sample", "10k"], DEFAULT_BUNDLE, str(data), {"ingest", "serialize", "aggregate"})
+    rows = {(r["scale"], r["stage"]): r for r in res["results"]}
+    assert set(rows) == {("model", "load"), ("model", "predict"),
+                         *((s, st) for s in ("sample", "10k") for st in ("ingest", "serialize", "aggregate"))}
+    assert rows[("sample", "ingest")]["items"] == 150
+    assert rows[("10k", "ingest")]["items"] == rows[("10k", "aggregate")]["items"] == 10_000
+    assert all(r["seconds"] >= 0 for r in res["results"])
+    assert res["meta"]["python"]
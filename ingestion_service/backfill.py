@@ -0,0 +1,410 @@
+# ingestion_service/backfill.py
+"""
+Resumable, checkpointed backfill of every review of an app (`filter=all`).
+
+The regular ingestion only reads the few most recent pages. A backfill walks the
+whole cursor chain of each app and survives restarts:
+
+  * after every page the app's checkpoint (cursor, counters, open chunk) is saved,
+    locally or in GCS, so a restarted crawl continues from the last page it saw;
+  * reviews are spooled to a local NDJSON chunk file that is rolled once it reaches
+    `chunk_bytes`: the chunk is uploaded to the landing zone and a BigQuery load job is
+    started right away, while the crawl carries on with the next chunk;
+  * the checkpoint also remembers the cursor the open chunk started at. If the spool
+    file did not survive the restart (e.g. a new Cloud Run instance), the chunk is
+    re-crawled from there, so no page is lost and none is loaded twice. Chunk blob
+    names and load job ids are deterministic per (run, app, chunk), so re-rolling a
+    chunk that was already loaded is a no-op;
+  * load jobs are looked up in the dataset's location. Every call (including a paused
+    or resumed one) checks the jobs it has started. A failed load is resubmitted under
+    a new job id, and the backfill raises after MAX_LOAD_ATTEMPTS;
+  * with a ReviewStore, a chunk's reviews are appended to it only once the sink has
+    confirmed the chunk loaded (from its spool file, kept until then, or read back from
+    the sink). The recent-reviews fetcher stops paging at stored reviews, so the store
+    must never hold a review that is not in raw_reviews.
+
+Runs as a background job of the ingestion service (POST /backfill) or from the CLI:
+
+    python backfill.py --app 1172470 "Apex Legends" --checkpoint-dir ./backfill --output-dir ./backfill/chunks
+    python backfill.py --app 1172470 "Apex Legends" --bucket steam-reviews-bucket-0 \\
+        --bq-table sentiment-analysis-steam.steam_reviews.raw_reviews
+"""
+import argparse
+import json
+import os
+import pathlib
+import tempfile
+import time
+import uuid
+from contextlib import nullcontext
+
+import metrics
+from review_codec import dumps, encode_jsonl, loads
+from steam_fetcher import fetch_reviews_page
+
+CHUNK_BYTES = int(float(os.environ.get("BACKFILL_CHUNK_MB", "64")) * 2**20)
+PAUSE = float(os.environ.get("BACKFILL_PAUSE_SECONDS", "0.5"))
+LANDING_PREFIX = "raw_data/steam_reviews_backfill"
+MAX_LOAD_ATTEMPTS = 3   # per chunk, before the backfill gives up on it
+
+# --- Checkpoint stores ---
+class LocalCheckpoints:
+    def __init__(self, directory: str):
+        self.dir = pathlib.Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def load(self, appid: int):
+        path = self.dir / f"{appid}.json"
+        return loads(path.read_bytes()) if path.exists() else None
+
+    def save(self, cp: dict):
+        path = self.dir / f"{cp['appid']}.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_bytes(dumps(cp))
+        os.replace(tmp, path)
+
+class GcsCheckpoints:
+    def __init__(self, bucket, prefix: str = "backfill/checkpoints"):
+        self.bucket, self.prefix = bucket, prefix.rstrip("/")
+
+    def load(self, appid: int):
+        blob = self.bucket.blob(f"{self.prefix}/{appid}.json")
+        return loads(blob.download_as_bytes()) if blob.exists() else None
+
+    def save(self, cp: dict):
+        # a single-object upload is atomic: readers see the old or the new checkpoint
+        self.bucket.blob(f"{self.prefix}/{cp['appid']}.json").upload_from_string(
+            dumps(cp), content_type="application/json")
+
+# --- Chunk sinks ---
+class LocalSink:
+    """Keeps finished chunks as files (no warehouse); handy for local crawls and tests."""
+
+    def __init__(self, directory: str):
+        self.dir = pathlib.Path(directory)
+
+    def write(self, cp: dict, seq: int, spool: pathlib.Path, rows: int) -> dict:
+        dest = self.dir / f"app={cp['appid']}" / f"{cp['run_id']}-{seq:05d}.jsonl"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_suffix(".tmp")
+        tmp.write_bytes(spool.read_bytes())
+        os.replace(tmp, dest)
+        return {"uri": str(dest), "loaded": True}
+
+    def read(self, chunk: dict) -> bytes:
+        return pathlib.Path(chunk["uri"]).read_bytes()
+
+    def check(self, chunks: list):
+        pass
+
+    def wait(self, chunks: list):
+        pass
+
+class GcsBigQuerySink:
+    """Uploads each chunk to the landing zone and starts a BigQuery load job for it."""
+
+    def __init__(self, bucket, bq_client, table: str, schema: list, prefix: str = LANDING_PREFIX,
+                 location: str = None):
+        self.bucket, self.bq, self.table, self.schema, self.prefix = bucket, bq_client, table, schema, prefix
+        self._location = location
+
+    @property
+    def location(self) -> str:
+        """The dataset's location; jobs outside the client's default location are only found with it."""
+        if self._location is None:
+            self._location = self.bq.get_dataset(self.table.rsplit(".", 1)[0]).location
+        return self._location
+
+    def _submit(self, uri: str, job_id: str):
+        from google.api_core.exceptions import Conflict
+        from google.cloud import bigquery
+        config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            schema=self.schema,
+            ignore_unknown_values=True,
+        )
+        try:
+            self.bq.load_table_from_uri(uri, self.table, job_id=job_id, job_config=config, location=self.location)
+        except Conflict:
+            # this chunk was rolled (and its load started) before a restart
+            print(f"→ load job {job_id} already exists; not loading it again.")
+
+    def write(self, cp: dict, seq: int, spool: pathlib.Path, rows: int) -> dict:
+        name = f"{self.prefix}/app={cp['appid']}/{cp['run_id']}-{seq:05d}.jsonl"
+        with metrics.span("backfill_upload", app_id=cp["appid"]) as sp:
+            self.bucket.blob(name).upload_from_filename(str(spool), content_type="application/jsonl")
+            sp.set(bytes=spool.stat().st_size, rows=rows)
+        uri = f"gs://{self.bucket.name}/{name}"
+        job_id = f"backfill_{cp['appid']}_{cp['run_id']}_{seq:05d}"
+        self._submit(uri, job_id)
+        return {"uri": uri, "load_job": job_id, "location": self.location}
+
+    def read(self, chunk: dict) -> bytes:
+        """The chunk's NDJSON as uploaded to the landing zone."""
+        return self.bucket.blob(chunk["uri"][len(f"gs://{self.bucket.name}/"):]).download_as_bytes()
+
+    def _job(self, chunk: dict):
+        return self.bq.get_job(chunk["load_job"], location=chunk.get("location") or self.location)
+
+    def _settle(self, chunk: dict, job) -> bool:
+        """
+        Records a finished load job: marks the chunk loaded, or resubmits it under a new job
+        id if the load failed (load jobs are atomic, so a failed one wrote nothing) and
+        raises after MAX_LOAD_ATTEMPTS. Returns whether the chunk is loaded.
+        """
+        if job.error_result is None:
+            chunk["loaded"] = True
+            metrics.inc("bq_loaded_rows_total", job.output_rows or 0)
+            return True
+        attempts = chunk.get("attempts", 1)
+        if attempts >= MAX_LOAD_ATTEMPTS:
+            raise RuntimeError(f"load job {job.job_id} for chunk {chunk['seq']} ({chunk['uri']}) failed "
+                               f"{attempts} times: {job.error_result}")
+        metrics.inc("backfill_load_retries_total")
+        print(f"WARN: load job {job.job_id} for chunk {chunk['seq']} failed ({job.error_result.get('message')}); "
+              f"resubmitting (attempt {attempts + 1}/{MAX_LOAD_ATTEMPTS}).")
+        chunk["attempts"] = attempts + 1
+        chunk["load_job"] = f"{chunk.setdefault('first_load_job', chunk['load_job'])}_retry{attempts}"
+        self._submit(chunk["uri"], chunk["load_job"])
+        return False
+
+    def check(self, chunks: list):
+        """Settles chunks whose load jobs have finished, without waiting for the others."""
+        for chunk in chunks:
+            if not chunk.get("loaded"):
+                job = self._job(chunk)
+                if job.done():
+                    self._settle(chunk, job)
+
+    def wait(self, chunks: list):
+        """Blocks until every chunk is loaded, resubmitting failed loads; raises once retries run out."""
+        from google.api_core.exceptions import GoogleAPICallError
+        for chunk in chunks:
+            while not chunk.get("loaded"):
+                job = self._job(chunk)
+                try:
+                    job.result()
+                except GoogleAPICallError:
+                    if job.error_result is None:
+                        raise    # the lookup failed, not the load
+                self._settle(chunk, job)
+
+# --- Crawl ---
+def new_checkpoint(appid: int, game_name: str) -> dict:
+    return {
+        "appid": appid, "game_name": game_name,
+        "run_id": uuid.uuid4().hex[:8],
+        "status": "running",
+        "cursor": "*", "chunk_start_cursor": "*",
+        "chunk_seq": 0, "chunk_rows": 0, "chunk_bytes": 0, "chunk_pages": 0,
+        "pages": 0, "reviews": 0,
+        "chunks": [],
+        "started_at": time.time(), "updated_at": time.time(),
+    }
+
+def _spool_path(spool_dir: pathlib.Path, cp: dict, seq: int = None) -> pathlib.Path:
+    seq = cp["chunk_seq"] if seq is None else seq
+    return spool_dir / f"{cp['appid']}-{cp['run_id']}-{seq:05d}.jsonl"
+
+def _store_loaded(cp: dict, store, sink, spool_dir: pathlib.Path) -> bool:
+    """
+    Appends the reviews of every chunk the sink has confirmed loaded (and not stored yet)
+    to `store`, then drops its spool file. Returns whether any chunk was stored. Appending
+    is idempotent per recommendationid, so a crash before the checkpoint save is harmless.
+    """
+    stored = False
+    for chunk in cp["chunks"]:
+        if not chunk.get("loaded") or chunk.get("stored"):
+            continue
+        spool = _spool_path(spool_dir, cp, chunk["seq"])
+        # the spool is gone if the crawl resumed on another instance
+        payload = spool.read_bytes() if spool.exists() else sink.read(chunk)
+        added = store.append([loads(line) for line in payload.splitlines() if line.strip()])
+        metrics.inc("review_store_appended_total", added)
+        chunk["stored"] = stored = True
+        spool.unlink(missing_ok=True)
+    return stored
+
+def _recover_spool(spool: pathlib.Path, cp: dict):
+    """Lines up the spool file with the checkpoint, re-crawling the open chunk if it was lost."""
+    size = spool.stat().st_size if spool.exists() else -1
+    if size >= cp["chunk_bytes"] and cp["chunk_bytes"] > 0:
+        # pages written after the last checkpoint save are dropped and fetched again
+        with open(spool, "r+b") as f:
+            f.truncate(cp["chunk_bytes"])
+        return
+    if cp["chunk_rows"]:
+        print(f"→ AppID {cp['appid']}: open chunk {cp['chunk_seq']} was lost; re-crawling it "
+              f"({cp['chunk_rows']:,} reviews) from its first cursor.")
+    cp["pages"] -= cp["chunk_pages"]
+    cp["reviews"] -= cp["chunk_rows"]
+    cp["cursor"] = cp["chunk_start_cursor"]
+    cp["chunk_rows"] = cp["chunk_bytes"] = cp["chunk_pages"] = 0
+    spool.write_bytes(b"")
+
+def backfill_app(
+    appid: int,
+    game_name: str,
+    checkpoints,
+    sink,
+    spool_dir: str = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    max_pages: int = None,
+    pause: float = PAUSE,
+    per_page: int = 100,
+    validator=None,
+    store=None,
+    progress=None,
+    page_lock=None,
+    restart: bool = False,
+) -> dict:
+    """
+    Crawls every review of `appid` (resuming from its checkpoint) and returns the final
+    checkpoint. `max_pages` bounds this call only; the next call continues from there.
+    `progress(cp)` is called after every saved checkpoint; `page_lock()` (e.g.
+    JobManager.game_lock) is held around each page fetch only, so a long backfill
+    doesn't starve the regular ingestion of the same app. Reviews reach `store` only
+    after their chunk is loaded.
+    """
+    spool_dir = pathlib.Path(spool_dir or tempfile.gettempdir()) / "backfill-spool"
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    cp = None if restart else checkpoints.load(appid)
+    if cp is not None and cp["status"] == "done":
+        # an earlier call may have stopped waiting on (or failed) a load; finish those first
+        sink.wait(cp["chunks"])
+        if store is not None:
+            _store_loaded(cp, store, sink, spool_dir)
+        checkpoints.save(cp)
+        print(f"✅ AppID {appid}: backfill already complete ({cp['reviews']:,} reviews).")
+        return cp
+    if cp is None:
+        cp = new_checkpoint(appid, game_name)
+    else:
+        print(f"→ {game_name}: resuming backfill at page {cp['pages'] + 1} ({cp['reviews']:,} reviews so far).")
+        # loads started before the pause or restart: surface (and resubmit) any that failed
+        sink.check(cp["chunks"])
+        if store is not None:
+            _store_loaded(cp, store, sink, spool_dir)
+        checkpoints.save(cp)
+    spool = _spool_path(spool_dir, cp)
+    _recover_spool(spool, cp)
+    # Steam hands back the same cursor once the end is reached; remember the ones of this chunk
+    seen = {cp["cursor"]}
+
+    pages_this_call = 0
+    while True:
+        with page_lock() if page_lock is not None else nullcontext():
+            data = fetch_reviews_page(appid, cp["cursor"], review_filter="all", per_page=per_page)
+        reviews = data.get("reviews") or []
+        # the end of the history is an empty page, not one whose reviews were all rejected
+        fetched = len(reviews)
+        if validator is not None and reviews:
+            reviews, rejected = validator.validate(reviews)
+            if rejected:
+                metrics.inc("steam_reviews_rejected_total", len(rejected), app_id=appid)
+        for r in reviews:
+            r["app_id"] = appid
+            r["game_name"] = game_name
+        next_cursor = data.get("cursor") or ""
+
+        if reviews:
+            payload = encode_jsonl(reviews) + b"\n"
+            with open(spool, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            cp["chunk_rows"] += len(reviews)
+            cp["chunk_bytes"] += len(payload)
+            cp["reviews"] += len(reviews)
+            metrics.inc("backfill_reviews_total", len(reviews), app_id=appid)
+        cp["pages"] += 1
+        cp["chunk_pages"] += 1
+        pages_this_call += 1
+        done = not fetched or not next_cursor or next_cursor in seen
+        seen.add(next_cursor)
+        cp["cursor"] = next_cursor or cp["cursor"]
+
+        rolled = None
+        if cp["chunk_rows"] and (cp["chunk_bytes"] >= chunk_bytes or done):
+            with metrics.span("backfill_chunk", app_id=appid) as sp:
+                info = sink.write(cp, cp["chunk_seq"], spool, cp["chunk_rows"])
+                sp.set(seq=cp["chunk_seq"], rows=cp["chunk_rows"], bytes=cp["chunk_bytes"])
+            cp["chunks"].append({"seq": cp["chunk_seq"], "rows": cp["chunk_rows"], "bytes": cp["chunk_bytes"], **info})
+            print(f"→ {game_name}: chunk {cp['chunk_seq']} ({cp['chunk_rows']:,} reviews, "
+                  f"{cp['chunk_bytes'] / 2**20:.1f} MiB) → {info['uri']}")
+            rolled = spool
+            cp["chunk_seq"] += 1
+            cp["chunk_start_cursor"] = cp["cursor"]
+            cp["chunk_rows"] = cp["chunk_bytes"] = cp["chunk_pages"] = 0
+            seen = {cp["cursor"]}
+            spool = _spool_path(spool_dir, cp)
+        if done:
+            cp["status"] = "done"
+        cp["updated_at"] = time.time()
+        checkpoints.save(cp)
+        if store is not None:
+            # the rolled spool stays until its chunk is loaded and stored
+            if _store_loaded(cp, store, sink, spool_dir):
+                checkpoints.save(cp)
+        elif rolled is not None:
+            rolled.unlink(missing_ok=True)
+        if progress is not None:
+            progress(cp)
+
+        if done:
+            print(f"✅ {game_name}: backfill complete — {cp['reviews']:,} reviews in {cp['pages']:,} pages, "
+                  f"{len(cp['chunks'])} chunk(s).")
+            break
+        if max_pages and pages_this_call >= max_pages:
+            print(f"→ {game_name}: stopping after {pages_this_call} pages; resume picks up at page {cp['pages'] + 1}.")
+            break
+        time.sleep(pause)
+
+    if cp["status"] == "done":
+        sink.wait(cp["chunks"])
+    else:
+        sink.check(cp["chunks"])
+    if store is not None:
+        _store_loaded(cp, store, sink, spool_dir)
+    checkpoints.save(cp)
+    return cp
+
+def checkpoint_summary(cp: dict) -> dict:
+    summary = {k: cp[k] for k in ("appid", "game_name", "status", "pages", "reviews", "updated_at")}
+    summary["chunks"] = len(cp["chunks"])
+    return summary
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--app", nargs=2, action="append", metavar=("APPID", "NAME"), required=True,
+                   help="App to backfill (repeatable)")
+    p.add_argument("--checkpoint-dir", default="backfill", help="Local checkpoints (ignored with --bucket)")
+    p.add_argument("--output-dir", default="backfill/chunks", help="Local chunk output (ignored with --bucket)")
+    p.add_argument("--bucket", help="GCS bucket for checkpoints and landing chunks")
+    p.add_argument("--bq-table", help="project.dataset.table to load chunks into (with --bucket)")
+    p.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20)
+    p.add_argument("--max-pages", type=int, default=None, help="Stop each app after this many pages (resumable)")
+    p.add_argument("--pause", type=float, default=PAUSE)
+    p.add_argument("--restart", action="store_true", help="Ignore existing checkpoints and start over")
+    args = p.parse_args()
+
+    validator = None
+    if args.bucket:
+        if not args.bq_table:
+            p.error("--bq-table is required with --bucket")
+        from google.cloud import bigquery, storage
+        from review_codec import ReviewValidator
+        bucket = storage.Client().bucket(args.bucket)
+        bq = bigquery.Client(project=args.bq_table.split(".")[0])
+        # the raw table (created by the ingestion service) carries raw_reviews_schema
+        schema = bq.get_table(args.bq_table).schema
+        checkpoints, sink = GcsCheckpoints(bucket), GcsBigQuerySink(bucket, bq, args.bq_table, schema)
+        validator = ReviewValidator(schema)
+    else:
+        checkpoints, sink = LocalCheckpoints(args.checkpoint_dir), LocalSink(args.output_dir)
+
+    for appid, name in args.app:
+        cp = backfill_app(int(appid), name, checkpoints, sink, chunk_bytes=int(args.chunk_mb * 2**20),
+                          max_pages=args.max_pages, pause=args.pause, validator=validator, restart=args.restart)
+        print(json.dumps(checkpoint_summary(cp)))
@@ -2,7 +2,7 @@
 
 import os
 import pandas as pd
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from google.cloud import storage, bigquery
 import datetime as dt
 import requests
@@ -11,7 +11,11 @@ import re
 import io
 import time
 
+import metrics
+from jobs import JobManager, Job
+
 app = Flask(__name__)
+job_manager = JobManager()
 
 # --- Configuration (will be pulled from environment variables in Cloud Run) ---
 GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
@@ -29,6 +33,9 @@ BQ_RAW_TABLE_ID = os.environ.get("BQ_RAW_TABLE_ID", "raw_reviews")
 
 REGION_ENV = os.environ.get("REGION", "US")
 
+# Optional local review store (see review_store.py); mount a persistent volume here to keep it across restarts
+REVIEW_STORE_DIR = os.environ.get("REVIEW_STORE_DIR")
+
 print(f"App config: GCS_BUCKET_NAME={GCS_BUCKET_NAME}, BQ_PROJECT_ID={BQ_PROJECT_ID}, REGION_ENV={REGION_ENV}")
 
 # Initialize GCS client
@@ -139,203 +146,67 @@ def create_bq_dataset_and_table_if_not_exists():
             print(f"ERROR: Failed to create BigQuery table {BQ_RAW_TABLE_ID}: {create_e}")
             raise
 
-# --- SteamSpy and Steam API Logic (from your notebook) ---
+# --- SteamSpy and Steam API Logic (see steam_fetcher.py) ---
+from steam_fetcher import owners_upper, get_top_10_steam_games, fetch_raw_recent_reviews, reviews_to_jsonl
+from review_batch import ReviewBatch
+from review_codec import ReviewValidator
+import backfill
+from review_store import ReviewStore
 
-def owners_upper(o_str: str) -> int:
-    try:
-        return int(o_str.split("..")[-1].replace(",", ""))
-    except:
-        return 0
-
-def get_top_10_steam_games():
-    print("Fetching top 10 Steam games from SteamSpy...")
-    url = "https://steamspy.com/api.php"
-    resp = requests.get(url, params={"request":"top100forever"}, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-
-    games = list(data.values())
-    games_sorted = sorted(
-        games,
-        key=lambda g: owners_upper(g.get("owners", "")),
-        reverse=True
-    )
-    top10 = games_sorted[:10]
-    
-    top10_games_list = []
-    print("Top 10 Steam Games by all-time owners:")
-    for g in top10:
-        aid = g["appid"]
-        name = g.get("name", "<unknown>")
-        owners = g.get("owners", "<n/a>")
-        print(f" • {aid}: {name} (owners ≈ {owners})")
-        top10_games_list.append((aid, name))
-    
-    return top10_games_list
-''' 
-### original fetch_raw_recent_reviews
-def fetch_raw_recent_reviews(
-    appid: int,
-    game_name: str,
-    per_page: int = 10,
-    max_pages: int = 1,
-    pause: float = 0.2
-) -> list:
-    """Fetches recent reviews for a given appid and returns raw JSON records."""
-    print(f"Fetching raw recent reviews for {game_name} (AppID: {appid})...")
-    
-    all_raw_reviews = []
-    base_url = f"https://store.steampowered.com/appreviews/{appid}"
-    params = {
-        "json": "1",
-        "language": "english",
-        "filter": "recent",
-        "num_per_page": str(per_page),
-    }
-    cursor = None
-    page = 0
-
-    while page < max_pages:
-        page += 1
-        if cursor:
-            params["cursor"] = cursor
+# compiled once; every fetched review is checked against it right after decoding
+review_validator = ReviewValidator(raw_reviews_schema)
 
-        try:
-            resp = requests.get(base_url, params=params, headers={"User-Agent":"Mozilla/5.0"}, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-            reviews = data.get("reviews", [])
-            if not reviews:
-                print(f"→ {game_name}: no reviews on page {page}, stopping.")
-                break
-
-            print(f"→ {game_name}: page {page}/{max_pages}, got {len(reviews)} reviews.")
-
-            for r in reviews:
-                r["app_id"] = appid
-                r["game_name"] = game_name
-                all_raw_reviews.append(r)
-
-            cursor = data.get("cursor", "")
-            if not cursor:
-                print(f"→ {game_name}: no next cursor; done.")
-                break
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching reviews for {game_name} (AppID: {appid}): {e}")
-            break
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON for {game_name} (AppID: {appid}): {e}")
-            break
-        
-        time.sleep(pause)
-
-    print(f"✅ Done: fetched {len(all_raw_reviews):,} raw reviews for {game_name}")
-    return all_raw_reviews
-'''
-
-def fetch_raw_recent_reviews(
-    appid: int,
-    game_name: str,
-    per_page: int = 100,  # Keeping this smaller for debugging, can be 100 later
-    max_pages: int = 5,  # <-- TEMPORARILY REDUCED TO 1 PAGE FOR FASTER DEBUGGING CYCLES
-    pause: float = 0.2
-) -> list:
-    """Fetches recent reviews for a given appid and returns raw JSON records."""
-    print(f"Fetching raw recent reviews for {game_name} (AppID: {appid})...")
-    
-    all_raw_reviews = []
-    base_url = f"https://store.steampowered.com/appreviews/{appid}"
-    params = {
-        "json": "1",
-        "language": "english",
-        "filter": "recent",
-        "num_per_page": str(per_page),
-    }
-    cursor = None
-    page = 0
-
-    while page < max_pages:
-        page += 1
-        if cursor:
-            params["cursor"] = cursor
-
-        try:
-            # --- ADDED MORE SPECIFIC EXCEPTION HANDLING FOR REQUESTS ---
-            resp = requests.get(base_url, params=params, headers={"User-Agent":"Mozilla/5.0"}, timeout=60) # <-- INCREASED TIMEOUT TO 60 SECONDS
-            resp.raise_for_status() # This raises HTTPError for 4xx/5xx responses (e.g., 429 Too Many Requests)
-            data = resp.json()
-            reviews = data.get("reviews", [])
-            if not reviews:
-                print(f"→ {game_name}: no reviews on page {page}, stopping.")
-                break
-
-            print(f"→ {game_name}: page {page}/{max_pages}, got {len(reviews)} reviews.")
-
-            for r in reviews:
-                r["app_id"] = appid
-                r["game_name"] = game_name
-                all_raw_reviews.append(r)
-
-            cursor = data.get("cursor", "")
-            if not cursor:
-                print(f"→ {game_name}: no next cursor; done.")
-                break
-
-        except requests.exceptions.Timeout as e:
-            print(f"ERROR: Request Timeout for {game_name} (AppID: {appid}): {e}")
-            break # Stop fetching for this game on timeout
-        except requests.exceptions.ConnectionError as e:
-            print(f"ERROR: Connection Error for {game_name} (AppID: {appid}): {e}")
-            break # Stop fetching for this game on connection error
-        except requests.exceptions.HTTPError as e: # This handles 4xx/5xx status codes
-            print(f"ERROR: HTTP Error for {game_name} (AppID: {appid}): {e.response.status_code} - {e.response.text}")
-            break # Stop fetching for this game on HTTP error (e.g., 429 Too Many Requests)
-        except requests.exceptions.RequestException as e: # Catch any other requests-related error
-            print(f"ERROR: General Request Error for {game_name} (AppID: {appid}): {e}")
-            break # Stop fetching for this game on general request error
-        except json.JSONDecodeError as e:
-            print(f"ERROR: JSON Decode Error for {game_name} (AppID: {appid}): {e}")
-            break # Stop fetching for this game on JSON decode error
-        except Exception as e: # Catch any other unexpected errors
-            print(f"ERROR: Unexpected error in fetching reviews for {game_name} (AppID: {appid}): {type(e).__name__} - {e}")
-            break # Stop fetching for this game on any other error
-        
-        time.sleep(pause)
-
-    print(f"✅ Done: fetched {len(all_raw_reviews):,} raw reviews for {game_name}")
-    return all_raw_reviews
+review_store = ReviewStore(REVIEW_STORE_DIR) if REVIEW_STORE_DIR else None
+if review_store is not None:
+    print(f"Review store at {REVIEW_STORE_DIR}: {len(review_store):,} reviews.")
 
 # --- Main Ingestion Logic ---
-def ingest_and_update_data_to_bq():
-    print("Starting data ingestion process to BigQuery...")
+def ingest_and_update_data_to_bq(job: Job = None):
+    job = job or Job("ingest")
+    print(f"Starting data ingestion process to BigQuery (job {job.id})...")
     
-    create_bq_dataset_and_table_if_not_exists()
+    with job.stage("ensure_table"):
+        create_bq_dataset_and_table_if_not_exists()
 
     # 1. Get Top 10 Games
-    top10_games = get_top_10_steam_games()
+    with job.stage("steamspy_top10"):
+        top10_games = get_top_10_steam_games()
     if not top10_games:
         print("No top 10 games found. Exiting ingestion.")
         return False
 
     # 2. Fetch Raw Reviews for all games
-    all_raw_reviews_for_bq = []
+    all_raw_reviews_for_bq = ReviewBatch()
     for appid, name in top10_games:
-        reviews_for_game = fetch_raw_recent_reviews(
-            appid=appid,
-            game_name=name,
-            max_pages=5,
-            per_page=100,
-            pause=0.2
-        )
-        all_raw_reviews_for_bq.extend(reviews_for_game)
+        job.game(appid, name=name, status="queued", rows=0)
+    with job.stage("fetch"):
+        for appid, name in top10_games:
+            # another job (e.g. a backfill) may be crawling this app right now
+            with job_manager.game_lock(appid), metrics.span("fetch_game", app_id=appid) as sp:
+                job.game(appid, status="fetching")
+                started = time.perf_counter()
+                reviews_for_game = fetch_raw_recent_reviews(
+                    appid=appid,
+                    game_name=name,
+                    max_pages=5,
+                    per_page=100,
+                    pause=0.2,
+                    store=review_store,
+                    validator=review_validator,
+                )
+                sp.set(reviews=len(reviews_for_game))
+            job.game(appid, status="fetched", rows=len(reviews_for_game),
+                     seconds=round(time.perf_counter() - started, 3))
+            all_raw_reviews_for_bq.extend(reviews_for_game)
     
     if not all_raw_reviews_for_bq:
         print("No new raw reviews fetched. BigQuery table not updated.")
         return True
 
-    # --- Convert list of dicts to JSONL string for GCS upload ---
-    jsonl_data = "\n".join([json.dumps(r, ensure_ascii=False) for r in all_raw_reviews_for_bq])
+    # --- Convert list of dicts to JSONL bytes for GCS upload ---
+    with job.stage("serialize") as sp:
+        jsonl_data = reviews_to_jsonl(all_raw_reviews_for_bq)
+        sp.set(reviews=len(all_raw_reviews_for_bq), bytes=len(jsonl_data))
     
     # --- Construct GCS destination path with date partitioning ---
     current_date_str = dt.datetime.utcnow().strftime("%Y-%m-%d")
@@ -349,7 +220,10 @@ def ingest_and_update_data_to_bq():
     print(f"Uploading {len(all_raw_reviews_for_bq):,} raw reviews to GCS: gs://{GCS_BUCKET_NAME}/{gcs_destination_blob_path}")
     try:
         blob = bucket.blob(gcs_destination_blob_path)
-        blob.upload_from_string(jsonl_data, content_type="application/jsonl")
+        with job.stage("gcs_upload") as sp:
+            blob.upload_from_string(jsonl_data, content_type="application/jsonl")
+            sp.set(bytes=len(jsonl_data))
+        metrics.inc("gcs_uploaded_bytes_total", len(jsonl_data))
         print("✅ Raw reviews uploaded to GCS successfully.")
     except Exception as e:
         print(f"ERROR: Failed to upload raw reviews to GCS: {e}")
@@ -371,30 +245,148 @@ def ingest_and_update_data_to_bq():
     )
     
     try:
-        load_job.result() # Wait for the job to complete
+        with job.stage("bq_load") as sp:
+            load_job.result() # Wait for the job to complete
+            sp.set(rows=load_job.output_rows, job_id=load_job.job_id)
+        metrics.inc("bq_loaded_rows_total", load_job.output_rows or 0)
         print(f"✅ Loaded {load_job.output_rows} rows from GCS into BigQuery table {BQ_RAW_TABLE_ID}.")
-        return True
     except Exception as e:
         print(f"ERROR: BigQuery load job failed: {e}")
         if load_job.errors:
             print("BigQuery job errors:", load_job.errors)
         return False
-
-# --- Flask Endpoint for Cloud Run ---
+    job.result = {"rows_loaded": load_job.output_rows, "gcs_uri": f"gs://{GCS_BUCKET_NAME}/{gcs_destination_blob_path}"}
+
+    # 5. Record the loaded reviews in the review store. Only now: the fetcher stops paging at
+    # stored reviews, so anything appended before a failed upload/load would never be re-fetched.
+    if review_store is not None:
+        with job.stage("review_store_append") as sp:
+            added = review_store.append(all_raw_reviews_for_bq.table())
+            sp.set(reviews=len(all_raw_reviews_for_bq), added=added)
+        metrics.inc("review_store_appended_total", added)
+        print(f"✅ {added:,} new reviews appended to the review store.")
+        job.result["review_store_added"] = added
+    return True
+
+# --- Backfill (full history of each app, resumable; see backfill.py) ---
+def backfill_games(job: Job, apps: list = None, max_pages: int = None, chunk_bytes: int = backfill.CHUNK_BYTES):
+    with job.stage("ensure_table"):
+        create_bq_dataset_and_table_if_not_exists()
+    if not apps:
+        with job.stage("steamspy_top10"):
+            apps = get_top_10_steam_games()
+    checkpoints = backfill.GcsCheckpoints(bucket)
+    sink = backfill.GcsBigQuerySink(bucket, bq_client, f"{BQ_PROJECT_ID}.{BQ_DATASET_ID}.{BQ_RAW_TABLE_ID}",
+                                    raw_reviews_schema)
+    for appid, name in apps:
+        job.game(appid, name=name, status="queued", rows=0)
+
+    def progress(cp):
+        job.game(cp["appid"], rows=cp["reviews"], pages=cp["pages"], chunks=len(cp["chunks"]))
+
+    results = {}
+    for appid, name in apps:
+        job.game(appid, status="crawling")
+        with job.stage("backfill", app_id=appid):
+            cp = backfill.backfill_app(
+                int(appid), name, checkpoints, sink,
+                chunk_bytes=chunk_bytes, max_pages=max_pages,
+                validator=review_validator, store=review_store, progress=progress,
+                page_lock=lambda: job_manager.game_lock(appid),
+            )
+        job.game(appid, status="done" if cp["status"] == "done" else "paused")
+        results[str(appid)] = backfill.checkpoint_summary(cp)
+    job.result = results
+    return True
+
+# --- Flask Endpoints for Cloud Run ---
 @app.route('/', methods=['POST'])
 def ingest_data_trigger():
-    if request.method == 'POST':
-        try:
-            success = ingest_and_update_data_to_bq()
-            if success:
-                # In the next phase, you'd trigger your DBT transformation here (e.g., via Cloud Build)
-                return jsonify({"status": "success", "message": "Raw data ingested to BigQuery."}), 200
-            else:
-                return jsonify({"status": "failed", "message": "Raw data ingestion to BigQuery failed."}), 500
-        except Exception as e:
-            print(f"Error during ingestion: {e}")
-            return jsonify({"status": "error", "message": str(e)}), 500
-    return 'OK', 200
+    """Enqueues an ingestion run and returns immediately; poll GET /jobs/<job_id> for progress."""
+    try:
+        job, coalesced = job_manager.submit("ingest", ingest_and_update_data_to_bq)
+    except Exception as e:
+        print(f"Error enqueuing ingestion: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    message = "Ingestion already in progress." if coalesced else "Ingestion job accepted."
+    # In the next phase, you'd trigger your DBT transformation when the job succeeds (e.g., via Cloud Build)
+    return jsonify({"status": "accepted", "message": message, "job_id": job.id, "coalesced": coalesced}), \
+        202, {"Location": f"/jobs/{job.id}"}
+
+def parse_backfill_request(body) -> tuple:
+    """(apps, max_pages, chunk_bytes) of a POST /backfill body; ValueError describes what is wrong."""
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    apps = []
+    entries = body.get("apps") or []
+    if not isinstance(entries, list):
+        raise ValueError('"apps" must be a list of [appid, "name"] pairs')
+    for entry in entries:
+        if not (isinstance(entry, list) and len(entry) == 2):
+            raise ValueError(f'"apps" entries must be [appid, "name"] pairs, got {entry!r}')
+        appid, name = entry
+        # bools are ints in Python; numeric strings are accepted as app ids
+        if isinstance(appid, bool) or not (isinstance(appid, int) or (isinstance(appid, str) and appid.isdigit())) \
+                or int(appid) <= 0:
+            raise ValueError(f"app id must be a positive integer, got {appid!r}")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"app {appid} needs a game name")
+        apps.append((int(appid), name.strip()))
+    max_pages = body.get("max_pages")
+    if max_pages is not None and (isinstance(max_pages, bool) or not isinstance(max_pages, int) or max_pages <= 0):
+        raise ValueError(f'"max_pages" must be a positive integer, got {max_pages!r}')
+    chunk_mb = body.get("chunk_mb", backfill.CHUNK_BYTES / 2**20)
+    if isinstance(chunk_mb, bool) or not isinstance(chunk_mb, (int, float)) or chunk_mb <= 0:
+        raise ValueError(f'"chunk_mb" must be a positive number, got {chunk_mb!r}')
+    return apps, max_pages, int(chunk_mb * 2**20)
+
+@app.route('/backfill', methods=['POST'])
+def backfill_trigger():
+    """
+    Enqueues a backfill. Optional JSON body:
+      {"apps": [[appid, "name"], ...], "max_pages": 500, "chunk_mb": 64}
+    Without "apps" the SteamSpy top 10 are crawled. Re-posting resumes from the checkpoints.
+    """
+    body = request.get_json(silent=True)
+    try:
+        if body is None and request.get_data():
+            raise ValueError("body is not valid JSON")
+        apps, max_pages, chunk_bytes = parse_backfill_request(body)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    key = "backfill:" + (",".join(str(a) for a, _ in sorted(apps)) or "top10")
+    try:
+        job, coalesced = job_manager.submit("backfill", backfill_games, apps, max_pages, chunk_bytes, key=key)
+    except Exception as e:
+        print(f"Error enqueuing backfill: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    message = "Backfill already in progress." if coalesced else "Backfill job accepted."
+    return jsonify({"status": "accepted", "message": message, "job_id": job.id, "coalesced": coalesced}), \
+        202, {"Location": f"/jobs/{job.id}"}
+
+@app.route('/backfill/<int:appid>', methods=['GET'])
+def backfill_status(appid):
+    cp = backfill.GcsCheckpoints(bucket).load(appid)
+    if cp is None:
+        return jsonify({"status": "error", "message": f"No backfill checkpoint for {appid}"}), 404
+    return jsonify(backfill.checkpoint_summary(cp)), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify([j.to_dict() for j in reversed(job_manager.list())]), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ingestion_service/ingestion_app.py (at the very bottom)
 
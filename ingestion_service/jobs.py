@@ -0,0 +1,152 @@
+# ingestion_service/jobs.py
+"""
+Background job subsystem for the ingestion service.
+
+POST / used to run the whole ingestion inside the HTTP request. Now the request
+only enqueues a Job on a small worker pool and returns its id; GET /jobs/<id>
+reports status, per-stage timings and per-game progress while it runs.
+
+Coalescing: submitting a job whose `key` matches one that is still queued or
+running returns the existing job instead of starting a second one. Per-game locks
+(`game_lock`) additionally guarantee that two different jobs (e.g. an ingest and a
+backfill) never fetch the same app at the same time.
+
+State lives in this process only: run the service with a single gunicorn worker and,
+on Cloud Run, as a single instance with CPU always allocated (`--no-cpu-throttling
+--max-instances 1`), so jobs keep running after the 202 response has been sent and
+every GET /jobs/<id> reaches the instance that owns the job.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metrics
+
+MAX_WORKERS = int(os.environ.get("INGEST_JOB_WORKERS", "2"))
+MAX_HISTORY = int(os.environ.get("INGEST_JOB_HISTORY", "50"))
+
+ACTIVE = ("queued", "running")
+
+class Job:
+    def __init__(self, kind: str, key: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key or kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = OrderedDict()   # stage -> seconds
+        self.games = OrderedDict()    # appid -> {name, status, rows, seconds, ...}
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """
+        Times a pipeline stage into the job report (and the metrics registry). `labels`
+        (e.g. app_id) tell repeated stages apart: they become metric labels, and suffix
+        the stage's key in the report.
+        """
+        start = time.perf_counter()
+        key = "_".join([name, *(str(v) for v in labels.values())])
+        try:
+            with metrics.span(name, job=self.kind, **labels) as sp:
+                yield sp
+        finally:
+            with self._lock:
+                self.stages[key] = round(time.perf_counter() - start, 3)
+
+    def game(self, appid, **fields):
+        """Creates or updates the progress entry for one game."""
+        with self._lock:
+            self.games.setdefault(str(appid), {}).update(fields)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else None,
+                "stages": dict(self.stages),
+                "games": {k: dict(v) for k, v in self.games.items()},
+                "rows": sum(g.get("rows", 0) for g in self.games.values()),
+                "result": self.result,
+                "error": self.error,
+            }
+
+class JobManager:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_history: int = MAX_HISTORY):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._game_locks = {}
+        self._max_history = max_history
+
+    def submit(self, kind: str, fn, *args, key: str = None, **kwargs):
+        """
+        Enqueues fn(job, *args, **kwargs). Returns (job, coalesced): if a job with the same
+        key is still queued or running, that job is returned with coalesced=True.
+        """
+        key = key or kind
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status in ACTIVE:
+                    metrics.inc("ingest_jobs_coalesced_total", kind=kind)
+                    return job, True
+            job = Job(kind, key)
+            self._jobs[job.id] = job
+            self._trim()
+        metrics.inc("ingest_jobs_submitted_total", kind=kind)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job, False
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with job._lock:
+            job.status, job.started_at = "running", time.time()
+        try:
+            with metrics.span("job", kind=job.kind):
+                result = fn(job, *args, **kwargs)
+            status = "succeeded" if result is not False else "failed"
+        except Exception as e:
+            print(f"ERROR: job {job.id} ({job.kind}) failed: {type(e).__name__} - {e}")
+            traceback.print_exc()
+            result, status = None, "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        with job._lock:
+            if not isinstance(result, bool):
+                job.result = result
+            job.status, job.finished_at = status, time.time()
+        metrics.inc("ingest_jobs_finished_total", kind=job.kind, status=status)
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j.status not in ACTIVE]
+        for jid in finished[:max(0, len(self._jobs) - self._max_history)]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    @contextmanager
+    def game_lock(self, appid):
+        """Serialises fetches of the same app across concurrently running jobs."""
+        with self._lock:
+            lock = self._game_locks.setdefault(str(appid), threading.Lock())
+        with lock:
+            yield
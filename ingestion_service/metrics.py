@@ -0,0 +1,140 @@
+# ingestion_service/metrics.py
+"""
+Minimal in-process metrics: counters, latency histograms and timing spans.
+
+Everything is kept in one process-local registry and exposed two ways:
+  * render()   -> Prometheus text exposition format (served at GET /metrics)
+  * span/event -> one JSON line per event on stdout (Cloud Logging parses these
+                  into structured jsonPayload entries)
+
+Set METRICS_ENABLED=0 to turn it all off; every call then returns immediately and
+span() hands back a shared no-op context manager, so instrumented hot paths pay
+only a function call.
+
+    with metrics.span("steam_page", app_id=appid):
+        resp = requests.get(...)
+
+Metric names are fixed strings; anything that varies (app ids, game names, tables)
+goes into labels, so the number of series stays bounded by the label values.
+    metrics.inc("gcs_uploaded_bytes_total", len(payload))
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+LOG_SPANS = os.environ.get("METRICS_LOG_SPANS", "1").lower() not in ("0", "false", "no")
+
+# seconds; covers sub-ms predictions up to multi-minute BigQuery load jobs
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1, **labels):
+    """Adds `value` to counter `name` (use a `_total` suffix)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, seconds: float, **labels):
+    """Records one observation into histogram `name` (use a `_seconds` suffix)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+def event(name: str, **fields):
+    """Emits one structured log line."""
+    if not ENABLED:
+        return
+    print(json.dumps({"event": name, "ts": round(time.time(), 3), **fields}, default=str), flush=True)
+
+class _Span:
+    __slots__ = ("name", "labels", "fields", "start")
+
+    def __init__(self, name: str, labels: dict):
+        self.name, self.labels, self.fields = name, labels, {}
+
+    def set(self, **fields):
+        """Attaches extra fields (row counts, bytes, ...) to the span's log line."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe(f"{self.name}_seconds", elapsed, **self.labels)
+        if exc_type is not None:
+            inc(f"{self.name}_errors_total", **self.labels)
+        if LOG_SPANS:
+            event("span", span=self.name, duration_ms=round(elapsed * 1e3, 3),
+                  error=exc_type.__name__ if exc_type else None, **self.labels, **self.fields)
+        return False
+
+class _NoopSpan:
+    def set(self, **fields):
+        pass
+
+_NOOP_SPAN = nullcontext(_NoopSpan())
+
+def span(name: str, **labels):
+    """Times the block into histogram `<name>_seconds` and logs it; no-op when disabled."""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+def _escape(value: str) -> str:
+    """Label value escaping of the text format: backslash, double quote and newline."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    """Prometheus text exposition (format 0.0.4) of every counter and histogram."""
+    lines, typed = [], set()
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value:.15g}")
+    for (name, labels), h in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(BUCKETS, h):
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', f'{bound:g}'),))} {count}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {h[-1]}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {h[-1]}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
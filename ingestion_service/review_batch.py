@@ -0,0 +1,151 @@
+# ingestion_service/review_batch.py
+"""
+Compact in-flight representation of fetched reviews.
+
+The fetcher used to keep every review as the full Steam dict (nested `author` dict,
+string values, injected app_id/game_name) until the whole run was uploaded — a few
+KB of Python objects per review. ReviewBatch converts each page to Arrow columns as
+soon as it arrives, projected to `raw_reviews_schema`:
+
+  * ints, bools and floats live in typed buffers (timestamps and author stats are int64)
+  * `author` is a struct column instead of one dict per review
+  * app_id and game_name are filled per page, and game_name is dictionary-encoded,
+    so a name is stored once per page rather than once per review
+  * keys outside the schema are dropped (the BigQuery load ignores them anyway)
+
+Pages are kept as a list of small tables, so adding one is O(page). The NDJSON
+landing payload is written from the columns directly: every column is rendered as
+JSON text with Arrow compute kernels (strings escaped, numbers and bools cast, nulls
+as `null`) and the row objects are joined element-wise, so no review goes back to
+dict form on the way out.
+
+    batch = ReviewBatch()
+    batch.add_page(page["reviews"], appid, game_name)
+    payload = batch.to_jsonl()
+    review_store.append(batch.table())
+"""
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from review_store import RAW_REVIEWS_ARROW_SCHEMA, reviews_to_table
+
+# raw schema with game_name interned (dictionary-encoded)
+IN_FLIGHT_SCHEMA = RAW_REVIEWS_ARROW_SCHEMA.set(
+    RAW_REVIEWS_ARROW_SCHEMA.get_field_index("game_name"),
+    pa.field("game_name", pa.dictionary(pa.int32(), pa.string())),
+)
+
+# --- NDJSON from Arrow columns ---
+_ESCAPES = [("\\", "\\\\"), ('"', '\\"'), ("\n", "\\n"), ("\r", "\\r"), ("\t", "\\t")]
+# the other control characters are rare in reviews; only scanned for when one is present
+_RARE_ESCAPES = [(chr(c), f"\\u{c:04x}") for c in range(32) if chr(c) not in "\n\r\t"]
+_CONTROL_RE = "[\\x00-\\x08\\x0b\\x0c\\x0e-\\x1f]"
+
+def _json_string(arr: pa.Array) -> pa.Array:
+    for old, new in _ESCAPES:
+        arr = pc.replace_substring(arr, old, new)
+    if pc.any(pc.match_substring_regex(arr, _CONTROL_RE)).as_py():
+        for old, new in _RARE_ESCAPES:
+            arr = pc.replace_substring(arr, old, new)
+    return pc.binary_join_element_wise('"', arr, '"', "")
+
+def _json_object(names: list, values: list) -> pa.Array:
+    """`{"name": value, ...}` per row from already JSON-rendered value columns."""
+    parts = []
+    for i, (name, value) in enumerate(zip(names, values)):
+        parts += [("{" if i == 0 else ",") + json.dumps(name) + ":", value]
+    return pc.binary_join_element_wise(*parts, "}", "")
+
+def json_values(arr: pa.Array) -> pa.Array:
+    """Every value of `arr` rendered as JSON text (nulls, NaN and infinities as null)."""
+    t = arr.type
+    if pa.types.is_dictionary(t):
+        return json_values(arr.cast(t.value_type))
+    if pa.types.is_struct(t):
+        out = _json_object([f.name for f in t], [json_values(child) for child in arr.flatten()])
+        return pc.if_else(arr.is_valid(), out, "null")
+    if pa.types.is_string(t):
+        out = _json_string(arr)
+    elif pa.types.is_boolean(t):
+        out = pc.if_else(arr, "true", "false")
+    elif pa.types.is_floating(t):
+        out = pc.if_else(pc.is_finite(arr), pc.cast(arr, pa.string()), None)
+    elif pa.types.is_integer(t):
+        out = pc.cast(arr, pa.string())
+    else:
+        raise TypeError(f"no JSON rendering for {t}")
+    return pc.fill_null(out, "null")
+
+def _string_bytes(arr: pa.Array) -> bytes:
+    """The concatenated values of a string array without nulls, straight from its data buffer."""
+    _, offsets, data = arr.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int32)[arr.offset:arr.offset + len(arr) + 1]
+    return bytes(memoryview(data)[offsets[0]:offsets[-1]]) if len(arr) else b""
+
+def batch_to_jsonl(batch: pa.RecordBatch) -> bytes:
+    """NDJSON lines (newline-terminated) of an Arrow record batch."""
+    rows = _json_object(batch.schema.names, [json_values(col) for col in batch.columns])
+    return _string_bytes(pc.binary_join_element_wise(rows, "\n", ""))
+
+class ReviewBatch:
+    __slots__ = ("_tables", "_rows")
+
+    def __init__(self):
+        self._tables = []
+        self._rows = 0
+
+    def add_page(self, reviews: list, app_id: int, game_name: str):
+        """Converts one page of raw review dicts; the dicts can be dropped afterwards."""
+        if reviews:
+            self._tables.append(reviews_to_table(reviews, IN_FLIGHT_SCHEMA, app_id=app_id, game_name=game_name))
+            self._rows += len(reviews)
+
+    def extend(self, other: "ReviewBatch"):
+        self._tables.extend(other._tables)
+        self._rows += other._rows
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the Arrow buffers."""
+        return sum(t.nbytes for t in self._tables)
+
+    def table(self) -> pa.Table:
+        """All reviews as one Arrow table in the raw schema (game_name as plain strings)."""
+        if not self._tables:
+            return RAW_REVIEWS_ARROW_SCHEMA.empty_table()
+        return pa.concat_tables(self._tables).cast(RAW_REVIEWS_ARROW_SCHEMA)
+
+    def iter_record_batches(self, chunk_rows: int = 10_000):
+        """Record batches of about `chunk_rows` reviews in the raw schema, pages merged together."""
+        group, rows = [], 0
+        for table in self._tables:
+            group.append(table)
+            rows += table.num_rows
+            if rows >= chunk_rows:
+                yield from pa.concat_tables(group).cast(RAW_REVIEWS_ARROW_SCHEMA).combine_chunks().to_batches()
+                group, rows = [], 0
+        if group:
+            yield from pa.concat_tables(group).cast(RAW_REVIEWS_ARROW_SCHEMA).combine_chunks().to_batches()
+
+    def iter_chunks(self, chunk_rows: int = 10_000):
+        """Reviews as lists of dicts, at most `chunk_rows` at a time."""
+        for table in self._tables:
+            for rb in table.to_batches(max_chunksize=chunk_rows):
+                yield rb.to_pylist()
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def to_jsonl(self, chunk_rows: int = 10_000) -> bytes:
+        """
+        NDJSON landing payload, the same records as review_codec.encode_jsonl of the dicts,
+        rendered from the columns `chunk_rows` reviews at a time.
+        """
+        return b"".join(batch_to_jsonl(rb) for rb in self.iter_record_batches(chunk_rows))[:-1]
@@ -0,0 +1,159 @@
+# ingestion_service/review_codec.py
+"""
+Fast JSON encode/decode for Steam review pages and NDJSON landing files.
+
+Steam pages are decoded straight from the response bytes and landing files are
+encoded straight to bytes with orjson (falls back to the standard library when
+orjson isn't installed), so a review is never round-tripped through an extra
+Python str. Output is compact NDJSON; BigQuery loads it exactly like the
+`json.dumps(..., ensure_ascii=False)` lines it replaces.
+
+ReviewValidator compiles `raw_reviews_schema` once into per-field checks. Each
+review is validated (and numeric strings such as Steam's `weighted_vote_score`
+are coerced to the schema type) a single time, right after decoding, instead of
+relying on the BigQuery load to reject a whole file later.
+
+    page = decode_page(resp.content)
+    reviews, rejected = validator.validate(page["reviews"])
+    blob.upload_from_string(encode_jsonl(reviews), content_type="application/jsonl")
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+if orjson:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep catching the latter
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def encode_jsonl(records: list) -> bytes:
+        """NDJSON bytes, one compact object per line (no trailing newline, like the old landing files)."""
+        return b"\n".join(map(orjson.dumps, records))
+else:
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def encode_jsonl(records: list) -> bytes:
+        return "\n".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) for r in records).encode("utf-8")
+
+def decode_page(content: bytes) -> dict:
+    """One Steam appreviews response body (bytes) -> dict."""
+    return loads(content)
+
+def iter_jsonl(path: str):
+    """Decoded records of an NDJSON file, read as bytes."""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+def read_jsonl(path: str) -> list:
+    return list(iter_jsonl(path))
+
+# --- Schema validation ---
+def _int(v):
+    if isinstance(v, bool):
+        raise TypeError("bool")
+    if isinstance(v, int):
+        return v
+    if isinstance(v, str):
+        return int(v)
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    raise TypeError(type(v).__name__)
+
+def _float(v):
+    if isinstance(v, bool):
+        raise TypeError("bool")
+    if isinstance(v, (int, float)):
+        return v
+    if isinstance(v, str):
+        return float(v)
+    raise TypeError(type(v).__name__)
+
+def _str(v):
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return str(v)
+    raise TypeError(type(v).__name__)
+
+def _bool(v):
+    if isinstance(v, bool):
+        return v
+    raise TypeError(type(v).__name__)
+
+# BigQuery type -> (exact Python types accepted as-is, coercion for anything else)
+_TYPES = {
+    "STRING": ((str,), _str),
+    "INT64": ((int,), _int), "INTEGER": ((int,), _int),
+    "FLOAT": ((float, int), _float), "FLOAT64": ((float, int), _float),
+    "BOOL": ((bool,), _bool), "BOOLEAN": ((bool,), _bool),
+}
+
+def _compile(schema) -> list:
+    """[(name, required, exact types, coerce, nested fields or None)] from BigQuery SchemaFields."""
+    compiled = []
+    for field in schema:
+        nested = _compile(field.fields) if field.field_type in ("RECORD", "STRUCT") else None
+        exact, coerce = _TYPES.get(field.field_type, ((), None))
+        compiled.append((field.name, field.mode == "REQUIRED", exact, coerce, nested))
+    return compiled
+
+def _check(record: dict, fields: list, path: str = ""):
+    for name, required, exact, coerce, nested in fields:
+        value = record.get(name)
+        if value is None:
+            if required:
+                return f"{path}{name}: missing"
+            continue
+        if type(value) in exact:   # common case: already the right type (bool is not an int here)
+            continue
+        if nested is not None:
+            if not isinstance(value, dict):
+                return f"{path}{name}: expected object"
+            error = _check(value, nested, f"{path}{name}.")
+            if error:
+                return error
+        elif coerce is not None:
+            try:
+                coerced = coerce(value)
+            except (TypeError, ValueError) as e:
+                return f"{path}{name}: {e}"
+            if coerced is not value:
+                record[name] = coerced
+    return None
+
+class ReviewValidator:
+    """Validates review dicts against a BigQuery schema compiled once; coerces in place."""
+
+    def __init__(self, schema, required: tuple = ("recommendationid",)):
+        self._fields = _compile(schema)
+        self._required = required
+
+    def check(self, review: dict):
+        """Error string for an invalid review, None if it conforms (after coercion)."""
+        for name in self._required:
+            if review.get(name) is None:
+                return f"{name}: missing"
+        return _check(review, self._fields)
+
+    def validate(self, reviews: list):
+        """(valid reviews, [(recommendationid, error), ...] for the rejected ones)."""
+        valid, rejected = [], []
+        for r in reviews:
+            error = self.check(r)
+            if error is None:
+                valid.append(r)
+            else:
+                rejected.append((r.get("recommendationid"), error))
+        return valid, rejected
@@ -0,0 +1,328 @@
+# ingestion_service/review_store.py
+"""
+Compressed, indexed local store for raw Steam reviews.
+
+The raw corpus otherwise only exists as flat JSONL (reviews_data/, the GCS landing
+zone), so every lookup by recommendationid, app or time range re-parses all of it.
+The store keeps the same records (columns of `raw_reviews_schema`) as
+zstd-compressed Parquet segments plus two small indexes:
+
+    <root>/manifest.json            one entry per segment: app_id, rows, min/max timestamp_created
+    <root>/rid_index.npz            sorted recommendationid -> (segment, row)
+    <root>/app=<appid>/seg-<n>.parquet   rows of one app, sorted by timestamp_created
+
+Reads touch only what they need: `scan(app_id=..., start=..., end=...)` prunes whole
+segments with the manifest and row groups with Parquet statistics, and reads only the
+requested columns; `get(rids)` / `contains(rids)` go through the id index without
+opening segments that don't hold a match.
+
+`append(reviews)` (called by the ingestion once a run is loaded into BigQuery) drops
+reviews already in the store, writes one new segment per app and then swaps in the
+updated manifest and index with os.replace, so readers never see a half-written state.
+Appends are serialised per process.
+`compact()` merges each app's small per-run segments into one.
+
+    store = ReviewStore("/var/lib/steam-reviews")
+    store.append(reviews)
+    recent = store.scan(app_id=1172470, start=1751000000, columns=["recommendationid", "review"])
+
+    python review_store.py import --root ./review_store reviews_data/*/*.jsonl
+    python review_store.py stats --root ./review_store
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from review_codec import iter_jsonl
+
+# Arrow mirror of ingestion_app.raw_reviews_schema (kept free of the BigQuery client)
+AUTHOR_TYPE = pa.struct([
+    ("steamid", pa.string()),
+    ("num_games_owned", pa.int64()),
+    ("num_reviews", pa.int64()),
+    ("playtime_forever", pa.int64()),
+    ("playtime_last_two_weeks", pa.int64()),
+    ("playtime_at_review", pa.int64()),
+    ("last_played", pa.int64()),
+])
+RAW_REVIEWS_ARROW_SCHEMA = pa.schema([
+    ("recommendationid", pa.string()),
+    ("author", AUTHOR_TYPE),
+    ("language", pa.string()),
+    ("review", pa.string()),
+    ("timestamp_created", pa.int64()),
+    ("timestamp_updated", pa.int64()),
+    ("voted_up", pa.bool_()),
+    ("votes_up", pa.int64()),
+    ("votes_funny", pa.int64()),
+    ("weighted_vote_score", pa.float64()),
+    ("comment_count", pa.int64()),
+    ("steam_purchase", pa.bool_()),
+    ("received_for_free", pa.bool_()),
+    ("written_during_early_access", pa.bool_()),
+    ("steam_deck_review", pa.bool_()),
+    ("app_id", pa.int64()),
+    ("game_name", pa.string()),
+])
+
+ROW_GROUP_SIZE = 16_384
+COMPRESSION = "zstd"
+
+def reviews_to_table(reviews: list, schema: pa.Schema = RAW_REVIEWS_ARROW_SCHEMA, **constants) -> pa.Table:
+    """
+    Review dicts -> Arrow table in `schema`; unknown keys are dropped like the BQ load does.
+    `constants` (e.g. app_id=..., game_name=...) fill whole columns without touching the dicts.
+    """
+    columns = []
+    for field in schema:
+        if field.name in constants:
+            columns.append(pa.array([constants[field.name]] * len(reviews), type=field.type))
+            continue
+        values = [r.get(field.name) for r in reviews]
+        try:
+            arr = pa.array(values, type=field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Steam sends some numbers as strings (weighted_vote_score, ids), mixed with real numbers
+            arr = pa.array([None if v is None else str(v) for v in values], pa.string()).cast(field.type)
+        columns.append(arr)
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def _rid_array(values) -> np.ndarray:
+    return np.asarray([int(v) for v in values], dtype=np.int64)
+
+class ReviewStore:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- metadata ---
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.root, "rid_index.npz")
+
+    def _load(self):
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+        else:
+            manifest = {"next_id": 0, "segments": []}
+        self.segments = {s["id"]: s for s in manifest["segments"]}
+        self._next_id = manifest["next_id"]
+        if os.path.exists(self._index_path):
+            with np.load(self._index_path) as idx:
+                self._rids, self._seg, self._row = idx["rids"], idx["seg"], idx["row"]
+        else:
+            self._rids = np.empty(0, np.int64)
+            self._seg = np.empty(0, np.int32)
+            self._row = np.empty(0, np.int32)
+
+    def _commit(self, segments: dict, rids, seg, row):
+        """Atomically replaces index and manifest (index first: it may only ever be ahead)."""
+        order = np.argsort(rids, kind="stable")
+        rids, seg, row = rids[order], seg[order], row[order]
+        tmp = self._index_path + ".tmp.npz"
+        np.savez(tmp, rids=rids, seg=seg, row=row)
+        os.replace(tmp, self._index_path)
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"next_id": self._next_id, "segments": sorted(segments.values(), key=lambda s: s["id"])}, f)
+        os.replace(tmp, self._manifest_path)
+        self.segments, self._rids, self._seg, self._row = segments, rids, seg, row
+
+    def _path(self, segment: dict) -> str:
+        return os.path.join(self.root, segment["file"])
+
+    def __len__(self):
+        return int(sum(s["rows"] for s in self.segments.values()))
+
+    # --- writes ---
+    def _write_segment(self, app_id: int, table: pa.Table) -> dict:
+        table = table.sort_by("timestamp_created")
+        seg_id, self._next_id = self._next_id, self._next_id + 1
+        rel = os.path.join(f"app={app_id}", f"seg-{seg_id:06d}.parquet")
+        os.makedirs(os.path.join(self.root, f"app={app_id}"), exist_ok=True)
+        pq.write_table(table, os.path.join(self.root, rel), compression=COMPRESSION,
+                       row_group_size=ROW_GROUP_SIZE)
+        ts = table.column("timestamp_created")
+        return {"id": seg_id, "file": rel, "app_id": app_id, "rows": table.num_rows,
+                "min_ts": pc.min(ts).as_py(), "max_ts": pc.max(ts).as_py()}
+
+    def append(self, reviews) -> int:
+        """Adds reviews not yet in the store (by recommendationid). Returns how many were new."""
+        table = reviews if isinstance(reviews, pa.Table) else reviews_to_table(list(reviews))
+        if table.schema != RAW_REVIEWS_ARROW_SCHEMA:
+            table = table.select(RAW_REVIEWS_ARROW_SCHEMA.names).cast(RAW_REVIEWS_ARROW_SCHEMA)
+        if table.num_rows == 0:
+            return 0
+        with self._lock:
+            rids = _rid_array(table.column("recommendationid").to_pylist())
+            # first occurrence within the batch, and not already stored
+            _, first = np.unique(rids, return_index=True)
+            keep = np.zeros(len(rids), dtype=bool)
+            keep[first] = True
+            keep &= ~self._contains(rids)
+            if not keep.any():
+                return 0
+            table = table.filter(pa.array(keep))
+            segments = dict(self.segments)
+            new_rids, new_seg, new_row = [self._rids], [self._seg], [self._row]
+            app_ids = table.column("app_id")
+            for app_id in pc.unique(app_ids).to_pylist():
+                part = table.filter(pc.equal(app_ids, app_id))
+                seg = self._write_segment(app_id, part)
+                segments[seg["id"]] = seg
+                written = pq.read_table(self._path(seg), columns=["recommendationid"]).column(0)
+                new_rids.append(_rid_array(written.to_pylist()))
+                new_seg.append(np.full(seg["rows"], seg["id"], dtype=np.int32))
+                new_row.append(np.arange(seg["rows"], dtype=np.int32))
+            self._commit(segments, np.concatenate(new_rids), np.concatenate(new_seg), np.concatenate(new_row))
+            return int(keep.sum())
+
+    def compact(self, app_id: int = None) -> int:
+        """Merges every app's segments (or just `app_id`'s) into one. Returns segments removed."""
+        with self._lock:
+            by_app = {}
+            for s in self.segments.values():
+                if app_id is None or s["app_id"] == app_id:
+                    by_app.setdefault(s["app_id"], []).append(s)
+            segments, removed = dict(self.segments), []
+            for app, segs in by_app.items():
+                if len(segs) < 2:
+                    continue
+                merged = pa.concat_tables([pq.read_table(self._path(s), schema=RAW_REVIEWS_ARROW_SCHEMA) for s in segs])
+                seg = self._write_segment(app, merged)
+                for s in segs:
+                    del segments[s["id"]]
+                segments[seg["id"]] = seg
+                removed.extend(segs)
+            if not removed:
+                return 0
+            rids, seg_ids, rows = [], [], []
+            for s in segments.values():
+                col = pq.read_table(self._path(s), columns=["recommendationid"]).column(0)
+                rids.append(_rid_array(col.to_pylist()))
+                seg_ids.append(np.full(s["rows"], s["id"], dtype=np.int32))
+                rows.append(np.arange(s["rows"], dtype=np.int32))
+            self._commit(segments, np.concatenate(rids), np.concatenate(seg_ids), np.concatenate(rows))
+            for s in removed:
+                os.remove(self._path(s))
+            return len(removed) - len({s["app_id"] for s in removed})
+
+    # --- reads ---
+    def _lookup(self, rids: np.ndarray):
+        """(positions in the index, found mask) for `rids`."""
+        pos = np.searchsorted(self._rids, rids)
+        found = pos < len(self._rids)
+        found[found] = self._rids[pos[found]] == rids[found]
+        return pos, found
+
+    def _contains(self, rids: np.ndarray) -> np.ndarray:
+        return self._lookup(rids)[1]
+
+    def contains(self, rids) -> np.ndarray:
+        """Boolean mask: which of `rids` are already stored (dedup checks; no segment is opened)."""
+        return self._contains(_rid_array(rids))
+
+    def missing(self, rids) -> list:
+        """The subset of `rids` not yet in the store, in input order."""
+        rids = list(rids)
+        mask = self.contains(rids)
+        return [r for r, m in zip(rids, mask) if not m]
+
+    def get(self, rids, columns: list = None) -> pa.Table:
+        """Rows for `rids` in storage order (unknown ids are skipped), reading only the segments that hold them."""
+        pos, found = self._lookup(_rid_array(rids))
+        seg, row = self._seg[pos[found]], self._row[pos[found]]
+        parts = []
+        for seg_id in np.unique(seg):
+            rows = row[seg == seg_id]
+            table = pq.read_table(self._path(self.segments[int(seg_id)]), columns=columns)
+            parts.append(table.take(pa.array(np.sort(rows))))
+        if not parts:
+            return RAW_REVIEWS_ARROW_SCHEMA.empty_table() if columns is None else \
+                pa.schema([RAW_REVIEWS_ARROW_SCHEMA.field(c) for c in columns]).empty_table()
+        return pa.concat_tables(parts)
+
+    def _select(self, app_id, start, end) -> list:
+        apps = None if app_id is None else {app_id} if isinstance(app_id, int) else set(app_id)
+        return [self._path(s) for s in sorted(self.segments.values(), key=lambda s: s["id"])
+                if (apps is None or s["app_id"] in apps)
+                and (start is None or s["max_ts"] >= start)
+                and (end is None or s["min_ts"] < end)]
+
+    def dataset(self, app_id=None, start: int = None, end: int = None):
+        """(pyarrow Dataset over the matching segments, row filter) for `app_id` and [start, end)."""
+        flt = None
+        if start is not None:
+            flt = ds.field("timestamp_created") >= start
+        if end is not None:
+            cond = ds.field("timestamp_created") < end
+            flt = cond if flt is None else flt & cond
+        return ds.dataset(self._select(app_id, start, end), schema=RAW_REVIEWS_ARROW_SCHEMA,
+                          format="parquet"), flt
+
+    def scan(self, app_id=None, start: int = None, end: int = None, columns: list = None) -> pa.Table:
+        """Reviews of `app_id` (an id or list of ids; None = all) created in [start, end)."""
+        dataset, flt = self.dataset(app_id, start, end)
+        return dataset.to_table(columns=columns, filter=flt)
+
+    def iter_batches(self, app_id=None, start: int = None, end: int = None, columns: list = None,
+                     batch_size: int = 64_000):
+        """Streaming version of scan() for scoring / export jobs."""
+        dataset, flt = self.dataset(app_id, start, end)
+        yield from dataset.to_batches(columns=columns, filter=flt, batch_size=batch_size)
+
+    def stats(self) -> dict:
+        apps = {}
+        for s in self.segments.values():
+            a = apps.setdefault(s["app_id"], {"rows": 0, "segments": 0, "min_ts": s["min_ts"], "max_ts": s["max_ts"]})
+            a["rows"] += s["rows"]
+            a["segments"] += 1
+            a["min_ts"], a["max_ts"] = min(a["min_ts"], s["min_ts"]), max(a["max_ts"], s["max_ts"])
+        size = sum(os.path.getsize(self._path(s)) for s in self.segments.values())
+        return {"rows": len(self), "segments": len(self.segments), "bytes": size, "apps": apps}
+
+def import_jsonl(store: ReviewStore, paths: list, batch_size: int = 100_000) -> int:
+    """Loads review JSONL files (reviews_data/, landing-zone NDJSON) into the store."""
+    added, batch = 0, []
+    for path in paths:
+        for record in iter_jsonl(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                added += store.append(batch)
+                batch = []
+    if batch:
+        added += store.append(batch)
+    return added
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="Append review JSONL files to the store")
+    imp.add_argument("paths", nargs="+")
+    sub.add_parser("stats", help="Print per-app row counts and on-disk size")
+    sub.add_parser("compact", help="Merge each app's segments into one")
+    for sp in sub.choices.values():
+        sp.add_argument("--root", default=os.environ.get("REVIEW_STORE_DIR", "review_store"))
+    args = p.parse_args()
+
+    store = ReviewStore(args.root)
+    if args.cmd == "import":
+        added = import_jsonl(store, args.paths)
+        print(f"✅ Imported {added:,} new reviews into {args.root} ({len(store):,} total)")
+    elif args.cmd == "compact":
+        print(f"✅ Removed {store.compact()} segment(s)")
+    print(json.dumps(store.stats(), indent=2))
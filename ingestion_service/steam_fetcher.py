@@ -0,0 +1,197 @@
+# ingestion_service/steam_fetcher.py
+# SteamSpy and Steam API logic (from the top-10 notebook), kept free of GCS/BigQuery
+# side effects so it can be imported by benchmarks and backfill tooling.
+
+import os
+import json
+import time
+import requests
+
+import metrics
+from review_batch import ReviewBatch
+from review_codec import decode_page, encode_jsonl
+
+STEAMSPY_URL = os.environ.get("STEAMSPY_URL", "https://steamspy.com/api.php")
+# Overridable so benchmarks can replay recorded pages from a local server
+STEAM_REVIEWS_URL = os.environ.get("STEAM_REVIEWS_URL", "https://store.steampowered.com/appreviews")
+
+def owners_upper(o_str: str) -> int:
+    try:
+        return int(o_str.split("..")[-1].replace(",", ""))
+    except:
+        return 0
+
+def get_top_10_steam_games():
+    print("Fetching top 10 Steam games from SteamSpy...")
+    url = STEAMSPY_URL
+    resp = requests.get(url, params={"request":"top100forever"}, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+
+    games = list(data.values())
+    games_sorted = sorted(
+        games,
+        key=lambda g: owners_upper(g.get("owners", "")),
+        reverse=True
+    )
+    top10 = games_sorted[:10]
+    
+    top10_games_list = []
+    print("Top 10 Steam Games by all-time owners:")
+    for g in top10:
+        aid = g["appid"]
+        name = g.get("name", "<unknown>")
+        owners = g.get("owners", "<n/a>")
+        print(f" • {aid}: {name} (owners ≈ {owners})")
+        top10_games_list.append((aid, name))
+    
+    return top10_games_list
+
+def fetch_raw_recent_reviews(
+    appid: int,
+    game_name: str,
+    per_page: int = 100,
+    max_pages: int = 5,
+    pause: float = 0.2,
+    store=None,
+    validator=None,
+) -> ReviewBatch:
+    """
+    Fetches recent reviews for a given appid and returns them as a compact ReviewBatch
+    (review_batch.py): each page is converted to typed columns as soon as it arrives.
+    Pages are decoded from the response bytes; with a ReviewValidator (review_codec.py),
+    reviews that don't match the raw schema are dropped and counted.
+    With a ReviewStore (review_store.py), stored reviews are left out of the batch (they are
+    already in raw_reviews) and paging stops at the first page whose reviews are all
+    stored (older pages are too). The fetcher never appends to the store: the
+    caller does that once the batch is loaded into BigQuery, so the store only ever holds
+    reviews that reached raw_reviews and a failed upload or load is re-fetched next run.
+    """
+    print(f"Fetching raw recent reviews for {game_name} (AppID: {appid})...")
+    
+    all_raw_reviews = ReviewBatch()
+    base_url = f"{STEAM_REVIEWS_URL}/{appid}"
+    params = {
+        "json": "1",
+        "language": "english",
+        "filter": "recent",
+        "num_per_page": str(per_page),
+    }
+    cursor = None
+    page = 0
+
+    while page < max_pages:
+        page += 1
+        if cursor:
+            params["cursor"] = cursor
+
+        try:
+            with metrics.span("steam_page", app_id=appid):
+                resp = requests.get(base_url, params=params, headers={"User-Agent":"Mozilla/5.0"}, timeout=60)
+                resp.raise_for_status() # This raises HTTPError for 4xx/5xx responses (e.g., 429 Too Many Requests)
+                data = decode_page(resp.content)
+            reviews = data.get("reviews", [])
+            metrics.inc("steam_pages_fetched_total", app_id=appid)
+            metrics.inc("steam_reviews_fetched_total", len(reviews), app_id=appid)
+            if validator is not None and reviews:
+                reviews, rejected = validator.validate(reviews)
+                if rejected:
+                    metrics.inc("steam_reviews_rejected_total", len(rejected), app_id=appid)
+                    print(f"→ {game_name}: dropped {len(rejected)} reviews failing the raw schema, e.g. {rejected[0]}")
+            if not reviews:
+                print(f"→ {game_name}: no reviews on page {page}, stopping.")
+                break
+
+            print(f"→ {game_name}: page {page}/{max_pages}, got {len(reviews)} reviews.")
+
+            if store is not None:
+                known = store.contains([r["recommendationid"] for r in reviews])
+                if known.all():
+                    print(f"→ {game_name}: page {page} already in the review store; caught up.")
+                    break
+                if known.any():
+                    reviews = [r for r, k in zip(reviews, known) if not k]
+
+            all_raw_reviews.add_page(reviews, appid, game_name)
+
+            cursor = data.get("cursor", "")
+            if not cursor:
+                print(f"→ {game_name}: no next cursor; done.")
+                break
+
+        except requests.exceptions.Timeout as e:
+            print(f"ERROR: Request Timeout for {game_name} (AppID: {appid}): {e}")
+            break # Stop fetching for this game on timeout
+        except requests.exceptions.ConnectionError as e:
+            print(f"ERROR: Connection Error for {game_name} (AppID: {appid}): {e}")
+            break # Stop fetching for this game on connection error
+        except requests.exceptions.HTTPError as e: # This handles 4xx/5xx status codes
+            print(f"ERROR: HTTP Error for {game_name} (AppID: {appid}): {e.response.status_code} - {e.response.text}")
+            break # Stop fetching for this game on HTTP error (e.g., 429 Too Many Requests)
+        except requests.exceptions.RequestException as e: # Catch any other requests-related error
+            print(f"ERROR: General Request Error for {game_name} (AppID: {appid}): {e}")
+            break # Stop fetching for this game on general request error
+        except json.JSONDecodeError as e:
+            print(f"ERROR: JSON Decode Error for {game_name} (AppID: {appid}): {e}")
+            break # Stop fetching for this game on JSON decode error
+        except Exception as e: # Catch any other unexpected errors
+            print(f"ERROR: Unexpected error in fetching reviews for {game_name} (AppID: {appid}): {type(e).__name__} - {e}")
+            break # Stop fetching for this game on any other error
+        
+        metrics.inc("steam_pause_seconds_total", pause)
+        time.sleep(pause)
+
+    print(f"✅ Done: fetched {len(all_raw_reviews):,} raw reviews for {game_name}")
+    return all_raw_reviews
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+def fetch_reviews_page(
+    appid: int,
+    cursor: str = "*",
+    review_filter: str = "all",
+    per_page: int = 100,
+    language: str = "english",
+    retries: int = 6,
+    backoff: float = 2.0,
+    timeout: float = 60,
+) -> dict:
+    """
+    One appreviews page as a dict. Throttling (429) and 5xx responses, timeouts and
+    connection errors are retried with exponential backoff; anything else raises.
+    """
+    params = {
+        "json": "1",
+        "language": language,
+        "filter": review_filter,
+        "num_per_page": str(per_page),
+        "purchase_type": "all",
+        "cursor": cursor or "*",
+    }
+    for attempt in range(retries + 1):
+        try:
+            with metrics.span("steam_page", app_id=appid):
+                resp = requests.get(f"{STEAM_REVIEWS_URL}/{appid}", params=params,
+                                    headers={"User-Agent": "Mozilla/5.0"}, timeout=timeout)
+                if resp.status_code in RETRY_STATUS and attempt < retries:
+                    raise requests.exceptions.HTTPError(f"{resp.status_code} from Steam", response=resp)
+                resp.raise_for_status()
+                data = decode_page(resp.content)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if attempt == retries or (status is not None and status not in RETRY_STATUS):
+                raise
+            wait = backoff * 2 ** attempt
+            metrics.inc("steam_page_retries_total", app_id=appid)
+            print(f"WARN: {type(e).__name__} for AppID {appid} ({e}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+            continue
+        metrics.inc("steam_pages_fetched_total", app_id=appid)
+        metrics.inc("steam_reviews_fetched_total", len(data.get("reviews", [])), app_id=appid)
+        return data
+
+def reviews_to_jsonl(reviews) -> bytes:
+    """Newline-delimited JSON bytes (from a ReviewBatch or review dicts) for the GCS landing zone / BigQuery NDJSON loads."""
+    if isinstance(reviews, ReviewBatch):
+        return reviews.to_jsonl()
+    return encode_jsonl(reviews)
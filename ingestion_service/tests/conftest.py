@@ -0,0 +1,30 @@
+# ingestion_service/tests/conftest.py
+"""
+Shared fixtures for the ingestion tests. The service's modules are flat files that
+import each other by name (as in the Docker image); spans are not logged.
+"""
+import os
+import pathlib
+import sys
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "ingestion_service"))
+os.environ.setdefault("METRICS_LOG_SPANS", "0")
+
+import metrics
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.fixture
+def sample_reviews() -> list:
+    """The checked-in Apex Legends reviews as raw Steam review dicts (a fresh copy per test)."""
+    import glob
+    import json
+    paths = sorted(glob.glob(str(ROOT / "reviews_data" / "*" / "*.jsonl")))
+    return [json.loads(line) for path in paths for line in open(path, encoding="utf-8") if line.strip()]
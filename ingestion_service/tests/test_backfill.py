@@ -0,0 +1,204 @@
+# ingestion_service/tests/test_backfill.py
+"""A backfill loads every review exactly once, however often it is paused, restarted or retried."""
+import json
+import pathlib
+
+import pytest
+from google.api_core.exceptions import BadRequest
+
+import backfill
+import metrics
+from backfill import GcsBigQuerySink, LocalCheckpoints, LocalSink, backfill_app
+from review_codec import ReviewValidator
+from review_store import ReviewStore
+from test_review_codec import SCHEMA
+
+PER_PAGE = 50
+
+class FakeSteam:
+    """fetch_reviews_page over a fixed review list; like Steam, the last page hands back its own cursor."""
+
+    def __init__(self, reviews: list):
+        self.pages = [reviews[i:i + PER_PAGE] for i in range(0, len(reviews), PER_PAGE)]
+        self.calls = []
+
+    def __call__(self, appid, cursor="*", review_filter="all", per_page=100):
+        page = 0 if cursor == "*" else int(cursor)
+        self.calls.append(page)
+        nxt = page + 1 if page + 1 < len(self.pages) else page
+        return {"success": 1, "reviews": [dict(r) for r in self.pages[page]], "cursor": str(nxt)}
+
+@pytest.fixture
+def steam(sample_reviews, monkeypatch):
+    fake = FakeSteam(sample_reviews[:470])
+    monkeypatch.setattr(backfill, "fetch_reviews_page", fake)
+    return fake
+
+class Crawl:
+    """backfill_app for one app with local checkpoints and chunks under `tmp`."""
+
+    def __init__(self, tmp: pathlib.Path):
+        self.tmp = tmp
+        self.checkpoints, self.sink = LocalCheckpoints(tmp / "checkpoints"), LocalSink(tmp / "chunks")
+        self.chunk_dir, self.spool_dir = tmp / "chunks", tmp / "backfill-spool"
+
+    def __call__(self, checkpoints=None, **kwargs):
+        kwargs = {"spool_dir": str(self.tmp), "chunk_bytes": 40_000, "pause": 0, "per_page": PER_PAGE, **kwargs}
+        return backfill_app(1172470, "Apex Legends", checkpoints or self.checkpoints, self.sink, **kwargs)
+
+@pytest.fixture
+def run(tmp_path):
+    return Crawl(tmp_path)
+
+def loaded_ids(chunk_dir: pathlib.Path) -> list:
+    return [json.loads(line)["recommendationid"] for path in sorted(chunk_dir.rglob("*.jsonl"))
+            for line in path.read_text().splitlines()]
+
+def expected_ids(steam) -> list:
+    return [r["recommendationid"] for page in steam.pages for r in page]
+
+def test_full_crawl_rolls_chunks(run, steam):
+    cp = run()
+    assert cp["status"] == "done" and cp["reviews"] == 470 and cp["pages"] == len(steam.pages)
+    assert len(cp["chunks"]) > 1 and sum(c["rows"] for c in cp["chunks"]) == 470
+    assert loaded_ids(run.chunk_dir) == expected_ids(steam)
+    assert all(json.loads(line)["app_id"] == 1172470 for line in next(run.chunk_dir.rglob("*.jsonl")).open())
+    assert not list(run.spool_dir.iterdir())
+    # a finished backfill is not crawled again
+    assert run()["reviews"] == 470 and steam.calls.count(0) == 1
+
+def test_paused_crawl_resumes_where_it_stopped(run, steam):
+    assert run(max_pages=3)["status"] == "running"
+    assert run(max_pages=4)["status"] == "running"
+    cp = run()
+    assert cp["status"] == "done" and cp["reviews"] == 470
+    assert steam.calls == list(range(len(steam.pages)))
+    assert loaded_ids(run.chunk_dir) == expected_ids(steam)
+
+def test_lost_spool_is_recrawled_from_the_chunk_start(run, steam):
+    run(max_pages=3, chunk_bytes=10**9)
+    for spool in run.spool_dir.iterdir():
+        spool.unlink()          # e.g. the crawl resumed on a new instance
+    cp = run(chunk_bytes=10**9)
+    assert cp["reviews"] == 470 and len(cp["chunks"]) == 1
+    assert steam.calls[:4] == [0, 1, 2, 0]
+    assert loaded_ids(run.chunk_dir) == expected_ids(steam)
+
+def test_a_fully_rejected_page_is_not_the_end(run, steam):
+    for review in steam.pages[1]:
+        del review["recommendationid"]
+    cp = run(validator=ReviewValidator(SCHEMA))
+    assert cp["status"] == "done" and cp["reviews"] == 470 - PER_PAGE
+    assert steam.calls == list(range(len(steam.pages)))
+    assert f'steam_reviews_rejected_total{{app_id="1172470"}} {PER_PAGE}' in metrics.render()
+
+def test_store_holds_the_reviews_of_loaded_chunks(run, steam, tmp_path):
+    store = ReviewStore(str(tmp_path / "store"))
+    cp = run(store=store)
+    assert len(store) == 470 and all(c["stored"] for c in cp["chunks"])
+    assert store.contains(expected_ids(steam)).all()
+    assert not list(run.spool_dir.iterdir())
+
+class CrashingCheckpoints(LocalCheckpoints):
+    """Dies on the n-th save, after the page was already written to the spool."""
+
+    def __init__(self, directory, crash_at: int):
+        super().__init__(directory)
+        self.saves, self.crash_at = 0, crash_at
+
+    def save(self, cp):
+        self.saves += 1
+        if self.saves == self.crash_at:
+            raise SystemExit("instance stopped")
+        super().save(cp)
+
+def test_pages_spooled_after_the_last_checkpoint_are_not_duplicated(run, steam, tmp_path):
+    with pytest.raises(SystemExit):
+        run(checkpoints=CrashingCheckpoints(tmp_path / "checkpoints", crash_at=3), chunk_bytes=10**9)
+    cp = run(chunk_bytes=10**9)
+    assert cp["reviews"] == 470
+    assert loaded_ids(run.chunk_dir) == expected_ids(steam)
+
+# --- GcsBigQuerySink ---
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+
+    def upload_from_filename(self, filename, content_type=None):
+        pass
+
+class FakeBucket:
+    name = "bucket"
+
+    def blob(self, name):
+        return FakeBlob(name)
+
+class FakeLoadJob:
+    output_rows = 100
+
+    def __init__(self, job_id, failed: bool):
+        self.job_id = job_id
+        self.error_result = {"reason": "invalid", "message": "bad row"} if failed else None
+
+    def done(self):
+        return True
+
+    def result(self):
+        if self.error_result:
+            raise BadRequest(self.error_result["message"])
+        return self
+
+class FakeBigQuery:
+    """Load jobs fail `failures` times per chunk; jobs are only found in the dataset's location."""
+
+    def __init__(self, failures: int):
+        self.failures, self.jobs, self.submitted = failures, {}, []
+
+    def get_dataset(self, dataset_id):
+        return type("Dataset", (), {"location": "europe-west1"})()
+
+    def load_table_from_uri(self, uri, table, job_id, job_config, location):
+        assert location == "europe-west1"
+        self.submitted.append(job_id)
+        self.jobs[job_id] = FakeLoadJob(job_id, failed=len(self.submitted) <= self.failures)
+
+    def get_job(self, job_id, location=None):
+        assert location == "europe-west1", "load jobs outside the default location need it"
+        return self.jobs[job_id]
+
+def sink_chunks(bq, spool: pathlib.Path):
+    sink = GcsBigQuerySink(FakeBucket(), bq, "project.steam_reviews.raw_reviews", schema=[])
+    spool.write_bytes(b'{"recommendationid": "1"}\n')
+    chunk = {"seq": 0, "rows": 1, **sink.write({"appid": 570, "run_id": "r1"}, 0, spool, 1)}
+    return sink, [chunk]
+
+def test_failed_load_is_resubmitted_in_the_dataset_location(tmp_path):
+    bq = FakeBigQuery(failures=1)
+    sink, chunks = sink_chunks(bq, tmp_path / "spool.jsonl")
+    assert chunks[0]["location"] == "europe-west1"
+    sink.check(chunks)
+    assert chunks[0]["load_job"] == "backfill_570_r1_00000_retry1" and not chunks[0].get("loaded")
+    sink.wait(chunks)
+    assert chunks[0]["loaded"] and bq.submitted == ["backfill_570_r1_00000", "backfill_570_r1_00000_retry1"]
+
+def test_load_gives_up_after_max_attempts(tmp_path):
+    bq = FakeBigQuery(failures=backfill.MAX_LOAD_ATTEMPTS)
+    sink, chunks = sink_chunks(bq, tmp_path / "spool.jsonl")
+    with pytest.raises(RuntimeError, match=f"failed {backfill.MAX_LOAD_ATTEMPTS} times"):
+        sink.wait(chunks)
+    assert len(bq.submitted) == backfill.MAX_LOAD_ATTEMPTS
+
+def test_reviews_reach_the_store_only_once_loaded(sample_reviews, tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "fetch_reviews_page", FakeSteam(sample_reviews[:120]))
+    store = ReviewStore(str(tmp_path / "store"))
+
+    def crawl(failures: int):
+        sink = GcsBigQuerySink(FakeBucket(), FakeBigQuery(failures), "project.steam_reviews.raw_reviews", schema=[])
+        return backfill_app(570, "Dota 2", LocalCheckpoints(tmp_path / "checkpoints"), sink, spool_dir=str(tmp_path),
+                            pause=0, per_page=PER_PAGE, store=store, restart=True)
+
+    with pytest.raises(RuntimeError, match="failed"):
+        crawl(failures=backfill.MAX_LOAD_ATTEMPTS)
+    assert len(store) == 0    # not in raw_reviews, so the recent-reviews fetch must still see them
+    cp = crawl(failures=1)
+    assert len(store) == 120 and cp["chunks"][0]["stored"]
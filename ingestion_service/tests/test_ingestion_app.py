@@ -0,0 +1,75 @@
+# ingestion_service/tests/test_ingestion_app.py
+"""The HTTP routes reject bad input with a JSON 400 and enqueue jobs with parsed arguments."""
+import sys
+import types
+
+import pytest
+
+class _Response:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """ingestion_app imported against stand-in GCP clients (and the startup network check stubbed)."""
+    import requests
+    from google.cloud import bigquery, storage
+    monkeypatch.setenv("GCS_BUCKET_NAME", "bucket")
+    monkeypatch.setenv("BQ_PROJECT_ID", "project")
+    monkeypatch.delenv("REVIEW_STORE_DIR", raising=False)
+    monkeypatch.setattr(storage, "Client", lambda *a, **k: types.SimpleNamespace(bucket=lambda name: None))
+    monkeypatch.setattr(bigquery, "Client", lambda *a, **k: object())
+    monkeypatch.setattr(requests, "get", lambda *a, **k: _Response())
+    monkeypatch.delitem(sys.modules, "ingestion_app", raising=False)
+    import ingestion_app
+    return ingestion_app
+
+@pytest.fixture
+def submitted(app_module, monkeypatch):
+    calls = []
+
+    def submit(kind, fn, *args, key=None):
+        calls.append((kind, args, key))
+        return types.SimpleNamespace(id="job-1"), False
+    monkeypatch.setattr(app_module.job_manager, "submit", submit)
+    return calls
+
+def test_backfill_accepts_apps_and_options(app_module, submitted):
+    resp = app_module.app.test_client().post("/backfill", json={"apps": [[570, "Dota 2"], ["730", " CS2 "]],
+                                                                 "max_pages": 5, "chunk_mb": 0.5})
+    assert resp.status_code == 202 and resp.get_json()["job_id"] == "job-1"
+    assert submitted == [("backfill", ([(570, "Dota 2"), (730, "CS2")], 5, 2**19), "backfill:570,730")]
+
+def test_backfill_without_a_body_crawls_the_top10(app_module, submitted):
+    assert app_module.app.test_client().post("/backfill").status_code == 202
+    assert submitted[0][2] == "backfill:top10"
+
+@pytest.mark.parametrize("body, error", [
+    ({"apps": [["abc", "Dota 2"]]}, "app id must be a positive integer"),
+    ({"apps": [[0, "Dota 2"]]}, "app id must be a positive integer"),
+    ({"apps": [[True, "Dota 2"]]}, "app id must be a positive integer"),
+    ({"apps": [[570]]}, "pairs"),
+    ({"apps": [[570, ""]]}, "needs a game name"),
+    ({"apps": "570"}, "must be a list"),
+    ({"max_pages": "10"}, "max_pages"),
+    ({"chunk_mb": -1}, "chunk_mb"),
+    ([570], "JSON object"),
+])
+def test_backfill_rejects_bad_bodies(app_module, submitted, body, error):
+    resp = app_module.app.test_client().post("/backfill", json=body)
+    assert resp.status_code == 400
+    assert resp.get_json()["status"] == "error" and error in resp.get_json()["message"]
+    assert submitted == []
+
+def test_backfill_rejects_malformed_json(app_module, submitted):
+    resp = app_module.app.test_client().post("/backfill", data="{apps:", content_type="application/json")
+    assert resp.status_code == 400 and "not valid JSON" in resp.get_json()["message"]
+
+def test_backfill_enqueue_failure_is_a_json_error(app_module, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("queue full")
+    monkeypatch.setattr(app_module.job_manager, "submit", fail)
+    resp = app_module.app.test_client().post("/backfill", json={})
+    assert resp.status_code == 500 and resp.get_json() == {"status": "error", "message": "queue full"}
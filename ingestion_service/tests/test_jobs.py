@@ -0,0 +1,96 @@
+# ingestion_service/tests/test_jobs.py
+"""Jobs are coalesced by key, run in the background, and never fetch the same game concurrently."""
+import threading
+import time
+
+import pytest
+
+import metrics
+from jobs import JobManager
+
+def wait(job, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running"):
+        assert time.monotonic() < deadline, f"job {job.id} still {job.status}"
+        time.sleep(0.005)
+    return job
+
+@pytest.fixture
+def manager():
+    return JobManager(max_workers=4, max_history=3)
+
+def test_same_key_is_coalesced_while_active(manager):
+    release = threading.Event()
+    first, coalesced = manager.submit("ingest", lambda job: release.wait(5))
+    assert not coalesced
+    again, coalesced = manager.submit("ingest", lambda job: pytest.fail("coalesced job must not run"))
+    assert coalesced and again is first
+    other, coalesced = manager.submit("backfill", lambda job: True, key="backfill:570")
+    assert not coalesced and other is not first
+
+    release.set()
+    assert wait(first).status == "succeeded"
+    assert 'ingest_jobs_coalesced_total{kind="ingest"} 1' in metrics.render()
+    # once the first one finished, the same key starts a new job
+    after, coalesced = manager.submit("ingest", lambda job: True)
+    assert not coalesced and after is not first
+    wait(after)
+
+def test_game_lock_serialises_the_same_app_only(manager):
+    active, peak, guard = {}, {}, threading.Lock()
+
+    def fetch(job, appid):
+        with manager.game_lock(appid):
+            with guard:
+                active[appid] = active.get(appid, 0) + 1
+                peak[appid] = max(peak.get(appid, 0), active[appid])
+                peak["all"] = max(peak.get("all", 0), sum(active.values()))
+            time.sleep(0.05)
+            with guard:
+                active[appid] -= 1
+        return True
+
+    jobs = [manager.submit("ingest", fetch, appid, key=f"job{i}")[0] for i, appid in enumerate((570, 570, 730))]
+    for job in jobs:
+        assert wait(job).status == "succeeded"
+    assert peak[570] == 1 and peak[730] == 1
+    assert peak["all"] == 2
+
+def test_failures_and_reports(manager):
+    def ingest(job):
+        with job.stage("fetch"):
+            job.game(570, name="Dota 2", rows=10)
+            job.game(730, name="CS2", rows=5)
+        job.game(570, status="done")
+        return True
+
+    ok = wait(manager.submit("ingest", ingest)[0]).to_dict()
+    assert ok["status"] == "succeeded" and ok["rows"] == 15
+    assert set(ok["stages"]) == {"fetch"} and ok["games"]["570"] == {"name": "Dota 2", "rows": 10, "status": "done"}
+
+    assert wait(manager.submit("a", lambda job: False)[0]).status == "failed"
+    boom = wait(manager.submit("b", lambda job: 1 / 0)[0])
+    assert boom.status == "failed" and boom.error.startswith("ZeroDivisionError")
+
+def test_stage_labels_stay_out_of_the_metric_name(manager):
+    def backfill(job):
+        for appid in (570, 730):
+            with job.stage("backfill", app_id=appid):
+                pass
+        return True
+
+    report = wait(manager.submit("backfill", backfill)[0]).to_dict()
+    assert set(report["stages"]) == {"backfill_570", "backfill_730"}
+    text = metrics.render()
+    assert 'backfill_seconds_count{app_id="570",job="backfill"} 1' in text
+    assert "backfill_570_seconds" not in text
+
+def test_history_keeps_active_jobs(manager):
+    release = threading.Event()
+    running = manager.submit("long", lambda job: release.wait(5))[0]
+    for i in range(5):
+        wait(manager.submit("short", lambda job: True, key=f"short{i}")[0])
+    assert manager.get(running.id) is running
+    assert len(manager.list()) <= 4
+    release.set()
+    wait(running)
@@ -0,0 +1,60 @@
+# ingestion_service/tests/test_metrics.py
+"""Counters, histograms and spans land in the registry and render as Prometheus text."""
+import json
+
+import pytest
+
+import metrics
+
+def test_counters_are_kept_per_label_set():
+    metrics.inc("steam_pages_fetched_total", app_id=1)
+    metrics.inc("steam_pages_fetched_total", app_id=1)
+    metrics.inc("steam_pages_fetched_total", 3, app_id=2)
+    metrics.inc("gcs_uploaded_bytes_total", 1024)
+    text = metrics.render()
+    assert 'steam_pages_fetched_total{app_id="1"} 2' in text
+    assert 'steam_pages_fetched_total{app_id="2"} 3' in text
+    assert "gcs_uploaded_bytes_total 1024" in text
+    assert text.count("# TYPE steam_pages_fetched_total counter") == 1
+
+def test_label_values_are_escaped():
+    metrics.inc("games_seen_total", game='Say "Hi"\\Bye\nPart 2')
+    assert 'games_seen_total{game="Say \\"Hi\\"\\\\Bye\\nPart 2"} 1' in metrics.render().splitlines()
+
+def test_histogram_buckets_are_cumulative():
+    for seconds in (0.0005, 0.02, 0.02, 7):
+        metrics.observe("prediction_seconds", seconds, model="logreg")
+    lines = dict(line.rsplit(" ", 1) for line in metrics.render().splitlines() if not line.startswith("#"))
+    assert lines['prediction_seconds_bucket{model="logreg",le="0.001"}'] == "1"
+    assert lines['prediction_seconds_bucket{model="logreg",le="0.025"}'] == "3"
+    assert lines['prediction_seconds_bucket{model="logreg",le="5"}'] == "3"
+    assert lines['prediction_seconds_bucket{model="logreg",le="10"}'] == "4"
+    assert lines['prediction_seconds_bucket{model="logreg",le="+Inf"}'] == "4"
+    assert lines['prediction_seconds_count{model="logreg"}'] == "4"
+    assert float(lines['prediction_seconds_sum{model="logreg"}']) == pytest.approx(7.0405)
+
+def test_span_times_the_block_and_counts_errors(monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "LOG_SPANS", True)
+    with metrics.span("bq_load", table="raw") as sp:
+        sp.set(rows=10)
+    with pytest.raises(RuntimeError):
+        with metrics.span("bq_load", table="raw"):
+            raise RuntimeError("quota")
+
+    text = metrics.render()
+    assert 'bq_load_seconds_count{table="raw"} 2' in text
+    assert 'bq_load_errors_total{table="raw"} 1' in text
+    ok, failed = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert ok["event"] == "span" and ok["span"] == "bq_load" and ok["rows"] == 10 and ok["error"] is None
+    assert failed["error"] == "RuntimeError"
+
+def test_disabled_metrics_record_nothing(monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.inc("x_total")
+    metrics.observe("x_seconds", 1)
+    metrics.event("x")
+    with metrics.span("x") as sp:
+        sp.set(rows=1)
+    assert metrics.span("y") is metrics.span("z")
+    assert metrics.render() == "\n"
+    assert capsys.readouterr().out == ""
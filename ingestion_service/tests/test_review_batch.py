@@ -0,0 +1,65 @@
+# ingestion_service/tests/test_review_batch.py
+"""ReviewBatch holds fetched pages as typed columns and hands back the same reviews."""
+import json
+
+import pyarrow as pa
+
+from review_batch import ReviewBatch
+from review_codec import loads
+from review_store import RAW_REVIEWS_ARROW_SCHEMA
+
+def steam_page(reviews: list) -> list:
+    """Reviews as the appreviews API returns them: no app_id / game_name."""
+    return [{k: v for k, v in r.items() if k not in ("app_id", "game_name")} for r in reviews]
+
+def projected(review: dict, app_id: int, game_name: str) -> dict:
+    """What the BigQuery load keeps of a raw review: schema columns (also inside `author`) only, typed."""
+    row = {name: review.get(name) for name in RAW_REVIEWS_ARROW_SCHEMA.names}
+    row["author"] = {f.name: review["author"].get(f.name) for f in RAW_REVIEWS_ARROW_SCHEMA.field("author").type}
+    row.update(app_id=app_id, game_name=game_name, weighted_vote_score=float(review["weighted_vote_score"]))
+    return row
+
+def batch_of(sample_reviews) -> ReviewBatch:
+    batch = ReviewBatch()
+    batch.add_page(steam_page(sample_reviews[:100]), 1172470, "Apex Legends")
+    batch.add_page([], 1172470, "Apex Legends")
+    other = ReviewBatch()
+    other.add_page(steam_page(sample_reviews[100:130]), 570, "Dota 2")
+    batch.extend(other)
+    return batch
+
+def test_pages_become_typed_columns(sample_reviews):
+    batch = batch_of(sample_reviews)
+    assert len(batch) == 130
+    table = batch.table()
+    assert table.schema == RAW_REVIEWS_ARROW_SCHEMA
+    assert table.column("game_name").to_pylist() == ["Apex Legends"] * 100 + ["Dota 2"] * 30
+    assert table.column("recommendationid").to_pylist() == [r["recommendationid"] for r in sample_reviews[:130]]
+    # far smaller than the review dicts it replaces
+    assert batch.nbytes < len(json.dumps(sample_reviews[:130]))
+
+def test_landing_payload_matches_the_projected_reviews(sample_reviews):
+    batch = batch_of(sample_reviews)
+    expected = [projected(r, 1172470, "Apex Legends") for r in sample_reviews[:100]] + \
+               [projected(r, 570, "Dota 2") for r in sample_reviews[100:130]]
+    assert [loads(line) for line in batch.to_jsonl(chunk_rows=16).split(b"\n")] == expected
+    assert list(batch) == expected
+    assert [len(c) for c in batch.iter_chunks(chunk_rows=40)] == [40, 40, 20, 30]
+
+def test_landing_payload_escapes_like_a_json_encoder(sample_reviews):
+    review = dict(steam_page(sample_reviews[:1])[0], author=None, weighted_vote_score=float("nan"), votes_up=None,
+                  review='He said "10/10"\\ \n\r\t\x00\x1f\x7f — café 🎮 \u2028 end')
+    batch = ReviewBatch()
+    batch.add_page([review], 570, 'Dota "2"\n')
+    line = batch.to_jsonl()
+    assert b"\n" not in line
+    row = json.loads(line)
+    assert row["review"] == review["review"] and row["game_name"] == 'Dota "2"\n'
+    assert row["author"] is None and row["weighted_vote_score"] is None and row["votes_up"] is None
+    assert row == json.loads(json.dumps(batch.table().to_pylist()[0]).replace("NaN", "null"))
+
+def test_empty_batch():
+    batch = ReviewBatch()
+    assert not batch and batch.to_jsonl() == b""
+    assert batch.table().num_rows == 0 and batch.table().schema == RAW_REVIEWS_ARROW_SCHEMA
+    assert isinstance(batch.table(), pa.Table)
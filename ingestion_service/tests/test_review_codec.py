@@ -0,0 +1,86 @@
+# ingestion_service/tests/test_review_codec.py
+"""Landing files round-trip through either JSON backend, and the validator coerces or rejects per field."""
+import importlib.util
+import json
+import sys
+
+import pytest
+from google.cloud.bigquery import SchemaField
+
+import review_codec
+from review_codec import ReviewValidator
+
+SCHEMA = [
+    SchemaField("recommendationid", "STRING"),
+    SchemaField("author", "RECORD", fields=[
+        SchemaField("steamid", "STRING"),
+        SchemaField("playtime_forever", "INT64"),
+    ]),
+    SchemaField("review", "STRING"),
+    SchemaField("timestamp_created", "INT64"),
+    SchemaField("voted_up", "BOOL"),
+    SchemaField("weighted_vote_score", "FLOAT"),
+    SchemaField("app_id", "INT64", mode="REQUIRED"),
+]
+
+def stdlib_codec(monkeypatch):
+    """A second copy of review_codec, imported as if orjson were not installed."""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    spec = importlib.util.spec_from_file_location("review_codec_stdlib", review_codec.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_both_backends_write_the_same_lines(sample_reviews, monkeypatch, tmp_path):
+    fallback = stdlib_codec(monkeypatch)
+    assert fallback.BACKEND == "json"
+    records = sample_reviews[:50] + [{"recommendationid": "1", "review": "Café crème — 10/10 🎮"}]
+    expected = [json.dumps(r, ensure_ascii=False, separators=(",", ":")) for r in records]
+
+    for codec in (review_codec, fallback):
+        payload = codec.encode_jsonl(records)
+        assert payload.decode("utf-8").split("\n") == expected
+        path = tmp_path / f"{codec.BACKEND}.jsonl"
+        path.write_bytes(payload + b"\n\n")
+        assert codec.read_jsonl(str(path)) == records
+        assert codec.decode_page(codec.dumps({"reviews": records}))["reviews"] == records
+
+def test_decode_errors_are_json_decode_errors():
+    with pytest.raises(json.JSONDecodeError):
+        review_codec.decode_page(b"<html>429 Too Many Requests</html>")
+
+def test_validator_accepts_the_sample(sample_reviews):
+    original = json.loads(json.dumps(sample_reviews))
+    valid, rejected = ReviewValidator(SCHEMA).validate(sample_reviews)
+    assert rejected == [] and len(valid) == len(original)
+    # Steam sends weighted_vote_score as a string; everything else is already typed
+    for got, raw in zip(valid, original):
+        assert got["weighted_vote_score"] == float(raw["weighted_vote_score"])
+        assert {**got, "weighted_vote_score": None} == {**raw, "weighted_vote_score": None}
+
+def test_validator_coerces_numeric_strings_in_place():
+    review = {"recommendationid": 123, "author": {"steamid": 7656, "playtime_forever": "90"},
+              "weighted_vote_score": "0.523", "timestamp_created": 1751509497.0, "app_id": "570"}
+    assert ReviewValidator(SCHEMA).check(review) is None
+    assert review == {"recommendationid": "123", "author": {"steamid": "7656", "playtime_forever": 90},
+                      "weighted_vote_score": 0.523, "timestamp_created": 1751509497, "app_id": 570}
+
+@pytest.mark.parametrize("review, error", [
+    ({"app_id": 1}, "recommendationid: missing"),
+    ({"recommendationid": "1"}, "app_id: missing"),
+    ({"recommendationid": "1", "app_id": 1, "voted_up": "yes"}, "voted_up: str"),
+    ({"recommendationid": "1", "app_id": True}, "app_id: bool"),
+    ({"recommendationid": "1", "app_id": 1, "timestamp_created": 1.5}, "timestamp_created: float"),
+    ({"recommendationid": "1", "app_id": 1, "weighted_vote_score": "n/a"}, "weighted_vote_score: could not convert"),
+    ({"recommendationid": "1", "app_id": 1, "author": "76561198"}, "author: expected object"),
+    ({"recommendationid": "1", "app_id": 1, "author": {"playtime_forever": "lots"}}, "author.playtime_forever: invalid"),
+])
+def test_validator_rejects(review, error):
+    assert ReviewValidator(SCHEMA).check(review).startswith(error)
+
+def test_validate_splits_valid_and_rejected():
+    reviews = [{"recommendationid": "1", "app_id": 1}, {"recommendationid": "2", "app_id": "x"},
+               {"recommendationid": "3", "app_id": 3}]
+    valid, rejected = ReviewValidator(SCHEMA).validate(reviews)
+    assert [r["recommendationid"] for r in valid] == ["1", "3"]
+    assert [rid for rid, _ in rejected] == ["2"]
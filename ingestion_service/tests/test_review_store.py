@@ -0,0 +1,93 @@
+# ingestion_service/tests/test_review_store.py
+"""The store keeps one row per recommendationid and finds rows through its id index and manifest."""
+import json
+
+import pytest
+
+import steam_fetcher
+from review_store import ReviewStore, import_jsonl
+
+def rids(table) -> list:
+    return table.column("recommendationid").to_pylist()
+
+@pytest.fixture
+def store(tmp_path):
+    return ReviewStore(str(tmp_path / "store"))
+
+def test_append_drops_duplicates(store, sample_reviews):
+    first, rest = sample_reviews[:300], sample_reviews[300:500]
+    assert store.append(first + first[:10]) == 300
+    assert store.append(first[250:] + rest) == 200
+    assert store.append(first) == 0
+    assert len(store) == 500
+
+    ids = [r["recommendationid"] for r in sample_reviews[:600]]
+    assert store.contains(ids).tolist() == [True] * 500 + [False] * 100
+    assert store.missing(ids[495:505]) == ids[500:505]
+
+def test_index_survives_reopening(store, sample_reviews):
+    store.append(sample_reviews[:100])
+    store.append(sample_reviews[100:200])
+    reopened = ReviewStore(store.root)
+    assert len(reopened) == 200 and len(reopened.segments) == 2
+
+    wanted = [sample_reviews[i]["recommendationid"] for i in (150, 3, 199)] + ["1"]
+    got = reopened.get(wanted, columns=["recommendationid", "review"])
+    assert sorted(rids(got)) == sorted(wanted[:3])
+    by_id = {r["recommendationid"]: r["review"] for r in sample_reviews}
+    assert all(by_id[rid] == review for rid, review in zip(rids(got), got.column("review").to_pylist()))
+    assert reopened.get(["1"]).num_rows == 0
+
+def test_scan_prunes_by_app_and_time(store, sample_reviews):
+    other = [dict(r, app_id=570, game_name="Dota 2") for r in sample_reviews[500:600]]
+    store.append(sample_reviews[:500] + other)
+    ts = sorted(r["timestamp_created"] for r in sample_reviews[:500])
+    start, end = ts[100], ts[400]
+
+    assert store.scan(app_id=570).num_rows == 100
+    window = store.scan(app_id=1172470, start=start, end=end, columns=["timestamp_created"])
+    assert window.schema.names == ["timestamp_created"]
+    assert window.num_rows == sum(start <= t < end for t in ts)
+    assert store.scan().num_rows == 600
+    assert set(store.stats()["apps"]) == {570, 1172470}
+
+def test_compact_merges_segments_and_keeps_the_index(store, sample_reviews):
+    for i in range(0, 300, 100):
+        store.append(sample_reviews[i:i + 100])
+    assert len(store.segments) == 3
+    assert store.compact() == 2
+    assert len(store.segments) == 1 and len(store) == 300
+    wanted = [r["recommendationid"] for r in sample_reviews[:300:37]]
+    assert sorted(rids(store.get(wanted))) == sorted(wanted)
+    assert store.append(sample_reviews[:300]) == 0
+
+def test_import_jsonl(store, sample_reviews, tmp_path):
+    path = tmp_path / "reviews.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in sample_reviews[:250]))
+    assert import_jsonl(store, [str(path), str(path)], batch_size=100) == 250
+
+class _Page:
+    def __init__(self, reviews, cursor):
+        self.content = json.dumps({"success": 1, "reviews": reviews, "cursor": cursor}).encode()
+
+    def raise_for_status(self):
+        pass
+
+def test_fetcher_skips_stored_reviews_and_stops_when_caught_up(store, sample_reviews, monkeypatch):
+    pages = [sample_reviews[i:i + 100] for i in range(0, 500, 100)]
+    calls = []
+
+    def get(url, params=None, **kwargs):
+        page = int(params.get("cursor", "0"))
+        calls.append(page)
+        return _Page(pages[page], str(page + 1))
+    monkeypatch.setattr(steam_fetcher.requests, "get", get)
+
+    # pages 0-1 are new, page 2 was half loaded by the last run, pages 3+ are fully stored
+    store.append(sample_reviews[250:500])
+    batch = steam_fetcher.fetch_raw_recent_reviews(1172470, "Apex Legends", max_pages=5, pause=0, store=store)
+    assert calls == [0, 1, 2, 3]
+    assert len(batch) == 250
+    assert sorted(rids(batch.table())) == sorted(r["recommendationid"] for r in sample_reviews[:250])
+    # the fetcher leaves appending to the caller (after the BigQuery load)
+    assert len(store) == 250
@@ -0,0 +1,77 @@
+# lr_tfidf_trainer/data_loader.py
+"""
+Training-data loader for the sharded Parquet export of `cleaned_for_model_training`.
+
+cloudbuild.yaml exports the table with EXPORT DATA as Snappy-compressed Parquet
+shards (gs://<bucket>/steam_reviews_cleaned/part-*.parquet) holding only the
+columns the trainer needs. Here the shard directory is opened as one pyarrow
+dataset: shards are read in parallel (fragment_readahead) and decoded column by
+column, and either streamed as record batches or materialised as one DataFrame.
+
+Legacy single-file CSV exports (`*.csv`, `*.csv.gz`) are still accepted so older
+DATA_URIs keep working, just without the parallel read.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+TRAINING_COLUMNS = ["recommendationid", "review_text", "review_score"]
+DEFAULT_BATCH_SIZE = 64_000
+
+def _is_csv(uri: str) -> bool:
+    return uri.endswith(".csv") or uri.endswith(".csv.gz")
+
+def open_dataset(uri: str) -> ds.Dataset:
+    """Opens a Parquet shard directory (or single file), local or gs://."""
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    filesystem, path = fs.FileSystem.from_uri(uri)
+    return ds.dataset(path, filesystem=filesystem, format="parquet")
+
+def column_names(uri: str) -> list:
+    """Column names of the export without reading any rows."""
+    if _is_csv(uri):
+        return list(pd.read_csv(uri, nrows=0).columns)
+    return open_dataset(uri).schema.names
+
+def iter_batches(uri: str, columns: list = None, batch_size: int = DEFAULT_BATCH_SIZE, readahead: int = None):
+    """Streams pyarrow RecordBatches of `columns`, reading up to `readahead` shards concurrently."""
+    columns = columns or TRAINING_COLUMNS
+    if _is_csv(uri):
+        for chunk in pd.read_csv(uri, usecols=columns, chunksize=batch_size):
+            yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+        return
+    readahead = readahead or os.cpu_count()
+    yield from open_dataset(uri).to_batches(columns=columns, batch_size=batch_size,
+                                            fragment_readahead=readahead, use_threads=True)
+
+def steam_ids(ids: pa.Array) -> pa.Array:
+    """
+    recommendationids as int64, null where the id is not a Steam id: rows staged by dbt's
+    stg_kaggle_historical carry an MD5 of their text instead.
+    """
+    import pyarrow.compute as pc
+    if pa.types.is_integer(ids.type):
+        return pc.cast(ids, pa.int64())
+    ids = pc.cast(ids, pa.string())
+    numeric = pc.match_substring_regex(ids, r"^[0-9]{1,18}$")
+    return pc.cast(pc.if_else(numeric, ids, pa.scalar(None, pa.string())), pa.int64())
+
+def max_id(uri: str, id_col: str = "recommendationid") -> int:
+    """Largest Steam recommendationid in the export (Steam assigns them in increasing order)."""
+    import pyarrow.compute as pc
+    top = 0
+    for batch in iter_batches(uri, columns=[id_col]):
+        m = pc.max(steam_ids(batch.column(id_col))).as_py()
+        top = max(top, m or 0)
+    return top
+
+def load_frame(uri: str, columns: list = None) -> pd.DataFrame:
+    """Reads all shards in parallel into one DataFrame with only `columns`."""
+    columns = columns or TRAINING_COLUMNS
+    if _is_csv(uri):
+        return pd.read_csv(uri, usecols=columns)
+    return open_dataset(uri).to_table(columns=columns, use_threads=True).to_pandas()
@@ -0,0 +1,195 @@
+# lr_tfidf_trainer/dedup.py
+"""
+MinHash/LSH near-duplicate collapsing for the training and scoring corpora.
+
+Runs between the cleaned export (cloudbuild.yaml) and the trainer / scorer:
+
+    python dedup.py --input  gs://steam-reviews-bucket-0/steam_reviews_cleaned/ \
+                    --output gs://steam-reviews-bucket-0/steam_reviews_dedup/
+
+  1. each review is lower-cased, tokenized and turned into word 3-gram shingles
+     (token ids are interned, shingle hashes computed with NumPy per batch);
+  2. a 64-permutation MinHash signature is computed per review, vectorised over
+     batches of reviews (np.minimum.reduceat over each review's shingles);
+  3. LSH with 16 bands x 4 rows proposes candidates; each candidate is verified
+     against its bucket's first member by signature agreement (>= --threshold,
+     an estimate of Jaccard similarity), and verified pairs are merged with
+     connected components;
+  4. every (cluster, label) group becomes one representative row (its first
+     member) with `weight` = group size. Near-duplicates with different labels
+     are never merged, so the label balance of the weighted corpus is unchanged.
+
+Outputs (Parquet, local or gs://):
+    <output>/representatives/part-0.parquet   recommendationid, review_text, review_score, weight
+    <output>/clusters/part-0.parquet          recommendationid, representative_id
+
+sampling.load_balanced reads `weight` when present and task.py trains with it as
+sample_weight; batch_scorer/score.py --clusters scores one review per cluster.
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+from pyarrow import fs
+from scipy.sparse.csgraph import connected_components
+
+from data_loader import iter_batches
+
+NUM_PERM = 64
+BANDS = 16           # 16 bands x 4 rows: candidate pairs from ~50% similarity up
+SHINGLE = 3
+THRESHOLD = 0.8
+BATCH_DOCS = 4096
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9))
+_PAD = 1 << 40       # sentinel token id padding reviews shorter than one shingle
+
+def _splitmix(h: np.ndarray) -> np.ndarray:
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, shingle: int = SHINGLE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.shingle = shingle
+        self.vocab = {}
+
+    def _token_ids(self, texts: list):
+        k, vocab, ids, lengths = self.shingle, self.vocab, [], np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            toks = [vocab.setdefault(t, len(vocab)) for t in TOKEN_RE.findall((text or "").lower())]
+            if len(toks) < k:
+                toks += [_PAD + j for j in range(k - len(toks))]
+            ids.extend(toks)
+            lengths[i] = len(toks)
+        return np.asarray(ids, dtype=np.uint64), lengths
+
+    def signatures(self, texts: list) -> np.ndarray:
+        """(len(texts), num_perm) uint32 MinHash signatures."""
+        ids, lengths = self._token_ids(texts)
+        k = self.shingle
+        ends = np.cumsum(lengths)
+        # shingle i covers ids[i:i+k]; keep only those inside one review
+        n_sh = lengths - k + 1
+        pos = np.arange(len(ids) - k + 1)
+        doc = np.repeat(np.arange(len(texts)), lengths)[:len(pos)]
+        valid = pos <= (ends[doc] - k)
+        with np.errstate(over="ignore"):
+            h = np.zeros(len(pos), dtype=np.uint64)
+            for j in range(k):
+                h ^= ids[j:j + len(pos)] * _MIX[j % len(_MIX)] + np.uint64(j)
+            h = _splitmix(h[valid])
+            sh_starts = np.concatenate([[0], np.cumsum(n_sh)[:-1]])
+            # (a*h + b) over 2^64, top 32 bits: multiply-shift universal hashing
+            vals = ((self.a[:, None] * h[None, :] + self.b[:, None]) >> np.uint64(32)).astype(np.uint32)
+        return np.minimum.reduceat(vals, sh_starts, axis=1).T.copy()
+
+def lsh_pairs(sig: np.ndarray, bands: int = BANDS, threshold: float = THRESHOLD) -> tuple:
+    """Verified (i, j) near-duplicate pairs: each LSH bucket member vs the bucket's first member."""
+    n, p = sig.shape
+    rows = p // bands
+    primes = _splitmix(np.arange(1, rows + 1, dtype=np.uint64))
+    src, dst = [], []
+    for band in range(bands):
+        block = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        with np.errstate(over="ignore"):
+            key = _splitmix((block * primes).sum(axis=1) + np.uint64(band))
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        new_group = np.empty(n, dtype=bool)
+        new_group[0] = True
+        new_group[1:] = sorted_key[1:] != sorted_key[:-1]
+        head = order[np.maximum.accumulate(np.where(new_group, np.arange(n), 0))]
+        members = ~new_group
+        a, b = order[members], head[members]
+        if len(a):
+            agree = (sig[a] == sig[b]).mean(axis=1) >= threshold
+            src.append(a[agree])
+            dst.append(b[agree])
+    if not src:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(src), np.concatenate(dst)
+
+def cluster(sig: np.ndarray, labels: np.ndarray, bands: int = BANDS, threshold: float = THRESHOLD) -> np.ndarray:
+    """Representative row index for every row; groups never mix labels."""
+    n = len(sig)
+    a, b = lsh_pairs(sig, bands, threshold)
+    graph = sp.coo_matrix((np.ones(len(a), dtype=np.int8), (a, b)), shape=(n, n))
+    _, comp = connected_components(graph, directed=False)
+    _, label_codes = np.unique(labels, return_inverse=True)
+    group_key = comp.astype(np.int64) * (label_codes.max() + 1) + label_codes
+    # first (lowest-index) row of every (component, label) group represents it
+    _, first, inverse = np.unique(group_key, return_index=True, return_inverse=True)
+    return first[inverse.ravel()]
+
+def deduplicate(texts: list, labels, threshold: float = THRESHOLD, num_perm: int = NUM_PERM,
+                bands: int = BANDS, batch_docs: int = BATCH_DOCS) -> dict:
+    """Representative index per row plus the weighted representatives and reduction stats."""
+    labels = np.asarray(labels)
+    start = time.perf_counter()
+    hasher = MinHasher(num_perm)
+    sig = np.vstack([hasher.signatures(texts[i:i + batch_docs]) for i in range(0, len(texts), batch_docs)]) \
+        if texts else np.empty((0, num_perm), np.uint32)
+    t_sig = time.perf_counter() - start
+    rep = cluster(sig, labels, bands, threshold) if len(sig) else np.empty(0, np.int64)
+    reps, weights = np.unique(rep, return_counts=True)
+    stats = {
+        "rows_in": len(texts), "rows_out": int(len(reps)),
+        "reduction_ratio": round(1 - len(reps) / max(len(texts), 1), 4),
+        "labels_in": {str(k): int(v) for k, v in zip(*np.unique(labels, return_counts=True))},
+        "labels_out": {str(k): int(v) for k, v in zip(*np.unique(labels[reps], return_counts=True))},
+        "signature_s": round(t_sig, 2), "total_s": round(time.perf_counter() - start, 2),
+    }
+    return {"representative": rep, "rows": reps, "weights": weights, "stats": stats}
+
+def _write(table: pa.Table, uri: str):
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    filesystem, path = fs.FileSystem.from_uri(uri)
+    filesystem.create_dir(path, recursive=True)
+    pq.write_table(table, f"{path}/part-0.parquet", filesystem=filesystem, compression="snappy")
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", required=True, help="Parquet shard directory (or CSV) of the cleaned export")
+    p.add_argument("--output", required=True, help="Directory for representatives/ and clusters/")
+    p.add_argument("--threshold", type=float, default=THRESHOLD, help="Estimated Jaccard similarity to merge")
+    p.add_argument("--num-perm", type=int, default=NUM_PERM)
+    p.add_argument("--bands", type=int, default=BANDS)
+    args = p.parse_args()
+
+    print(f"📥 Reading {args.input}...")
+    ids, texts, labels = [], [], []
+    for batch in iter_batches(args.input, columns=["recommendationid", "review_text", "review_score"]):
+        ids.extend(batch.column("recommendationid").to_pylist())
+        texts.extend(batch.column("review_text").to_pylist())
+        labels.extend(batch.column("review_score").to_pylist())
+    keep = [i for i, (t, l) in enumerate(zip(texts, labels)) if t is not None and l is not None]
+    ids, texts, labels = [ids[i] for i in keep], [texts[i] for i in keep], [labels[i] for i in keep]
+
+    print(f"🔍 MinHash/LSH over {len(texts):,} reviews...")
+    out = deduplicate(texts, labels, args.threshold, args.num_perm, args.bands)
+    rows, rep = out["rows"], out["representative"]
+    ids = [str(i) for i in ids]
+    _write(pa.table({
+        "recommendationid": [ids[i] for i in rows],
+        "review_text": [texts[i] for i in rows],
+        "review_score": pa.array([labels[i] for i in rows], pa.int64()),
+        "weight": pa.array(out["weights"], pa.int32()),
+    }), f"{args.output.rstrip('/')}/representatives")
+    _write(pa.table({"recommendationid": ids, "representative_id": [ids[i] for i in rep]}),
+           f"{args.output.rstrip('/')}/clusters")
+    s = out["stats"]
+    print(f"✅ {s['rows_in']:,} → {s['rows_out']:,} reviews ({s['reduction_ratio']:.1%} fewer) in {s['total_s']}s")
+    print(f"   labels before {s['labels_in']} → after {s['labels_out']} (weights restore the originals)")
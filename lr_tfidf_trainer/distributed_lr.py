@@ -0,0 +1,228 @@
+# lr_tfidf_trainer/distributed_lr.py
+"""
+Data-parallel TF-IDF + LogisticRegression training on a local multi-process cluster.
+
+The corpus is partitioned once across N long-lived worker processes, and every
+worker keeps its partition (texts, then its TF-IDF rows) in its own memory:
+
+  1. count      each worker counts term / document frequencies of its partition;
+                the driver merges them into the vocabulary and idf exactly like
+                ShardedTfidf (parallel_tfidf.fit_from_counts);
+  2. featurize  the fitted vectorizer is broadcast and each worker transforms its
+                own partition; the TF-IDF matrix is never gathered on the driver;
+  3. optimize   the driver runs L-BFGS on the same objective sklearn's lbfgs
+                LogisticRegression minimises (L2, C, class_weight, unpenalised
+                intercept). Each step broadcasts the weights, every worker returns
+                loss and gradient of its rows, and the driver sums them (allreduce).
+
+The result is a fitted TfidfVectorizer and a LogisticRegression with coef_ /
+intercept_ set, so the exported (vec, clf) bundle is the one logreg_predict, the
+registry and the batch scorer already load. Binary labels only.
+
+    vec, clf, info = train_distributed(texts, labels, TFIDF_PARAMS, LOGREG_PARAMS, workers=8)
+"""
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+
+import numpy as np
+from scipy.optimize import minimize
+from scipy.special import expit
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from parallel_tfidf import fit_from_counts
+
+# --- Worker side ---
+def _worker(conn):
+    """Serves commands for one partition until 'stop'."""
+    texts = y = X = sw = base_w = None
+    while True:
+        cmd, args = conn.recv()
+        try:
+            if cmd == "load":
+                texts, y, base_w = args
+                y = np.asarray(y)
+                out = len(texts)
+            elif cmd == "count":
+                analyzer = args.build_analyzer()
+                tf, df = Counter(), Counter()
+                for doc in texts:
+                    feats = analyzer(doc)
+                    tf.update(feats)
+                    df.update(set(feats))
+                out = (len(texts), tf, df)
+            elif cmd == "featurize":
+                X = args.transform(texts)
+                texts = None   # the rows are all we need from here on
+                out = X.nnz
+            elif cmd == "weights":
+                classes, class_weight = args
+                sw = np.asarray([class_weight[c] for c in classes], dtype=np.float64)[np.searchsorted(classes, y)]
+                if base_w is not None:
+                    sw *= base_w
+                y = (y == classes[1]).astype(np.float64)
+                out = float(sw.sum())
+            elif cmd == "loss_grad":
+                coef, intercept = args
+                z = X @ coef + intercept
+                loss = float(np.dot(sw, np.logaddexp(0, z) - y * z))
+                g = sw * (expit(z) - y)
+                out = (loss, X.T @ g, float(g.sum()))
+            elif cmd == "stop":
+                conn.send(("ok", None))
+                return
+            else:
+                raise ValueError(f"unknown command {cmd!r}")
+            conn.send(("ok", out))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+# --- Driver side ---
+class LocalCluster:
+    """N worker processes, each owning one partition; map() broadcasts a command and gathers replies."""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count()
+        self._procs, self._conns = [], []
+
+    def __enter__(self):
+        ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+        for _ in range(self.workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, args=(child,), daemon=True)
+            proc.start()
+            self._procs.append(proc)
+            self._conns.append(parent)
+        return self
+
+    def __exit__(self, *exc):
+        for conn in self._conns:
+            try:
+                conn.send(("stop", None))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        return False
+
+    def _gather(self):
+        out = []
+        for conn in self._conns:
+            status, value = conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"worker failed: {value}")
+            out.append(value)
+        return out
+
+    def map(self, cmd: str, args=None) -> list:
+        """Same command and arguments to every worker (sent before waiting on any)."""
+        for conn in self._conns:
+            conn.send((cmd, args))
+        return self._gather()
+
+    def scatter(self, cmd: str, per_worker: list) -> list:
+        """One argument per worker."""
+        for conn, args in zip(self._conns, per_worker):
+            conn.send((cmd, args))
+        return self._gather()
+
+def partition(texts: list, labels, n: int, sample_weight=None) -> list:
+    """n contiguous, near-equal (texts, labels, sample_weight) partitions."""
+    labels = np.asarray(labels)
+    bounds = np.linspace(0, len(texts), n + 1).astype(int)
+    return [(list(texts[a:b]), labels[a:b], None if sample_weight is None else np.asarray(sample_weight)[a:b])
+            for a, b in zip(bounds[:-1], bounds[1:])]
+
+def _class_weight(labels: np.ndarray, classes: np.ndarray, class_weight) -> dict:
+    if class_weight == "balanced":
+        counts = np.asarray([(labels == c).sum() for c in classes], dtype=np.float64)
+        return dict(zip(classes.tolist(), (len(labels) / (len(classes) * counts)).tolist()))
+    class_weight = class_weight or {}
+    return {c: float(class_weight.get(c, 1.0)) for c in classes.tolist()}
+
+def train_distributed(texts: list, labels, tfidf_params: dict, logreg_params: dict, workers: int = None,
+                      verbose: bool = True, sample_weight=None):
+    """
+    Returns (fitted TfidfVectorizer, fitted LogisticRegression, timing/convergence info).
+    `sample_weight` multiplies the class weights per row, as in LogisticRegression.fit.
+    """
+    labels = np.asarray(labels)
+    classes = np.unique(labels)
+    if len(classes) != 2:
+        raise ValueError(f"distributed training supports binary labels only, got {len(classes)} classes")
+    params = LogisticRegression(**logreg_params).get_params()
+    if params["penalty"] not in ("l2", "deprecated") or params.get("l1_ratio") not in (None, 0, 0.0):
+        raise ValueError("distributed training implements the L2 penalty only")
+    C, tol, max_iter = params["C"], params["tol"], params["max_iter"]
+    fit_intercept = params["fit_intercept"]
+    info, log = {}, (print if verbose else (lambda *a, **k: None))
+
+    with LocalCluster(workers) as cluster:
+        n = cluster.workers
+        start = time.perf_counter()
+        cluster.scatter("load", partition(texts, labels, n, sample_weight))
+        info["scatter_s"] = time.perf_counter() - start
+
+        # 1. vocabulary + idf from merged per-partition counts
+        start = time.perf_counter()
+        vec = clone(TfidfVectorizer(**tfidf_params))
+        n_docs, tf, df = 0, Counter(), Counter()
+        for part_docs, part_tf, part_df in cluster.map("count", vec):
+            n_docs += part_docs
+            tf.update(part_tf)
+            df.update(part_df)
+        vec = fit_from_counts(vec, n_docs, tf, df)
+        info.update(n_docs=n_docs, vocab_tf={t: tf[t] for t in vec.vocabulary_})
+        del tf, df
+        n_features = len(vec.vocabulary_)
+        info["tfidf_fit_s"] = time.perf_counter() - start
+
+        # 2. every worker featurizes its own partition
+        start = time.perf_counter()
+        nnz = sum(cluster.map("featurize", vec))
+        info["featurize_s"] = time.perf_counter() - start
+        log(f"🔠 TF-IDF on {n} workers: {n_docs:,} x {n_features:,}, nnz={nnz:,}")
+
+        # 3. L-BFGS with an allreduce of per-partition loss / gradient
+        sw_sum = sum(cluster.map("weights", (classes, _class_weight(labels, classes, params["class_weight"]))))
+        l2 = 1.0 / (C * sw_sum)
+        calls = 0
+
+        def loss_grad(w):
+            nonlocal calls
+            calls += 1
+            coef, intercept = w[:n_features], (w[n_features] if fit_intercept else 0.0)
+            loss, grad_coef, grad_b = 0.0, np.zeros(n_features), 0.0
+            for part_loss, part_grad, part_b in cluster.map("loss_grad", (coef, intercept)):
+                loss += part_loss
+                grad_coef += part_grad
+                grad_b += part_b
+            # sklearn's scaling: mean weighted log-loss + l2/2 * ||coef||^2
+            loss = loss / sw_sum + 0.5 * l2 * float(coef @ coef)
+            grad = np.empty_like(w)
+            grad[:n_features] = grad_coef / sw_sum + l2 * coef
+            if fit_intercept:
+                grad[n_features] = grad_b / sw_sum
+            return loss, grad
+
+        start = time.perf_counter()
+        w0 = np.zeros(n_features + int(fit_intercept))
+        res = minimize(loss_grad, w0, method="L-BFGS-B", jac=True,
+                       options={"maxiter": max_iter, "maxls": 50, "gtol": tol, "ftol": 64 * np.finfo(float).eps})
+        info["optimize_s"] = time.perf_counter() - start
+        info.update(workers=n, n_iter=int(res.nit), allreduce_calls=calls, converged=bool(res.success), loss=float(res.fun))
+        log(f"📈 L-BFGS: {res.nit} iterations, {calls} allreduce rounds, converged={res.success}")
+
+    clf = LogisticRegression(**logreg_params)
+    clf.classes_ = classes
+    clf.coef_ = res.x[:n_features].reshape(1, -1)
+    clf.intercept_ = np.asarray([res.x[n_features] if fit_intercept else 0.0])
+    clf.n_iter_ = np.asarray([res.nit], dtype=np.int32)
+    clf.n_features_in_ = n_features
+    return vec, clf, info
@@ -0,0 +1,124 @@
+# lr_tfidf_trainer/fast_tfidf.py
+"""
+Allocation-light replacement for TfidfVectorizer.transform on the LR bundle.
+
+sklearn builds a Python list of token strings per review, then a second list of
+"w1 w2" bigram strings, and looks every one of them up in the vocabulary. Here
+each token is looked up once in a word table, and bigrams are resolved as
+integer pairs (first_word_id * n_words + second_word_id) against a sorted key
+array with NumPy, so no n-gram strings are ever built. Counting, idf weighting
+and l2 normalisation are vectorised over the whole batch.
+
+The output is the same CSR matrix vec.transform() produces (same feature
+indices, float64, l2 rows), for the configurations this project trains:
+word analyzer, ngram_range within (1, 2), lowercase, optional stop words.
+"""
+import re
+
+import numpy as np
+import scipy.sparse as sp
+
+_STOP = -2   # stop word: dropped before n-grams are formed, like sklearn
+_OOV = -1    # word outside the vocabulary: kept so it still breaks bigram adjacency
+
+class FastTfidf:
+    def __init__(self, vectorizer):
+        v = vectorizer
+        if (v.analyzer != "word" or v.tokenizer is not None or v.preprocessor is not None
+                or v.strip_accents is not None or v.ngram_range[0] < 1 or v.ngram_range[1] > 2
+                or v.sublinear_tf or v.binary):
+            raise ValueError(f"FastTfidf does not support this vectorizer configuration: {v!r}")
+        self.lowercase = v.lowercase
+        self.norm = v.norm
+        self.n_features = len(v.vocabulary_)
+        self.idf = np.asarray(v.idf_, dtype=np.float64) if v.use_idf else None
+        self._findall = re.compile(v.token_pattern).findall
+
+        words, uni_feat, bigrams = {}, [], []
+        def word_id(w):
+            if w not in words:
+                words[w] = len(words)
+                uni_feat.append(_OOV)
+            return words[w]
+        for term, idx in v.vocabulary_.items():
+            parts = term.split(" ")
+            if len(parts) == 1:
+                uni_feat[word_id(term)] = idx
+            else:
+                bigrams.append((word_id(parts[0]), word_id(parts[1]), idx))
+
+        self.n_words = len(words)
+        self._uni_feat = np.asarray(uni_feat, dtype=np.int64)
+        keys = np.array([a * self.n_words + b for a, b, _ in bigrams], dtype=np.int64)
+        feats = np.array([f for _, _, f in bigrams], dtype=np.int64)
+        order = np.argsort(keys)
+        self._bi_keys, self._bi_feat = keys[order], feats[order]
+
+        # one dict for every token lookup: stop words map to _STOP
+        self._lookup = dict(words)
+        for w in (v.get_stop_words() or ()):
+            self._lookup[w] = _STOP
+        self._unigrams = v.ngram_range[0] == 1
+        self._bigrams = v.ngram_range[1] == 2
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        vec, _ = bundle
+        return cls(vec)
+
+    def _word_ids(self, texts):
+        get, findall, lower = self._lookup.get, self._findall, self.lowercase
+        ids, lengths = [], []
+        for doc in texts:
+            toks = [get(t, _OOV) for t in findall(doc.lower() if lower else doc)]
+            ids.extend(toks)
+            lengths.append(len(toks))
+        return np.asarray(ids, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+
+    def transform(self, texts) -> sp.csr_matrix:
+        ids, lengths = self._word_ids(texts)
+        n_docs = len(lengths)
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+        keep = ids != _STOP
+        ids, rows = ids[keep], rows[keep]
+
+        feat_parts, row_parts = [], []
+        if self._unigrams:
+            known = ids >= 0
+            f = self._uni_feat[ids[known]]
+            hit = f >= 0
+            feat_parts.append(f[hit])
+            row_parts.append(rows[known][hit])
+        if self._bigrams and len(ids) > 1 and len(self._bi_keys):
+            a, b = ids[:-1], ids[1:]
+            pair = (a >= 0) & (b >= 0) & (rows[:-1] == rows[1:])
+            keys = a[pair] * self.n_words + b[pair]
+            pos = np.searchsorted(self._bi_keys, keys)
+            pos[pos == len(self._bi_keys)] = 0
+            hit = self._bi_keys[pos] == keys
+            feat_parts.append(self._bi_feat[pos[hit]])
+            row_parts.append(rows[:-1][pair][hit])
+
+        feats = np.concatenate(feat_parts) if feat_parts else np.empty(0, dtype=np.int64)
+        doc_rows = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int64)
+        X = sp.csr_matrix((np.ones(len(feats), dtype=np.float64), (doc_rows, feats)),
+                          shape=(n_docs, self.n_features))
+        X.sum_duplicates()
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        if self.norm in ("l1", "l2"):
+            row_of = np.repeat(np.arange(n_docs), np.diff(X.indptr))
+            if self.norm == "l2":
+                norms = np.sqrt(np.bincount(row_of, weights=X.data ** 2, minlength=n_docs))
+            else:
+                norms = np.bincount(row_of, weights=np.abs(X.data), minlength=n_docs)
+            norms[norms == 0] = 1.0
+            X.data /= norms[row_of]
+        return X
+
+def featurizer_for(vectorizer):
+    """FastTfidf for supported vectorizers, otherwise the vectorizer itself (same .transform API)."""
+    try:
+        return FastTfidf(vectorizer)
+    except ValueError:
+        return vectorizer
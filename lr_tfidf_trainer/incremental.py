@@ -0,0 +1,377 @@
+# lr_tfidf_trainer/incremental.py
+"""
+Incremental (warm-start) retraining of the TF-IDF + LogReg model on newly ingested reviews.
+
+A full task.py run rebuilds the vocabulary and fits from scratch on the whole export.
+This refreshes the current model from the delta instead:
+
+  1. base       load the current bundle and its `tfidf_state.joblib` sidecar: the
+                document count, term / document frequencies of a bounded candidate
+                pool (POOL_FACTOR x max_features terms) and the recommendationid
+                watermark the model has seen (Steam ids only grow);
+  2. delta      stream the export once and keep rows with an id above the watermark
+                (or read --delta-uri); a class-balanced replay sample of older rows
+                (--replay-ratio x delta, bottom-k hashing as in sampling.py) is
+                drawn so the refit still sees the old distribution;
+  3. vocabulary count the delta's training rows with the vectorizer's analyzer, add
+                the counts to the pool and re-select min_df / max_df / max_features
+                exactly like a full fit (parallel_tfidf.fit_from_counts), so the
+                feature budget stays fixed; idf comes from the merged document
+                frequencies. As in task.py, only rows the classifier trains on are
+                counted: the step-5 holdout never shapes the features;
+  4. classifier L-BFGS on the production objective over delta + replay, started from
+                the previous coefficients (mapped onto the new vocabulary; new terms
+                start at 0) with the L2 penalty centred on them rather than on 0, so
+                weights only move as far as the new data asks;
+  5. report     20% of the delta and of the replay sample (by id hash) are held out;
+                base and refreshed model are scored on both (AUC, accuracy, negative
+                recall, log loss). The refresh fails if any AUC or negative recall
+                drops by more than --max-regression.
+
+Passing refreshes are written as a new version next to the full-training ones, so the
+app's ModelRegistry picks them up:
+
+    <output-root>/<stamp>/model.joblib.gz     (vec, clf) pipeline, same format as task.py
+    <output-root>/<stamp>/tfidf_state.joblib  state for the next refresh
+    <output-root>/<stamp>/report.json         validation report (also written on failure)
+
+    python incremental.py --base-model gs://steam-reviews-bucket-0/models/lr-tfidf/<stamp>/model.joblib.gz \
+        --data-uri gs://steam-reviews-bucket-0/steam_reviews_cleaned/ \
+        --output-root gs://steam-reviews-bucket-0/models/lr-tfidf
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import joblib
+import numpy as np
+import pyarrow.compute as pc
+from scipy.optimize import minimize
+from scipy.special import expit
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import log_loss, roc_auc_score
+from sklearn.pipeline import make_pipeline
+from sklearn.utils.class_weight import compute_class_weight
+
+from data_loader import iter_batches, steam_ids
+from fast_tfidf import featurizer_for
+from parallel_tfidf import ShardedTfidf, fit_from_counts
+from sampling import balanced_sample, stable_hash
+
+STATE_FILE = "tfidf_state.joblib"
+REPORT_FILE = "report.json"
+POOL_FACTOR = 2          # candidate terms tracked per feature in the budget
+HOLDOUT_BUCKETS = 5      # 1 in 5 rows (by id hash) is held out for the report
+
+# --- Term statistics ---
+class TfidfState:
+    """Bounded term statistics a vectorizer was fitted from, plus the id watermark."""
+
+    def __init__(self, n_docs: int, tf: dict, df: dict, watermark: int):
+        self.n_docs, self.tf, self.df, self.watermark = n_docs, tf, df, watermark
+
+    @classmethod
+    def from_vectorizer(cls, vec, n_docs: int, watermark: int, vocab_tf: dict = None) -> "TfidfState":
+        """
+        State for a fitted vectorizer. Document frequencies are recovered exactly from
+        idf_ given the training document count; without `vocab_tf` they also stand in
+        for the term frequencies that rank max_features.
+        """
+        smooth = int(vec.smooth_idf)
+        df = np.rint((n_docs + smooth) / np.exp(vec.idf_ - 1) - smooth).astype(np.int64)
+        df = {t: int(df[i]) for t, i in vec.vocabulary_.items()}
+        return cls(n_docs, dict(vocab_tf) if vocab_tf else dict(df), df, watermark)
+
+    def merge(self, n_docs: int, tf: Counter, df: Counter, watermark: int) -> "TfidfState":
+        merged_tf, merged_df = Counter(self.tf), Counter(self.df)
+        merged_tf.update(tf)
+        merged_df.update(df)
+        return TfidfState(self.n_docs + n_docs, merged_tf, merged_df, max(self.watermark, watermark))
+
+    def prune(self, pool_size: int) -> "TfidfState":
+        """Keeps the `pool_size` most frequent terms (ties broken alphabetically)."""
+        if pool_size is None or len(self.tf) <= pool_size:
+            return self
+        keep = sorted(self.tf, key=lambda t: (-self.tf[t], t))[:pool_size]
+        return TfidfState(self.n_docs, {t: self.tf[t] for t in keep}, {t: self.df[t] for t in keep}, self.watermark)
+
+    def fit(self, vec):
+        """A fitted copy of `vec` with the vocabulary and idf these statistics give."""
+        return fit_from_counts(clone(vec), self.n_docs, self.tf, self.df)
+
+    def save(self, path: str):
+        joblib.dump({"n_docs": self.n_docs, "tf": dict(self.tf), "df": dict(self.df),
+                     "watermark": self.watermark}, path, compress=3)
+
+    @classmethod
+    def load(cls, path: str) -> "TfidfState":
+        d = joblib.load(path)
+        return cls(d["n_docs"], d["tf"], d["df"], d["watermark"])
+
+# --- Data ---
+def read_delta(uri: str, watermark: int, id_col: str = "recommendationid", text_col: str = "review_text",
+               label_col: str = "review_score") -> tuple:
+    """(ids, texts, labels) of labelled rows with a Steam id above `watermark`."""
+    ids, texts, labels = [], [], []
+    for batch in iter_batches(uri, columns=[id_col, text_col, label_col]):
+        # rows without a Steam id (Kaggle history) are never new: the null comparison drops them
+        mask = pc.and_(pc.greater(steam_ids(batch.column(id_col)), watermark),
+                       pc.and_(pc.is_valid(batch.column(text_col)), pc.is_valid(batch.column(label_col))))
+        batch = batch.filter(mask)
+        ids.extend(batch.column(id_col).to_pylist())
+        texts.extend(batch.column(text_col).to_pylist())
+        labels.extend(batch.column(label_col).to_pylist())
+    return ids, texts, labels
+
+def read_replay(uri: str, watermark: int, per_class: dict, seed: int = 42, id_col: str = "recommendationid",
+                text_col: str = "review_text", label_col: str = "review_score") -> tuple:
+    """
+    Class-balanced bottom-k sample of the rows the base model was trained on: Steam ids up
+    to `watermark`, and rows without a Steam id.
+    """
+    def old_rows():
+        for batch in iter_batches(uri, columns=[id_col, text_col, label_col]):
+            ids = steam_ids(batch.column(id_col))
+            yield batch.filter(pc.or_kleene(pc.is_null(ids), pc.less_equal(ids, watermark)))
+    ids, texts, labels, _ = balanced_sample(old_rows(), per_class, seed=seed, id_col=id_col,
+                                            text_col=text_col, label_col=label_col)
+    return ids, texts, labels
+
+def split_holdout(ids: list, texts: list, labels: list, seed: int = 42) -> tuple:
+    """((texts, labels) to train on, (texts, labels) held out); the split is stable per id."""
+    held = [stable_hash(str(i), seed, b"holdout") % HOLDOUT_BUCKETS == 0 for i in ids]
+    pick = lambda keep: ([t for t, h in zip(texts, held) if h == keep], [l for l, h in zip(labels, held) if h == keep])
+    return pick(False), pick(True)
+
+# --- Classifier ---
+def map_coefficients(old_vec, old_clf, new_vec) -> np.ndarray:
+    """Previous coefficients re-indexed to `new_vec`'s vocabulary (0 for new terms)."""
+    coef = np.zeros(len(new_vec.vocabulary_))
+    old_coef = old_clf.coef_.ravel()
+    for term, j in new_vec.vocabulary_.items():
+        i = old_vec.vocabulary_.get(term)
+        if i is not None:
+            coef[j] = old_coef[i]
+    return coef
+
+def warm_fit(X, labels, coef0: np.ndarray, intercept0: float, logreg_params: dict) -> tuple:
+    """
+    Binary LogisticRegression on (X, labels) by L-BFGS from (coef0, intercept0), with the
+    production C / class_weight / tol and the L2 penalty centred on coef0. Returns (clf, info).
+    """
+    params = LogisticRegression(**logreg_params).get_params()
+    labels = np.asarray(labels)
+    classes = np.unique(labels)
+    if len(classes) != 2:
+        raise ValueError(f"warm-start refresh needs both classes in delta + replay, got {classes.tolist()}")
+    cw = compute_class_weight(params["class_weight"], classes=classes, y=labels) \
+        if params["class_weight"] is not None else np.ones(len(classes))
+    sw = cw[np.searchsorted(classes, labels)]
+    y = (labels == classes[1]).astype(np.float64)
+    sw_sum = sw.sum()
+    l2 = 1.0 / (params["C"] * sw_sum)
+    n = X.shape[1]
+
+    def loss_grad(w):
+        coef, b = w[:n], w[n]
+        z = X @ coef + b
+        g = sw * (expit(z) - y)
+        d = coef - coef0
+        loss = float(np.dot(sw, np.logaddexp(0, z) - y * z)) / sw_sum + 0.5 * l2 * float(d @ d)
+        return loss, np.append(X.T @ g / sw_sum + l2 * d, g.sum() / sw_sum)
+
+    res = minimize(loss_grad, np.append(coef0, intercept0), method="L-BFGS-B", jac=True,
+                   options={"maxiter": params["max_iter"], "maxls": 50, "gtol": params["tol"],
+                            "ftol": 64 * np.finfo(float).eps})
+    clf = LogisticRegression(**logreg_params)
+    clf.classes_ = classes
+    clf.coef_ = res.x[:n].reshape(1, -1)
+    clf.intercept_ = np.asarray([res.x[n]])
+    clf.n_iter_ = np.asarray([res.nit], dtype=np.int32)
+    clf.n_features_in_ = n
+    return clf, {"n_iter": int(res.nit), "converged": bool(res.success), "loss": float(res.fun)}
+
+# --- Report ---
+def evaluate(vec, clf, texts: list, labels: list) -> dict:
+    if not texts:
+        return {"reviews": 0}
+    p = clf.predict_proba(featurizer_for(vec).transform(texts))[:, 1]
+    y = np.asarray(labels) == clf.classes_[1]
+    pred = p >= 0.5
+    return {
+        "reviews": len(texts),
+        "auc": float(roc_auc_score(y, p)) if 0 < y.sum() < len(y) else None,
+        "accuracy": float((pred == y).mean()),
+        "neg_recall": float((~pred & ~y).sum() / max((~y).sum(), 1)),
+        "log_loss": float(log_loss(y, p, labels=[False, True])),
+    }
+
+def regressions(report: dict, max_regression: float) -> list:
+    """Metric drops of the refreshed model vs the base beyond `max_regression`."""
+    out = []
+    for split in ("delta_holdout", "replay_holdout"):
+        base, new = report["base"][split], report["refreshed"][split]
+        for metric in ("auc", "neg_recall"):
+            if base.get(metric) is not None and new.get(metric) is not None \
+                    and new[metric] < base[metric] - max_regression:
+                out.append(f"{split} {metric}: {base[metric]:.4f} → {new[metric]:.4f}")
+    return out
+
+# --- Artifacts ---
+def fetch(uri: str, dest: pathlib.Path) -> pathlib.Path:
+    """Local path of `uri` (gs:// is downloaded into `dest`); None if it does not exist."""
+    if not uri.startswith("gs://"):
+        return pathlib.Path(uri) if os.path.exists(uri) else None
+    from google.cloud import storage
+    bucket, blob = uri[len("gs://"):].split("/", 1)
+    blob = storage.Client().bucket(bucket).blob(blob)
+    if not blob.exists():
+        return None
+    local = dest / pathlib.PurePosixPath(uri).name
+    blob.download_to_filename(str(local))
+    return local
+
+def publish(local_dir: pathlib.Path, target: str):
+    """Copies every file of `local_dir` to `target` (a gs:// prefix or a local directory)."""
+    if target.startswith("gs://"):
+        from google.cloud import storage
+        bucket_name, prefix = target[len("gs://"):].split("/", 1)
+        bucket = storage.Client().bucket(bucket_name)
+        for f in sorted(local_dir.iterdir()):
+            bucket.blob(f"{prefix.rstrip('/')}/{f.name}").upload_from_filename(str(f))
+    else:
+        os.makedirs(target, exist_ok=True)
+        for f in sorted(local_dir.iterdir()):
+            shutil.copy2(f, os.path.join(target, f.name))
+
+def base_state(base_model: str, vec, workdir: pathlib.Path, base_docs: int = None, since_id: int = None) -> TfidfState:
+    sidecar = fetch(base_model.rsplit("/", 1)[0] + "/" + STATE_FILE, workdir) if "/" in base_model else None
+    if sidecar is not None:
+        return TfidfState.load(str(sidecar))
+    if base_docs is None or since_id is None:
+        raise ValueError(f"{base_model} has no {STATE_FILE}; pass --base-docs and --since-id to bootstrap one")
+    print(f"⚠️  No {STATE_FILE} next to the base model; rebuilding it from idf_ with {base_docs:,} documents")
+    return TfidfState.from_vectorizer(vec, base_docs, since_id)
+
+# --- Driver ---
+def refresh(base_model: str, data_uri: str, output_root: str, tfidf_params: dict, logreg_params: dict,
+            delta_uri: str = None, replay_ratio: float = 1.0, max_regression: float = 0.01,
+            base_docs: int = None, since_id: int = None, workers: int = None, force: bool = False,
+            seed: int = 42) -> dict:
+    timings, started = {}, time.perf_counter()
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="lr-refresh-"))
+    try:
+        # 1. base model + state
+        print(f"📥 Loading base model {base_model}...")
+        path = fetch(base_model, workdir)
+        if path is None:
+            raise FileNotFoundError(base_model)
+        old_vec, old_clf = joblib.load(path)
+        state = base_state(base_model, old_vec, workdir, base_docs, since_id)
+        print(f"Base: {len(old_vec.vocabulary_):,} features, {state.n_docs:,} docs, id watermark {state.watermark}")
+
+        # 2. delta + replay
+        t = time.perf_counter()
+        ids, texts, labels = read_delta(delta_uri or data_uri, state.watermark)
+        if not ids:
+            print("✅ No reviews newer than the watermark; nothing to refresh")
+            return {"status": "up_to_date", "watermark": state.watermark}
+        classes = sorted(set(labels) | set(old_clf.classes_.tolist()))
+        per_class = max(1, int(np.ceil(replay_ratio * len(ids) / len(classes))))
+        r_ids, r_texts, r_labels = read_replay(data_uri, state.watermark, {c: per_class for c in classes}, seed=seed)
+        timings["read_s"] = time.perf_counter() - t
+        (d_train, d_hold), (r_train, r_hold) = split_holdout(ids, texts, labels, seed), \
+            split_holdout(r_ids, r_texts, r_labels, seed)
+        print(f"Delta: {len(ids):,} reviews {dict(Counter(labels))}; replay: {len(r_ids):,} {dict(Counter(r_labels))}")
+
+        # 3. vocabulary within the feature budget
+        t = time.perf_counter()
+        featurizer = ShardedTfidf(clone(old_vec), workers=workers)
+        # training rows only: the holdout decides promotion, so it must not shape the features
+        n_new, tf, df = featurizer.count(d_train[0], clone(old_vec))
+        watermark = max(int(i) for i in ids)
+        budget = old_vec.max_features or tfidf_params.get("max_features")
+        state = state.merge(n_new, tf, df, watermark).prune(POOL_FACTOR * budget if budget else None)
+        new_vec = state.fit(old_vec)
+        added = new_vec.vocabulary_.keys() - old_vec.vocabulary_.keys()
+        removed = old_vec.vocabulary_.keys() - new_vec.vocabulary_.keys()
+        timings["vocabulary_s"] = time.perf_counter() - t
+        print(f"🔠 Vocabulary: {len(new_vec.vocabulary_):,} features (+{len(added):,} / -{len(removed):,})")
+
+        # 4. warm-started classifier on delta + replay
+        t = time.perf_counter()
+        train_texts, train_labels = d_train[0] + r_train[0], d_train[1] + r_train[1]
+        X = ShardedTfidf(new_vec, workers=workers).transform(train_texts)
+        coef0 = map_coefficients(old_vec, old_clf, new_vec)
+        clf, fit_info = warm_fit(X, train_labels, coef0, float(old_clf.intercept_[0]), logreg_params)
+        timings["fit_s"] = time.perf_counter() - t
+        print(f"📈 Warm-start fit on {X.shape[0]:,} reviews: {fit_info['n_iter']} iterations, "
+              f"converged={fit_info['converged']}")
+
+        # 5. validation report
+        stamp = dt.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        report = {
+            "version": stamp, "mode": "incremental", "base_model": base_model,
+            "delta_reviews": len(ids), "replay_reviews": len(r_ids), "train_reviews": len(train_texts),
+            "n_docs": state.n_docs, "watermark": state.watermark,
+            "features": len(new_vec.vocabulary_), "features_added": len(added), "features_removed": len(removed),
+            "coef_shift_l2": float(np.linalg.norm(clf.coef_.ravel() - coef0)),
+            "fit": fit_info,
+            "base": {"delta_holdout": evaluate(old_vec, old_clf, *d_hold),
+                     "replay_holdout": evaluate(old_vec, old_clf, *r_hold)},
+            "refreshed": {"delta_holdout": evaluate(new_vec, clf, *d_hold),
+                          "replay_holdout": evaluate(new_vec, clf, *r_hold)},
+            "max_regression": max_regression,
+        }
+        report["regressions"] = regressions(report, max_regression)
+        report["passed"] = not report["regressions"]
+        timings["total_s"] = time.perf_counter() - started
+        report["timings"] = {k: round(v, 2) for k, v in timings.items()}
+        for split in ("delta_holdout", "replay_holdout"):
+            b, n = report["base"][split], report["refreshed"][split]
+            fmt = lambda m: "n/a" if m.get("auc") is None else f"AUC {m['auc']:.4f} neg-recall {m['neg_recall']:.4f}"
+            print(f"  {split:<15} base {fmt(b)}  →  refreshed {fmt(n)}  ({n['reviews']:,} reviews)")
+
+        # 6. versioned artifact
+        out = workdir / "artifact"
+        out.mkdir()
+        (out / REPORT_FILE).write_text(json.dumps(report, indent=2))
+        target = f"{output_root.rstrip('/')}/{stamp}"
+        if report["passed"] or force:
+            joblib.dump(make_pipeline(new_vec, clf), out / "model.joblib.gz", compress=("gzip", 3))
+            state.save(str(out / STATE_FILE))
+            publish(out, target)
+            print(f"✅ Refreshed model {stamp} written to {target} in {timings['total_s']:.1f}s")
+        else:
+            publish(out, f"{output_root.rstrip('/')}/rejected-{stamp}")
+            print(f"❌ Refresh rejected: {'; '.join(report['regressions'])}")
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    from task import LOGREG_PARAMS, TFIDF_PARAMS
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--base-model", required=True, help="gs:// or local model.joblib.gz to refresh")
+    p.add_argument("--data-uri", required=True, help="Cleaned export: source of the delta and the replay sample")
+    p.add_argument("--delta-uri", help="Read the new reviews from here instead of --data-uri")
+    p.add_argument("--output-root", required=True, help="e.g. gs://<bucket>/models/lr-tfidf (a new <stamp>/ is added)")
+    p.add_argument("--replay-ratio", type=float, default=1.0, help="Replay sample size as a multiple of the delta")
+    p.add_argument("--max-regression", type=float, default=0.01, help="Allowed drop in AUC / negative recall")
+    p.add_argument("--base-docs", type=int, help="Bootstrap only: documents the base vectorizer was fitted on")
+    p.add_argument("--since-id", type=int, help="Bootstrap only: largest recommendationid the base model saw")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--force", action="store_true", help="Publish even if the validation gate fails")
+    args = p.parse_args()
+    report = refresh(args.base_model, args.data_uri, args.output_root, TFIDF_PARAMS, LOGREG_PARAMS,
+                     delta_uri=args.delta_uri, replay_ratio=args.replay_ratio, max_regression=args.max_regression,
+                     base_docs=args.base_docs, since_id=args.since_id, workers=args.workers, force=args.force)
+    raise SystemExit(0 if report.get("passed", True) or args.force else 1)
@@ -0,0 +1,52 @@
+# lr_tfidf_trainer/model_bundle.py
+"""
+Naming of the LR model bundles task.py and incremental.py publish.
+
+Versions are uploaded as
+
+    gs://<bucket>/models/lr-tfidf/<YYYYmmdd-HHMMSS>/model.joblib.gz
+
+and the stamp is the model version everywhere: the app's model registry, the
+batch scorer's prediction and drift rows, and the dashboard's drift lookups.
+Any other bundle (e.g. the checked-in best_tfidf_lr_negRecall_<stamp>.joblib.gz)
+is versioned by its file stem. The app and the batch scorer copy this file next
+to their own code, like fast_tfidf.py.
+
+fetch() caches gs:// bundles under <cache_dir>/logreg-models/<version>/. The
+download goes to a temp file that is renamed into place, so an interrupted
+download never leaves a truncated bundle for the next process to reuse.
+"""
+import os
+import pathlib
+import tempfile
+
+def version_from_path(bundle: str) -> str:
+    """`.../lr-tfidf/<stamp>/model.joblib.gz` -> `<stamp>`, any other bundle -> its file stem."""
+    path = pathlib.PurePosixPath(bundle)
+    name = path.name.split(".joblib")[0]
+    return path.parent.name if name == "model" else name
+
+def cache_path(bundle: str, cache_dir: str = None) -> pathlib.Path:
+    """Where fetch() keeps a local copy of the gs:// `bundle`."""
+    cache_dir = pathlib.Path(cache_dir or tempfile.gettempdir()) / "logreg-models"
+    return cache_dir / version_from_path(bundle) / pathlib.PurePosixPath(bundle).name
+
+def fetch(bundle: str, cache_dir: str = None) -> str:
+    """Local path of `bundle`; gs:// URIs are downloaded once and renamed into place."""
+    if not bundle.startswith("gs://"):
+        return bundle
+    local = cache_path(bundle, cache_dir)
+    if local.exists():
+        return str(local)
+    from google.cloud import storage
+    local.parent.mkdir(parents=True, exist_ok=True)
+    bucket, blob = bundle[len("gs://"):].split("/", 1)
+    fd, tmp = tempfile.mkstemp(dir=local.parent, suffix=".part")
+    os.close(fd)
+    try:
+        storage.Client().bucket(bucket).blob(blob).download_to_filename(tmp)
+        os.replace(tmp, local)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return str(local)
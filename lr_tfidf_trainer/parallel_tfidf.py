@@ -0,0 +1,166 @@
+# lr_tfidf_trainer/parallel_tfidf.py
+"""
+Sharded, multi-process TF-IDF featurization for the LR pipeline.
+
+sklearn's TfidfVectorizer tokenizes in pure Python on a single core. This module
+splits the review stream into shards, runs the vectorizer's own analyzer in
+worker processes and merges the results, so featurization scales with the cores
+of the training / scoring machine:
+
+  * fit:       workers count term and document frequencies per shard; the
+               parent merges them and applies min_df / max_df / max_features
+               exactly like sklearn, including ties at the max_features cut-off.
+  * transform: every worker holds one copy of the fitted vectorizer and returns
+               a CSR block per shard; the blocks are written into one
+               preallocated CSR matrix (a single copy, no vstack intermediates).
+
+The result is a plain fitted TfidfVectorizer, so the saved (vec, clf) bundle
+is unchanged for logreg_predict and the batch scorer.
+"""
+import os
+import itertools
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfTransformer
+
+DEFAULT_SHARD_SIZE = 20_000
+
+# --- Worker side ---
+_vec = None
+_analyzer = None
+
+def _init_worker(vectorizer):
+    global _vec, _analyzer
+    _vec = vectorizer
+    _analyzer = vectorizer.build_analyzer()
+
+def _count_shard(texts: list):
+    tf, df = Counter(), Counter()
+    for doc in texts:
+        feats = _analyzer(doc)
+        tf.update(feats)
+        df.update(set(feats))
+    return len(texts), tf, df
+
+def _transform_shard(texts: list):
+    return _vec.transform(texts)
+
+# --- Parent side ---
+def _shards(texts, shard_size: int):
+    it = iter(texts)
+    while True:
+        shard = list(itertools.islice(it, shard_size))
+        if not shard:
+            return
+        yield shard
+
+def imap_bounded(pool, fn, iterable, max_in_flight: int):
+    """Ordered pool.map that only keeps `max_in_flight` tasks queued, so input is read lazily."""
+    in_flight = deque()
+    for item in iterable:
+        in_flight.append(pool.submit(fn, item))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def stack_csr(blocks: list, n_features: int) -> sp.csr_matrix:
+    """Row-stacks CSR blocks into one preallocated CSR matrix."""
+    n_rows = sum(b.shape[0] for b in blocks)
+    nnz = sum(b.nnz for b in blocks)
+    index_dtype = np.int32 if max(nnz, n_features) < np.iinfo(np.int32).max else np.int64
+    data = np.empty(nnz, dtype=blocks[0].dtype if blocks else np.float64)
+    indices = np.empty(nnz, dtype=index_dtype)
+    indptr = np.empty(n_rows + 1, dtype=index_dtype)
+    indptr[0] = 0
+    row, pos = 0, 0
+    for b in blocks:
+        rows, k = b.shape[0], b.nnz
+        data[pos:pos + k] = b.data
+        indices[pos:pos + k] = b.indices
+        indptr[row + 1:row + rows + 1] = b.indptr[1:] + pos
+        row, pos = row + rows, pos + k
+    return sp.csr_matrix((data, indices, indptr), shape=(n_rows, n_features), copy=False)
+
+def fit_from_counts(vec, n_docs: int, tf: Counter, df: Counter):
+    """
+    Fits `vec` in place from merged term / document frequencies, applying min_df, max_df
+    and max_features exactly like sklearn: terms are ranked on the alphabetically sorted
+    vocabulary with the same (unstable) argsort, so ties at the max_features cut-off
+    resolve identically.
+    """
+    max_df = vec.max_df if isinstance(vec.max_df, int) else vec.max_df * n_docs
+    min_df = vec.min_df if isinstance(vec.min_df, int) else vec.min_df * n_docs
+    if max_df < min_df:
+        raise ValueError("max_df corresponds to < documents than min_df")
+    terms = sorted(t for t, d in df.items() if min_df <= d <= max_df)
+    if vec.max_features is not None and len(terms) > vec.max_features:
+        freq = df if vec.binary else tf  # sklearn ranks the binarized counts when binary=True
+        counts = np.fromiter((freq[t] for t in terms), dtype=np.int64, count=len(terms))
+        keep = np.sort((-counts).argsort()[:vec.max_features])
+        terms = [terms[i] for i in keep]
+    if not terms:
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+
+    vec.vocabulary_ = {t: i for i, t in enumerate(terms)}
+    vec.fixed_vocabulary_ = False
+    if vec.use_idf:
+        doc_freq = np.fromiter((df[t] for t in terms), dtype=np.float64, count=len(terms))
+        smooth = int(vec.smooth_idf)
+        vec.idf_ = np.log((n_docs + smooth) / (doc_freq + smooth)) + 1
+    else:
+        # TfidfVectorizer.transform always goes through its fitted TfidfTransformer
+        vec._tfidf = TfidfTransformer(norm=vec.norm, use_idf=False, smooth_idf=vec.smooth_idf,
+                                      sublinear_tf=vec.sublinear_tf).fit(sp.csr_matrix((1, len(terms))))
+    return vec
+
+class ShardedTfidf:
+    """
+    Wraps an (unfitted or fitted) TfidfVectorizer and runs fit / transform across
+    `workers` processes. `self.vectorizer_` is the fitted sklearn vectorizer.
+    """
+
+    def __init__(self, vectorizer, workers: int = None, shard_size: int = DEFAULT_SHARD_SIZE):
+        self.vectorizer = vectorizer
+        self.workers = workers or os.cpu_count()
+        self.shard_size = shard_size
+        if hasattr(vectorizer, "vocabulary_"):
+            self.vectorizer_ = vectorizer
+
+    def _pool(self, vectorizer):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(vectorizer,))
+
+    def count(self, texts, vectorizer=None) -> tuple:
+        """(n_docs, term frequencies, document frequencies) of `texts` under the vectorizer's analyzer."""
+        vec = vectorizer if vectorizer is not None else clone(self.vectorizer)
+        n_docs, tf, df = 0, Counter(), Counter()
+        with self._pool(vec) as pool:
+            for n, shard_tf, shard_df in imap_bounded(pool, _count_shard, _shards(texts, self.shard_size), 2 * self.workers):
+                n_docs += n
+                tf.update(shard_tf)
+                df.update(shard_df)
+        return n_docs, tf, df
+
+    def fit(self, texts):
+        vec = clone(self.vectorizer)
+        n_docs, tf, df = self.count(texts, vec)
+        self.vectorizer_ = fit_from_counts(vec, n_docs, tf, df)
+        # kept for the incremental-training state (incremental.TfidfState)
+        self.n_docs_ = n_docs
+        self.vocab_tf_ = {t: tf[t] for t in self.vectorizer_.vocabulary_}
+        return self
+
+    def transform(self, texts) -> sp.csr_matrix:
+        vec = self.vectorizer_
+        with self._pool(vec) as pool:
+            blocks = list(imap_bounded(pool, _transform_shard, _shards(texts, self.shard_size), 2 * self.workers))
+        return stack_csr(blocks, len(vec.vocabulary_))
+
+    def fit_transform(self, texts) -> sp.csr_matrix:
+        # both passes need the texts, so materialise iterators once
+        texts = texts if hasattr(texts, "__len__") else list(texts)
+        return self.fit(texts).transform(texts)
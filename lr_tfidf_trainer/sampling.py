@@ -0,0 +1,119 @@
+# lr_tfidf_trainer/sampling.py
+"""
+Streaming, deterministic class balancing for the training set.
+
+The notebook recipe (split into pos/neg frames, resample, concat, sample(frac=1))
+holds several full copies of the review text. Here the export is streamed once in
+Arrow batches and each class is down-sampled with bottom-k hashing: every row gets
+a keyed hash of its recommendationid, and per class only the k rows with the
+smallest hashes are kept (a fixed-size heap), with k = size of the smallest class.
+Only rows that make the cut are decoded to Python strings, so at most one copy
+of the training text is held. Rows without a recommendationid or text are skipped
+(cleaned_for_model_training guarantees both).
+
+Because the hash is keyed on (seed, recommendationid), the sample is the same for
+a given seed no matter how the export is sharded or ordered, and the final shuffle
+(ordering by a second hash) is deterministic as well.
+
+Exports collapsed by dedup.py carry a `weight` column (how many near-duplicate
+reviews a row represents). For those, classes are balanced on representatives and
+the kept weights are rescaled to a mean of 1 per class, so duplicates still count
+within a class while the classes stay balanced; `source_counts` are the weighted
+(original) label counts.
+"""
+import hashlib
+import heapq
+from collections import Counter
+
+import numpy as np
+
+from data_loader import column_names, iter_batches
+
+def stable_hash(key: str, seed: int, salt: bytes = b"sample") -> int:
+    """64-bit keyed hash, stable across processes and Python versions (unlike hash())."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8,
+                             key=seed.to_bytes(8, "little", signed=True), salt=salt[:16])
+    return int.from_bytes(digest.digest(), "little")
+
+def class_counts(uri: str, label_col: str = "review_score", weight_col: str = None) -> tuple:
+    """
+    Row and weighted label counts from a pass that decodes only the (tiny) label and
+    weight columns. Without `weight_col` both counters are the same.
+    """
+    rows, weighted = Counter(), Counter()
+    columns = [label_col] + ([weight_col] if weight_col else [])
+    for batch in iter_batches(uri, columns=columns):
+        labels = batch.column(label_col).to_pylist()
+        weights = batch.column(weight_col).to_pylist() if weight_col else [1] * len(labels)
+        for label, w in zip(labels, weights):
+            if label is not None:
+                rows[label] += 1
+                weighted[label] += w if w is not None else 1
+    return rows, weighted
+
+class BalancedSample:
+    """Balanced, shuffled training rows as parallel lists (ids, texts, labels), plus optional sample weights."""
+
+    def __init__(self, ids: list, texts: list, labels: list, counts: Counter, weights: np.ndarray = None):
+        self.ids, self.texts, self.labels = ids, texts, labels
+        self.source_counts = counts
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.texts)
+
+def balanced_sample(batches, per_class: dict, seed: int = 42, id_col: str = "recommendationid",
+                    text_col: str = "review_text", label_col: str = "review_score", weight_col: str = None) -> tuple:
+    """
+    One pass over Arrow `batches`, keeping for every label the `per_class[label]` rows with
+    the smallest keyed hash of their id. Returns shuffled (ids, texts, labels, weights);
+    weights is None without `weight_col`.
+    """
+    heaps = {label: [] for label in per_class}   # max-heaps of (-hash, id, text, weight)
+    for batch in batches:
+        ids = batch.column(id_col).to_pylist()
+        labels = batch.column(label_col).to_pylist()
+        weights = batch.column(weight_col).to_pylist() if weight_col else [1] * len(ids)
+        texts = batch.column(text_col)
+        valid = texts.is_valid().to_pylist()
+        for i, (rid, label) in enumerate(zip(ids, labels)):
+            heap = heaps.get(label)
+            if heap is None or not valid[i] or rid is None:
+                continue
+            h = -stable_hash(str(rid), seed)
+            if len(heap) < per_class[label]:
+                # text is only decoded for rows that (for now) make the cut
+                heapq.heappush(heap, (h, rid, texts[i].as_py(), weights[i] or 1))
+            elif heap and h > heap[0][0]:
+                heapq.heapreplace(heap, (h, rid, texts[i].as_py(), weights[i] or 1))
+
+    rows = [(stable_hash(str(rid), seed, b"shuffle"), rid, text, label, w)
+            for label, heap in heaps.items() for _, rid, text, w in heap]
+    heaps.clear()
+    rows.sort(key=lambda r: r[0])
+    weights = np.asarray([r[4] for r in rows], dtype=np.float64) if weight_col else None
+    return [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows], weights
+
+def load_balanced(uri: str, seed: int = 42, label_col: str = "review_score", text_col: str = "review_text",
+                  id_col: str = "recommendationid", weight_col: str = "weight") -> BalancedSample:
+    """
+    Down-samples every class of the export at `uri` to the size of the smallest one.
+    `weight_col` is used when the export has it (dedup.py output).
+    """
+    if weight_col not in column_names(uri):
+        weight_col = None
+    rows, counts = class_counts(uri, label_col, weight_col)
+    if not rows:
+        raise ValueError(f"No labelled rows found in {uri}")
+    k = min(rows.values())
+    columns = [id_col, text_col, label_col] + ([weight_col] if weight_col else [])
+    ids, texts, labels, weights = balanced_sample(
+        iter_batches(uri, columns=columns), {label: k for label in rows}, seed=seed,
+        id_col=id_col, text_col=text_col, label_col=label_col, weight_col=weight_col,
+    )
+    if weights is not None:
+        y = np.asarray(labels)
+        for label in rows:
+            mask = y == label
+            weights[mask] *= mask.sum() / weights[mask].sum()
+    return BalancedSample(ids, texts, labels, counts, weights)
@@ -1,4 +1,69 @@
-# --- Your task.py file, in the train_production_model function ---
+# lr_tfidf_trainer/task.py
+"""
+Vertex AI custom-training entrypoint for the production TF-IDF + LogReg model.
+
+Hyper-parameters are the RandomizedSearchCV winners from `Notebooks/05 Log Reg.ipynb`
+(max negative recall). The fitted pipeline is gzipped and uploaded to
+gs://<bucket>/models/lr-tfidf/<stamp>/model.joblib.gz.
+"""
+import argparse
+import datetime as dt
+import gzip
+import os
+import shutil
+
+import joblib
+import numpy as np
+from google.cloud import storage
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+from data_loader import max_id
+from distributed_lr import train_distributed
+from incremental import STATE_FILE, TfidfState
+from parallel_tfidf import ShardedTfidf
+from sampling import load_balanced
+
+TFIDF_PARAMS = dict(lowercase=True, stop_words="english", ngram_range=(1, 2), max_features=93_969)
+LOGREG_PARAMS = dict(C=2.464598838968805, max_iter=1000, n_jobs=-1, solver="lbfgs", class_weight="balanced")
+
+def train_production_model(project_id: str, bucket_name: str, data_uri: str, workers: int = None,
+                           distributed: bool = False):
+    # 1-2. Stream the cleaned export (expects 'recommendationid', 'review_text' & 'review_score'),
+    #      down-sampling every class to the minority size and shuffling in the same pass
+    print(f"📥 Loading balanced training data from {data_uri}...")
+    sample = load_balanced(data_uri, seed=42)
+    print(f"Source class counts: {dict(sample.source_counts)}")
+    print(f"Balanced training set: {len(sample):,} reviews ({len(sample) // len(sample.source_counts):,} per class).")
+    # id watermark for incremental.py, read before the fit so a bad export fails fast
+    watermark = max_id(data_uri)
+    if sample.weights is not None:
+        # dedup.py output: each row stands for `weight` near-duplicate reviews
+        print(f"Near-duplicate weights: {sample.weights.min():.2f}-{sample.weights.max():.2f} (mean 1 per class)")
+
+    # 3. Featurize across all cores, then fit the classifier
+    if distributed:
+        # data-parallel: partitions stay on the workers, gradients are allreduced (distributed_lr.py)
+        print("🔀 Distributed training on a local worker cluster...")
+        vec, clf, info = train_distributed(sample.texts, sample.labels, TFIDF_PARAMS, LOGREG_PARAMS, workers=workers,
+                                           sample_weight=sample.weights)
+        print(f"Stage times: tfidf fit {info['tfidf_fit_s']:.1f}s, featurize {info['featurize_s']:.1f}s, "
+              f"optimize {info['optimize_s']:.1f}s")
+        n_docs, vocab_tf = info["n_docs"], info["vocab_tf"]
+    else:
+        featurizer = ShardedTfidf(TfidfVectorizer(**TFIDF_PARAMS), workers=workers)
+        print(f"🔠 Fitting TF-IDF on {featurizer.workers} worker processes...")
+        X = featurizer.fit_transform(sample.texts)
+        print(f"TF-IDF matrix: {X.shape[0]:,} x {X.shape[1]:,}, nnz={X.nnz:,}")
+
+        print("📈 Fitting LogisticRegression...")
+        vec, clf = featurizer.vectorizer_, LogisticRegression(**LOGREG_PARAMS).fit(
+            X, np.asarray(sample.labels), sample_weight=sample.weights)
+        n_docs, vocab_tf = featurizer.n_docs_, featurizer.vocab_tf_
+    prod_pipe = make_pipeline(vec, clf)
+    # term statistics + id watermark, so incremental.py can refresh this model from new reviews only
+    TfidfState.from_vectorizer(vec, n_docs, watermark, vocab_tf).save(STATE_FILE)
 
     # 4. Save and Upload Model to GCS
     print("\n💾 Saving and uploading model...")
@@ -46,9 +111,25 @@
         blob.upload_from_filename(gzipped_local_file_name) # Ensure this uses the gzipped file name
         
         print(f"✅ Model uploaded to: gs://{bucket_name}/{storage_path}")
+        bucket.blob(f"{model_directory}/{STATE_FILE}").upload_from_filename(STATE_FILE)
+        print(f"✅ TF-IDF state uploaded to: gs://{bucket_name}/{model_directory}/{STATE_FILE}")
     except Exception as e:
         # --- CRITICAL: This will print the actual error type and message! ---
         print(f"\nFATAL ERROR: Failed to upload model to GCS.")
         print(f"Exception Type: {type(e).__name__}")
         print(f"Exception Message: {e}")
-        raise # Re-raise the exception to ensure the job fails clearly
\ No newline at end of file
+        raise # Re-raise the exception to ensure the job fails clearly
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--project-id", required=True)
+    p.add_argument("--bucket-name", required=True)
+    p.add_argument("--data-uri", required=True,
+                   help="gs:// or local Parquet shard directory (or legacy CSV) of the cleaned training data; "
+                        "a dedup.py representatives/ directory trains with its weights")
+    p.add_argument("--workers", type=int, default=None, help="TF-IDF worker processes (default: all cores)")
+    p.add_argument("--distributed", action="store_true",
+                   help="Partition the corpus across the workers for featurization and gradient computation")
+    args = p.parse_args()
+    train_production_model(args.project_id, args.bucket_name, args.data_uri, workers=args.workers,
+                           distributed=args.distributed)
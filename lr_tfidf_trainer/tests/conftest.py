@@ -0,0 +1,36 @@
+# lr_tfidf_trainer/tests/conftest.py
+# the trainer modules are flat scripts; import them the way task.py does, from their directory
+import glob
+import json
+import pathlib
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "lr_tfidf_trainer"))
+
+@pytest.fixture(scope="session")
+def reviews() -> pd.DataFrame:
+    """The checked-in sample reviews in the shape of cleaned_for_model_training."""
+    rows = [json.loads(line) for path in sorted(glob.glob(str(ROOT / "reviews_data" / "*" / "*.jsonl")))
+            for line in open(path, encoding="utf-8")]
+    return pd.DataFrame({"recommendationid": [str(r["recommendationid"]) for r in rows],
+                         "review_text": [r["review"] for r in rows],
+                         "review_score": [int(r["voted_up"]) for r in rows]})
+
+@pytest.fixture
+def write_export(tmp_path):
+    """Writes a frame as an EXPORT DATA-style directory of Parquet shards; returns its path."""
+    def write(frame: pd.DataFrame, shards: int = 3, name: str = "export") -> str:
+        out = tmp_path / name
+        out.mkdir()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        step = -(-len(frame) // shards)
+        for i in range(shards):
+            pq.write_table(table.slice(i * step, step), out / f"part-{i:05d}.parquet", compression="snappy")
+        return str(out)
+    return write
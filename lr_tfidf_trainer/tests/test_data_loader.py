@@ -0,0 +1,40 @@
+# lr_tfidf_trainer/tests/test_data_loader.py
+"""Sharded Parquet exports and legacy CSVs load to the same rows."""
+import pandas as pd
+import pyarrow as pa
+
+from data_loader import TRAINING_COLUMNS, column_names, iter_batches, load_frame, max_id, steam_ids
+
+def test_parquet_shards_load_like_the_frame(reviews, write_export):
+    uri = write_export(reviews.assign(extra=1), shards=4)
+    assert column_names(uri) == TRAINING_COLUMNS + ["extra"]
+    frame = load_frame(uri).sort_values("recommendationid", ignore_index=True)
+    expected = reviews.sort_values("recommendationid", ignore_index=True)
+    pd.testing.assert_frame_equal(frame, expected)
+
+def test_batches_are_column_pruned_and_complete(reviews, write_export):
+    uri = write_export(reviews, shards=3)
+    batches = list(iter_batches(uri, columns=["review_score"], batch_size=100))
+    assert all(b.schema.names == ["review_score"] and b.num_rows <= 100 for b in batches)
+    assert sum(b.num_rows for b in batches) == len(reviews)
+
+def test_max_id_is_numeric(reviews, write_export):
+    frame = pd.DataFrame({"recommendationid": ["9", "100", "23"], "review_text": "x", "review_score": 1})
+    assert max_id(write_export(frame, shards=2)) == 100
+    assert max_id(write_export(reviews, name="sample")) == max(map(int, reviews["recommendationid"]))
+
+def test_max_id_skips_ids_that_are_not_steam_ids(write_export):
+    # stg_kaggle_historical rows carry an MD5 of their text as recommendationid
+    frame = pd.DataFrame({"recommendationid": ["9", "5d41402abc4b2a76b9719d911017c592", "23", None],
+                          "review_text": "x", "review_score": 1})
+    assert max_id(write_export(frame, shards=2)) == 23
+    ids = pa.array(["12", "1e5", "-3", "99999999999999999999", "7"])
+    assert steam_ids(ids).to_pylist() == [12, None, None, None, 7]
+    assert steam_ids(pa.array([4, 2], pa.int32())).to_pylist() == [4, 2]
+
+def test_legacy_csv_is_still_accepted(reviews, tmp_path):
+    uri = str(tmp_path / "steam_reviews_cleaned.csv.gz")
+    reviews.to_csv(uri, index=False)
+    assert column_names(uri) == TRAINING_COLUMNS
+    assert sum(b.num_rows for b in iter_batches(uri, batch_size=250)) == len(reviews)
+    assert load_frame(uri, ["review_score"])["review_score"].sum() == reviews["review_score"].sum()
@@ -0,0 +1,65 @@
+# lr_tfidf_trainer/tests/test_dedup.py
+"""MinHash/LSH collapses near-duplicate reviews per label and weights the representatives."""
+import pathlib
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dedup import MinHasher, deduplicate
+from sampling import load_balanced
+
+BASE = ("the matchmaking in this game is completely broken and every single ranked match puts me "
+        "against players far above my level while my teammates leave after the first fight and the "
+        "servers lag so badly that half of my shots never register even though the hit marker shows up "
+        "on my screen every time")
+
+def test_signature_agreement_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    words = [f"w{i}" for i in range(200)]
+    for overlap in (200, 150, 100, 50):
+        a, b = " ".join(words[:100]), " ".join(words[100 - overlap // 2:200 - overlap // 2])
+        sig = hasher.signatures([a, b])
+        sh_a = {tuple(words[i:i + 3]) for i in range(98)}
+        sh_b = {tuple(words[100 - overlap // 2 + i:100 - overlap // 2 + i + 3]) for i in range(98)}
+        jaccard = len(sh_a & sh_b) / len(sh_a | sh_b)
+        assert (sig[0] == sig[1]).mean() == pytest.approx(jaccard, abs=0.1)
+
+def test_near_duplicates_collapse_and_weights_add_up():
+    texts = [BASE, BASE.upper() + "!!!", BASE.replace("single", "one"), "Great game, love it.",
+             "great game love it", "Crashes on startup.", BASE]
+    labels = [0, 0, 0, 1, 1, 0, 1]
+    out = deduplicate(texts, labels)
+    # case, punctuation and a one-word edit are near-duplicates; the same text with another label is not
+    assert out["representative"].tolist() == [0, 0, 0, 3, 3, 5, 6]
+    assert out["rows"].tolist() == [0, 3, 5, 6] and out["weights"].tolist() == [3, 2, 1, 1]
+    stats = out["stats"]
+    assert stats["rows_in"] == 7 and stats["rows_out"] == 4
+    assert stats["labels_in"] == {"0": 4, "1": 3} and stats["labels_out"] == {"0": 2, "1": 2}
+
+def test_result_does_not_depend_on_batching(reviews):
+    texts, labels = reviews["review_text"].fillna("").tolist(), reviews["review_score"].to_numpy()
+    whole = deduplicate(texts, labels)
+    batched = deduplicate(texts, labels, batch_docs=37)
+    assert (whole["representative"] == batched["representative"]).all()
+    # every representative stands for rows of its own label only
+    rep = whole["representative"]
+    assert (labels[rep] == labels).all()
+    assert whole["weights"].sum() == len(texts)
+
+def test_cli_output_trains_with_weights(reviews, write_export, tmp_path):
+    frame = pd.concat([reviews, reviews.head(100).assign(recommendationid=lambda f: f["recommendationid"] + "0")])
+    out = tmp_path / "dedup"
+    subprocess.run([sys.executable, "dedup.py", "--input", write_export(frame), "--output", str(out)],
+                   cwd=pathlib.Path(__file__).resolve().parent.parent, check=True, capture_output=True)
+
+    reps = pd.read_parquet(out / "representatives")
+    clusters = pd.read_parquet(out / "clusters")
+    assert reps["weight"].sum() == len(frame) == len(clusters)
+    assert len(reps) <= len(reviews)
+    assert set(clusters["representative_id"]) == set(reps["recommendationid"])
+    sample = load_balanced(str(out / "representatives"))
+    assert sample.weights is not None
+    assert sample.source_counts == dict(frame["review_score"].value_counts())
@@ -0,0 +1,59 @@
+# lr_tfidf_trainer/tests/test_distributed_lr.py
+"""Distributed training must reach the model LogisticRegression.fit finds on the same features."""
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from distributed_lr import partition, train_distributed
+from task import LOGREG_PARAMS, TFIDF_PARAMS
+
+# the production objective, single-threaded and tightly converged so both optimisers land on the same optimum
+LOGREG = dict(LOGREG_PARAMS, n_jobs=None, tol=1e-8, max_iter=5000)
+
+def reference(texts, labels, logreg: dict, sample_weight=None):
+    vec = TfidfVectorizer(**TFIDF_PARAMS).fit(texts)
+    clf = LogisticRegression(**logreg).fit(vec.transform(texts), labels, sample_weight=sample_weight)
+    return vec, clf
+
+def assert_same_model(got, expected, texts):
+    (vec, clf), (ref_vec, ref_clf) = got, expected
+    assert vec.vocabulary_ == ref_vec.vocabulary_
+    np.testing.assert_allclose(vec.idf_, ref_vec.idf_, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(clf.coef_, ref_clf.coef_, rtol=0, atol=1e-3 * np.abs(ref_clf.coef_).max())
+    np.testing.assert_allclose(clf.intercept_, ref_clf.intercept_, rtol=0, atol=1e-3)
+    X = vec.transform(texts)
+    np.testing.assert_allclose(clf.predict_proba(X), ref_clf.predict_proba(X), rtol=0, atol=1e-4)
+    assert (clf.predict(X) == ref_clf.predict(X)).all()
+
+@pytest.fixture(scope="module")
+def corpus(reviews):
+    return reviews["review_text"].fillna("").tolist(), reviews["review_score"].to_numpy()
+
+def test_matches_sklearn(corpus):
+    texts, labels = corpus
+    vec, clf, info = train_distributed(texts, labels, TFIDF_PARAMS, LOGREG, workers=3, verbose=False)
+    assert info["converged"] and info["n_docs"] == len(texts)
+    assert_same_model((vec, clf), reference(texts, labels, LOGREG), texts)
+
+def test_sample_and_class_weights_match_sklearn(corpus):
+    texts, labels = corpus
+    weights = np.random.default_rng(0).uniform(0.5, 3, len(texts))
+    logreg = dict(LOGREG, class_weight={0: 2.0, 1: 0.5})
+    vec, clf, _ = train_distributed(texts, labels, TFIDF_PARAMS, logreg, workers=2, verbose=False,
+                                    sample_weight=weights)
+    assert_same_model((vec, clf), reference(texts, labels, logreg, weights), texts)
+
+def test_partitions_cover_the_corpus():
+    parts = partition([str(i) for i in range(10)], np.arange(10), 3, sample_weight=np.ones(10))
+    assert [len(p[0]) for p in parts] == [3, 3, 4]
+    assert sum((p[0] for p in parts), []) == [str(i) for i in range(10)]
+    assert np.concatenate([p[1] for p in parts]).tolist() == list(range(10))
+
+def test_unsupported_models_are_rejected(corpus):
+    texts, labels = corpus
+    with pytest.raises(ValueError, match="binary"):
+        train_distributed(texts[:6], [0, 1, 2, 0, 1, 2], TFIDF_PARAMS, LOGREG, workers=1, verbose=False)
+    with pytest.raises(ValueError, match="L2"):
+        train_distributed(texts, labels, TFIDF_PARAMS, dict(LOGREG, l1_ratio=1.0, solver="saga"),
+                          workers=1, verbose=False)
@@ -0,0 +1,96 @@
+# lr_tfidf_trainer/tests/test_fast_tfidf.py
+"""FastTfidf must reproduce TfidfVectorizer.transform exactly for the configurations we train."""
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from fast_tfidf import FastTfidf, featurizer_for
+
+CORPUS = [
+    "Great game, great friends. GREAT fun!",
+    "Crashes every five minutes; refunded.",
+    "The servers are down again and again and again",
+    "Not worth the money, not worth the time",
+    "10/10 would crash again",
+    "Fun with friends, but the servers keep dropping.",
+    "Good game",
+    "good   game",
+    "A great, great game",
+    "",
+    "x y z",                                  # single characters: dropped by the token pattern
+    "Café crème is the best — naïve players love it",
+]
+# unseen words between known ones, stop words splitting bigrams, empty and repeated docs
+UNSEEN = [
+    "great totally-unseen game",
+    "the the the",
+    "servers zzz are down",
+    "",
+    "game game game great",
+    "Worth the money after all",
+]
+
+CONFIGS = {
+    "unigrams":         dict(),
+    "bigrams":          dict(ngram_range=(1, 2)),
+    "bigrams_only":     dict(ngram_range=(2, 2)),
+    "stop_words":       dict(ngram_range=(1, 2), stop_words="english"),
+    "min_df_int":       dict(ngram_range=(1, 2), min_df=2),
+    "min_df_float":     dict(ngram_range=(1, 2), min_df=0.2),
+    "max_df_float":     dict(ngram_range=(1, 2), max_df=0.3),
+    "max_df_int":       dict(ngram_range=(1, 2), max_df=2),
+    "max_features":     dict(ngram_range=(1, 2), max_features=15),
+    "production":       dict(ngram_range=(1, 2), min_df=2, max_df=0.9, max_features=40, stop_words="english"),
+    "case_sensitive":   dict(ngram_range=(1, 2), lowercase=False),
+    "no_idf_l1":        dict(ngram_range=(1, 2), use_idf=False, norm="l1"),
+    "raw_idf":          dict(ngram_range=(1, 2), smooth_idf=False, norm=None),
+}
+
+@pytest.fixture(params=sorted(CONFIGS), ids=sorted(CONFIGS))
+def fitted(request):
+    return TfidfVectorizer(**CONFIGS[request.param]).fit(CORPUS)
+
+def assert_same_matrix(expected, got):
+    expected, got = expected.tocsr(), got.tocsr()
+    expected.sort_indices()
+    got.sort_indices()
+    assert got.shape == expected.shape
+    np.testing.assert_array_equal(got.indptr, expected.indptr)
+    np.testing.assert_array_equal(got.indices, expected.indices)
+    np.testing.assert_allclose(got.data, expected.data, rtol=0, atol=1e-12)
+
+def test_idf_and_feature_space_match(fitted):
+    fast = FastTfidf(fitted)
+    assert fast.n_features == len(fitted.vocabulary_)
+    if fitted.use_idf:
+        np.testing.assert_array_equal(fast.idf, fitted.idf_)
+    else:
+        assert fast.idf is None
+
+def test_every_vocabulary_term_maps_to_its_feature(fitted):
+    fast = FastTfidf(fitted)
+    terms = sorted(fitted.vocabulary_)
+    X = fast.transform(terms)
+    for row, term in enumerate(terms):
+        assert fitted.vocabulary_[term] in X[row].indices, term
+
+@pytest.mark.parametrize("texts", [CORPUS, UNSEEN, CORPUS[:1]], ids=["corpus", "unseen", "single"])
+def test_transform_matches_sklearn(fitted, texts):
+    assert_same_matrix(fitted.transform(texts), FastTfidf(fitted).transform(texts))
+
+def test_empty_batch(fitted):
+    # sklearn refuses an empty batch; the featurizer just returns no rows
+    assert FastTfidf(fitted).transform([]).shape == (0, len(fitted.vocabulary_))
+
+def test_single_review_path_matches_batch(fitted):
+    fast = FastTfidf(fitted)
+    batch = fast.transform(CORPUS)
+    for i, text in enumerate(CORPUS):
+        assert_same_matrix(batch[i], fast.transform([text]))
+
+def test_unsupported_configuration_falls_back_to_the_vectorizer():
+    vec = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 3)).fit(CORPUS)
+    with pytest.raises(ValueError):
+        FastTfidf(vec)
+    assert featurizer_for(vec) is vec
+    assert isinstance(featurizer_for(TfidfVectorizer().fit(CORPUS)), FastTfidf)
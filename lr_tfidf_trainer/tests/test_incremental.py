@@ -0,0 +1,134 @@
+# lr_tfidf_trainer/tests/test_incremental.py
+"""Warm-start refreshes: merged term statistics fit like a full pass, coefficients follow their terms."""
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+from incremental import (STATE_FILE, TfidfState, map_coefficients, read_delta, read_replay, refresh, split_holdout,
+                         warm_fit)
+from parallel_tfidf import ShardedTfidf
+from test_fast_tfidf import CORPUS
+
+TFIDF = dict(stop_words="english", ngram_range=(1, 2), max_features=300)
+LOGREG = dict(C=2.464598838968805, max_iter=1000, class_weight="balanced")
+
+def counts(texts, params):
+    return ShardedTfidf(TfidfVectorizer(**params), workers=1).count(texts)
+
+@pytest.mark.parametrize("params", [dict(ngram_range=(1, 2)), dict(ngram_range=(1, 2), min_df=2, max_df=0.5),
+                                    dict(ngram_range=(1, 2), max_features=7)], ids=["all", "min_max_df", "max_features"])
+def test_merged_state_fits_like_the_whole_corpus(params):
+    old, new = CORPUS[:7], CORPUS[7:]
+    state = TfidfState(*counts(old, params), watermark=10).merge(*counts(new, params), watermark=20)
+    vec = state.fit(TfidfVectorizer(**params))
+    expected = TfidfVectorizer(**params).fit(CORPUS)
+    assert state.n_docs == len(CORPUS) and state.watermark == 20
+    assert vec.vocabulary_ == expected.vocabulary_
+    np.testing.assert_allclose(vec.idf_, expected.idf_, rtol=0, atol=1e-12)
+
+def test_state_recovered_from_a_fitted_vectorizer():
+    vec = TfidfVectorizer(ngram_range=(1, 2)).fit(CORPUS)
+    _, _, df = counts(CORPUS, dict(ngram_range=(1, 2)))
+    state = TfidfState.from_vectorizer(vec, len(CORPUS), watermark=5)
+    assert state.df == {t: df[t] for t in vec.vocabulary_}
+    assert state.tf == state.df  # without vocab_tf, document frequencies rank max_features
+
+def test_prune_keeps_the_most_frequent_terms():
+    state = TfidfState(3, {"b": 2, "a": 2, "c": 5, "d": 1}, {"b": 1, "a": 2, "c": 3, "d": 1}, 7).prune(2)
+    assert state.tf == {"c": 5, "a": 2} and state.df == {"c": 3, "a": 2}
+    assert (state.n_docs, state.watermark) == (3, 7)
+    assert TfidfState(1, {"a": 1}, {"a": 1}, 0).prune(None).tf == {"a": 1}
+
+def test_save_and_load(tmp_path):
+    state = TfidfState(*counts(CORPUS, TFIDF), watermark=123)
+    state.save(str(tmp_path / STATE_FILE))
+    loaded = TfidfState.load(str(tmp_path / STATE_FILE))
+    assert (loaded.n_docs, loaded.tf, loaded.df, loaded.watermark) == (state.n_docs, dict(state.tf),
+                                                                       dict(state.df), 123)
+
+def test_coefficients_follow_their_terms():
+    old_vec = TfidfVectorizer().fit(["alpha beta gamma"])
+    new_vec = TfidfVectorizer().fit(["beta gamma delta"])
+    old_clf = LogisticRegression()
+    old_clf.coef_ = np.array([[1.0, 2.0, 3.0]])  # alpha, beta, gamma
+    np.testing.assert_array_equal(map_coefficients(old_vec, old_clf, new_vec), [2.0, 0.0, 3.0])  # beta, delta, gamma
+
+def test_warm_fit_from_zero_is_the_production_objective(reviews):
+    X = TfidfVectorizer(**TFIDF).fit_transform(reviews.review_text)
+    y = reviews.review_score.to_numpy()
+    params = dict(LOGREG, tol=1e-8, max_iter=5000)
+    expected = LogisticRegression(**params).fit(X, y)
+    clf, info = warm_fit(X, y, np.zeros(X.shape[1]), 0.0, params)
+    assert info["converged"]
+    np.testing.assert_allclose(clf.coef_, expected.coef_, atol=1e-4)
+    np.testing.assert_allclose(clf.predict_proba(X), expected.predict_proba(X), atol=1e-5)
+
+def test_warm_fit_needs_both_classes():
+    with pytest.raises(ValueError, match="both classes"):
+        warm_fit(np.eye(2), [1, 1], np.zeros(2), 0.0, LOGREG)
+
+def test_rows_without_a_steam_id_are_history(write_export):
+    # stg_kaggle_historical rows carry an MD5 of their text instead of a Steam id
+    frame = pd.DataFrame({"recommendationid": ["10", "20", "5d41402abc4b2a76b9719d911017c592", "30"],
+                          "review_text": ["a", "b", "kaggle", "c"], "review_score": [1, 0, 0, 1]})
+    uri = write_export(frame, shards=2)
+    assert read_delta(uri, watermark=15) == (["20", "30"], ["b", "c"], [0, 1])
+    _, texts, _ = read_replay(uri, watermark=15, per_class={0: 5, 1: 5})
+    assert sorted(texts) == ["a", "kaggle"]
+
+# --- End to end ---
+@pytest.fixture
+def refreshed(reviews, write_export, tmp_path):
+    """A base model on the older half of the reviews, refreshed from the newer half."""
+    frame = reviews.sort_values("recommendationid", key=lambda s: s.astype(int)).reset_index(drop=True)
+    cut = len(frame) // 2
+    old, new = frame.iloc[:cut], frame.iloc[cut:].copy()
+    # marker words: one only in delta rows the refresh trains on, one only in its holdout
+    ids = new.recommendationid.tolist()
+    (_, _), (held_ids, _) = split_holdout(ids, ids, ids)  # texts repeat across reviews; split the ids
+    held = new.recommendationid.isin(held_ids)
+    new.loc[~held, "review_text"] += " zztrainonly" * 5
+    new.loc[held, "review_text"] += " zzholdoutonly" * 5
+    data_uri = write_export(pd.concat([old, new]))
+
+    featurizer = ShardedTfidf(TfidfVectorizer(**TFIDF), workers=1)
+    X = featurizer.fit_transform(old.review_text.tolist())
+    clf = LogisticRegression(**LOGREG).fit(X, old.review_score)
+    base = tmp_path / "models" / "base"
+    base.mkdir(parents=True)
+    joblib.dump(make_pipeline(featurizer.vectorizer_, clf), base / "model.joblib.gz", compress=("gzip", 3))
+    watermark = int(old.recommendationid.astype(int).max())
+    TfidfState.from_vectorizer(featurizer.vectorizer_, featurizer.n_docs_, watermark,
+                               featurizer.vocab_tf_).save(str(base / STATE_FILE))
+
+    root = tmp_path / "models"
+    report = refresh(str(base / "model.joblib.gz"), data_uri, str(root), TFIDF, LOGREG, workers=1, force=True)
+    return report, root / report["version"], new, data_uri
+
+def test_refresh_writes_a_new_version(refreshed):
+    report, out, new, _ = refreshed
+    assert sorted(p.name for p in out.iterdir()) == ["model.joblib.gz", "report.json", STATE_FILE]
+    assert json.loads((out / "report.json").read_text()) == report
+    assert report["delta_reviews"] == len(new)
+    assert report["watermark"] == int(new.recommendationid.astype(int).max())
+    assert report["features"] <= TFIDF["max_features"]
+    for split in ("delta_holdout", "replay_holdout"):
+        assert report["refreshed"][split]["reviews"] > 0
+
+def test_holdout_never_shapes_the_vocabulary(refreshed):
+    _, out, _, _ = refreshed
+    vec, _ = joblib.load(out / "model.joblib.gz")
+    state = TfidfState.load(str(out / STATE_FILE))
+    assert "zztrainonly" in vec.vocabulary_
+    assert "zzholdoutonly" not in vec.vocabulary_ and "zzholdoutonly" not in state.tf
+
+def test_refreshing_the_refresh_is_up_to_date(refreshed):
+    report, out, _, data_uri = refreshed
+    again = refresh(str(out / "model.joblib.gz"), data_uri, str(out.parent), TFIDF, LOGREG, workers=1)
+    assert again == {"status": "up_to_date", "watermark": report["watermark"]}
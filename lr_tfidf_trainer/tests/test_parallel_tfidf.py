@@ -0,0 +1,59 @@
+# lr_tfidf_trainer/tests/test_parallel_tfidf.py
+"""ShardedTfidf must fit the same vectorizer as TfidfVectorizer.fit, however the corpus is sharded."""
+from collections import Counter
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from parallel_tfidf import ShardedTfidf, stack_csr
+from test_fast_tfidf import CORPUS, UNSEEN
+
+CONFIGS = {
+    "unigrams":       dict(),
+    "production":     dict(lowercase=True, stop_words="english", ngram_range=(1, 2), max_features=93_969),
+    "min_max_df":     dict(ngram_range=(1, 2), min_df=2, max_df=0.5),
+    # many terms tie at the cut-off; the same ones must survive as in sklearn
+    "max_features":   dict(ngram_range=(1, 2), max_features=7),
+    "no_idf":         dict(use_idf=False, norm="l1"),
+    "binary":         dict(binary=True, max_features=10),
+}
+
+@pytest.fixture(scope="module", params=sorted(CONFIGS))
+def fitted(request):
+    params = CONFIGS[request.param]
+    # shard_size=3 splits the corpus across both workers and several shards
+    sharded = ShardedTfidf(TfidfVectorizer(**params), workers=2, shard_size=3).fit(CORPUS)
+    return sharded, TfidfVectorizer(**params).fit(CORPUS)
+
+def test_fit_matches_sklearn(fitted):
+    sharded, expected = fitted
+    assert sharded.vectorizer_.vocabulary_ == expected.vocabulary_
+    if expected.use_idf:
+        np.testing.assert_allclose(sharded.vectorizer_.idf_, expected.idf_, rtol=0, atol=1e-12)
+
+def test_transform_matches_sklearn(fitted):
+    sharded, expected = fitted
+    got = sharded.transform(CORPUS + UNSEEN)
+    assert got.shape == (len(CORPUS) + len(UNSEEN), len(expected.vocabulary_))
+    np.testing.assert_allclose(got.toarray(), expected.transform(CORPUS + UNSEEN).toarray(), rtol=0, atol=1e-12)
+
+def test_fit_keeps_the_incremental_state():
+    sharded = ShardedTfidf(TfidfVectorizer(ngram_range=(1, 2)), workers=2, shard_size=4).fit(iter(CORPUS))
+    analyzer = sharded.vectorizer_.build_analyzer()
+    tf = Counter(t for doc in CORPUS for t in analyzer(doc))
+    assert sharded.n_docs_ == len(CORPUS)
+    assert sharded.vocab_tf_ == {t: tf[t] for t in sharded.vectorizer_.vocabulary_}
+
+def test_fitted_vectorizer_is_reused_for_transform():
+    vec = TfidfVectorizer().fit(CORPUS)
+    got = ShardedTfidf(vec, workers=2, shard_size=5).transform(UNSEEN)
+    np.testing.assert_allclose(got.toarray(), vec.transform(UNSEEN).toarray(), rtol=0, atol=0)
+
+def test_stack_csr_matches_vstack():
+    rng = np.random.default_rng(0)
+    blocks = [sp.random(n, 11, density=0.3, format="csr", random_state=rng) for n in (4, 0, 7, 1)]
+    stacked = stack_csr(blocks, 11)
+    assert stacked.shape == (12, 11)
+    assert (stacked != sp.vstack(blocks).tocsr()).nnz == 0
@@ -0,0 +1,54 @@
+# lr_tfidf_trainer/tests/test_sampling.py
+"""Class balancing keeps min-class-size rows per label, deterministically for a seed."""
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sampling import load_balanced
+
+def test_every_class_is_cut_to_the_smallest(reviews, write_export):
+    sample = load_balanced(write_export(reviews))
+    counts = Counter(reviews["review_score"])
+    k = min(counts.values())
+    assert sample.source_counts == counts
+    assert Counter(sample.labels) == {label: k for label in counts}
+    assert sample.weights is None
+
+    rows = reviews.set_index("recommendationid")
+    assert len(set(sample.ids)) == len(sample)
+    assert [rows.at[i, "review_text"] for i in sample.ids] == sample.texts
+    assert [rows.at[i, "review_score"] for i in sample.ids] == sample.labels
+
+def test_sample_does_not_depend_on_sharding_or_order(reviews, write_export):
+    a = load_balanced(write_export(reviews, shards=1, name="one"), seed=7)
+    b = load_balanced(write_export(reviews.sample(frac=1, random_state=0), shards=5, name="five"), seed=7)
+    assert a.ids == b.ids and a.texts == b.texts
+    # the shuffle interleaves the classes instead of emitting them one after the other
+    assert len(set(a.labels[: len(a) // 4])) == 2
+    assert load_balanced(write_export(reviews, name="seed"), seed=8).ids != a.ids
+
+def test_rows_without_text_are_skipped(reviews, write_export):
+    frame = reviews.copy()
+    frame.loc[frame.index[:5], "review_text"] = None
+    sample = load_balanced(write_export(frame))
+    assert not set(frame["recommendationid"][:5]) & set(sample.ids)
+    assert all(isinstance(t, str) for t in sample.texts)
+
+def test_dedup_weights_are_rescaled_per_class(write_export):
+    frame = pd.DataFrame({"recommendationid": [str(i) for i in range(30)],
+                          "review_text": [f"review {i}" for i in range(30)],
+                          "review_score": [1] * 20 + [0] * 10,
+                          "weight": [1, 2, 3, 4] * 5 + [1] * 10})
+    sample = load_balanced(write_export(frame))
+    assert sample.source_counts == {1: 50, 0: 10}
+    y = np.asarray(sample.labels)
+    assert Counter(sample.labels) == {1: 10, 0: 10}
+    for label in (0, 1):
+        assert sample.weights[y == label].mean() == pytest.approx(1.0)
+
+def test_empty_export_is_an_error(write_export):
+    frame = pd.DataFrame({"recommendationid": ["1"], "review_text": ["x"], "review_score": [None]})
+    with pytest.raises(ValueError, match="No labelled rows"):
+        load_balanced(write_export(frame, shards=1))
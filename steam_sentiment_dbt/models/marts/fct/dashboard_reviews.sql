@@ -0,0 +1,22 @@
+{{
+  config(
+    materialized = "table",
+    partition_by = {"field": "review_date", "data_type": "date", "granularity": "day"},
+    cluster_by   = ["game_name"]
+  )
+}}
+
+-- Serving table for the Streamlit dashboard: only the columns it reads,
+-- partitioned by day and clustered by game so per-game / date-bounded
+-- queries scan a fraction of the table.
+with raw as (
+  select * from {{ ref('stg_steam_reviews') }}
+)
+
+select
+  recommendationid,
+  game_name,
+  voted_up,
+  date(timestamp_seconds(timestamp_created)) as review_date,
+  review
+from raw
@@ -7,9 +7,11 @@ with raw as (
 )
 
 select
+  recommendationid,
   review,
   language,                    -- ← we added this
   voted_up,                    -- still raw BOOL here
+  timestamp_created,
   app_id     as game_id,       -- optional rename now or later
   game_name
 from raw
\ No newline at end of file